@@ -0,0 +1,522 @@
+import base64
+import datetime
+import decimal
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from azure.kusto.data import KustoClient, KustoConnectionStringBuilder
+
+# Pooled Kusto clients keyed by (cluster, client_id, tenant_id). Each KustoClient keeps its own
+# AAD token cache, so reusing the client means the token is only fetched again when it expires.
+_clients: Dict[Tuple[str, str, str], KustoClient] = {}
+_clients_lock = threading.Lock()
+
+# Tail operators that already return a single row; any other tail gets a `take` appended.
+_SINGLE_ROW_TAIL_OPERATORS = ("count",)
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_kusto_client(cluster: str, client_id: str, client_secret: str, tenant_id: str) -> KustoClient:
+    """Return a shared KustoClient for the service principal, creating it on first use."""
+    key = (cluster, client_id, tenant_id)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            kcsb = KustoConnectionStringBuilder.with_aad_application_key_authentication(
+                cluster, client_id, client_secret, tenant_id
+            )
+            client = KustoClient(kcsb)
+            _clients[key] = client
+    return client
+
+
+def close_kusto_clients() -> None:
+    """Close and forget every pooled client (e.g. after rotating the service principal secret)."""
+    with _clients_lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _clients.clear()
+
+
+def _last_pipe(query: str) -> int:
+    """Index of the last top-level pipe, ignoring pipes inside strings, comments and brackets; -1 if none."""
+    depth = 0
+    quote = None
+    last_pipe = -1
+    i = 0
+    while i < len(query):
+        ch = query[i]
+        if quote:
+            if ch == "\\":
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == "/" and query.startswith("//", i):
+            newline = query.find("\n", i)
+            i = len(query) if newline == -1 else newline
+            continue
+        elif ch in "([{":
+            depth += 1
+        elif ch in ")]}":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            last_pipe = i
+        i += 1
+    return last_pipe
+
+
+def _last_operator(query: str) -> str:
+    """Return the name of the last top-level pipe operator."""
+    last_pipe = _last_pipe(query)
+    if last_pipe == -1:
+        return ""
+    tail = query[last_pipe + 1:].split()
+    return tail[0].lower() if tail else ""
+
+
+def inject_row_limit(query: str, max_rows: int) -> str:
+    """Append a server-side `take` so ADX returns at most max_rows + 1 rows.
+
+    The extra row lets the caller tell a complete result from a truncated one.
+    A trailing `render` must stay the last operator, so the take goes before it.
+    Management commands (starting with '.') are returned unchanged.
+    """
+    stripped = query.strip().rstrip(";").rstrip()
+    if not stripped or stripped.startswith(".") or max_rows <= 0:
+        return query
+    operator = _last_operator(stripped)
+    if operator == "render":
+        render_pipe = _last_pipe(stripped)
+        head, render = stripped[:render_pipe].rstrip(), stripped[render_pipe:]
+        if _last_operator(head) in _SINGLE_ROW_TAIL_OPERATORS:
+            return stripped
+        return f"{head}\n| take {max_rows + 1}\n{render}"
+    if operator in _SINGLE_ROW_TAIL_OPERATORS:
+        return stripped
+    return f"{stripped}\n| take {max_rows + 1}"
+
+
+def inject_row_count(query: str) -> str:
+    """Turn a tabular query into one that returns only its row count, computed server-side."""
+    stripped = query.strip().rstrip(";").rstrip()
+    return f"{stripped}\n| summarize TotalRows = count()"
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return str(value)
+
+
+def iter_rows(table) -> Iterator[Dict[str, Any]]:
+    """Yield rows of a KustoResultTable as dicts, one at a time."""
+    names = [column.column_name for column in table.columns]
+    for row in table:
+        yield dict(zip(names, row))
+
+
+def collect_rows(rows: Iterator[Dict[str, Any]], max_rows: int, max_bytes: int) -> Tuple[List[Dict[str, Any]], bool]:
+    """Take rows until the row or byte budget is reached. Returns (rows, truncated)."""
+    collected: List[Dict[str, Any]] = []
+    size = 2  # surrounding brackets
+    for row in rows:
+        if len(collected) >= max_rows:
+            return collected, True
+        encoded = json.dumps(row, separators=(",", ":"), default=_json_default)
+        size += len(encoded) + (1 if collected else 0)
+        if max_bytes > 0 and size > max_bytes:
+            return collected, True
+        collected.append(row)
+    return collected, False
+
+
+def rows_to_json(rows: List[Dict[str, Any]]) -> str:
+    return json.dumps(rows, separators=(",", ":"), default=_json_default)
+
+
+def rows_to_arrow(rows: List[Dict[str, Any]]) -> str:
+    """Encode rows as a base64 Arrow IPC stream (requires pyarrow)."""
+    import pyarrow as pa
+
+    normalized = [{k: (v if isinstance(v, (int, float, str, bool, type(None))) else _json_default(v)) for k, v in row.items()} for row in rows]
+    table = pa.Table.from_pylist(normalized)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return base64.b64encode(sink.getvalue().to_pybytes()).decode("utf-8")
+
+
+# KQL tokens: comments, string literals, numbers, identifiers, then any other single character
+_KQL_TOKEN_RE = re.compile(
+    r"""(?P<comment>//[^\n]*)"""
+    r"""|(?P<string>@?'(?:[^'\\]|\\.)*'|@?"(?:[^"\\]|\\.)*")"""
+    r"""|(?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)"""
+    r"""|(?P<ident>[A-Za-z_][A-Za-z0-9_]*)"""
+    r"""|(?P<op>==|!=|<>|<=|>=|=~|!~)"""
+    r"""|(?P<space>\s+)"""
+    r"""|(?P<other>.)""",
+    re.DOTALL,
+)
+
+KQL_KEYWORDS = frozenset(
+    """
+    let set where filter project extend summarize by take limit top sort order asc desc nulls first last
+    join kind on union lookup count distinct and or not in has contains startswith endswith matches regex
+    between as with render parse mv expand evaluate invoke sample getschema print range datatable
+    materialize toscalar case iff iif inner outer leftouter rightouter fullouter leftanti rightanti
+    leftsemi rightsemi innerunique true false null
+    """.split()
+)
+
+# Operators whose operands are tables (or parenthesized subqueries)
+_TABLE_OPERATORS = ("union", "join", "lookup")
+# Keywords that may come between a statement head and its table: `let x = materialize(T)`
+_TABLE_PREFIX_KEYWORDS = ("let", "materialize", "toscalar") + _TABLE_OPERATORS
+
+
+def _canonical_string(token: str) -> str:
+    verbatim = token.startswith("@")
+    body = token[2:-1] if verbatim else token[1:-1]
+    if not verbatim:
+        body = re.sub(r"\\(.)", r"\1", body)
+    return json.dumps(body)
+
+
+def _canonical_number(token: str) -> str:
+    if re.fullmatch(r"\d+", token):
+        return str(int(token))
+    return repr(float(token))
+
+
+def tokenize_kql(query: str) -> List[Tuple[str, str]]:
+    """Split KQL into (kind, token) pairs with comments and whitespace dropped."""
+    return [
+        (match.lastgroup, match.group())
+        for match in _KQL_TOKEN_RE.finditer(query)
+        if match.lastgroup not in ("comment", "space")
+    ]
+
+
+def normalize_kql(query: str) -> str:
+    """Canonical form of a query for cache keys.
+
+    Whitespace and comments are dropped and string and numeric literals are rewritten
+    to one spelling ('a' == "a", 007 == 7, 1.50 == 1.5). Identifiers and keywords keep
+    their case: KQL is case-sensitive, so `project Count` and `project count` are
+    different queries and `Where` is not the `where` operator.
+    """
+    parts = []
+    for kind, token in tokenize_kql(query):
+        if kind == "string":
+            parts.append(_canonical_string(token))
+        elif kind == "number":
+            parts.append(_canonical_number(token))
+        else:
+            parts.append(token)
+    while parts and parts[-1] == ";":
+        parts.pop()
+    return " ".join(parts)
+
+
+def referenced_tables(query: str) -> List[str]:
+    """Best-effort list of tables a query reads: statement heads and union/join/lookup operands.
+
+    Identifiers inside function-call arguments (`bin(StartTime, 1d)`) or after a pipe are
+    columns, not tables, and operator parameters (`kind=inner`, `withsource=T`) are skipped.
+    """
+    tokens = tokenize_kql(query)
+    let_names = set()
+    tables: List[str] = []
+    # One frame per open bracket: whether the next identifier names a table, and whether a
+    # comma starts another operand (union lists)
+    frames = [{"expect": True, "union": False}]
+    let_pending = False
+    skip_value = False
+    previous = ""
+    for index, (kind, token) in enumerate(tokens):
+        frame = frames[-1]
+        lowered = token.lower() if kind == "ident" else token
+        following = tokens[index + 1][1] if index + 1 < len(tokens) else ""
+        if skip_value:
+            skip_value = False
+        elif kind == "ident" and previous == "let":
+            let_names.add(token)
+            let_pending = True
+            frame["expect"] = False
+        elif token == "=" and let_pending:
+            let_pending = False
+            frame["expect"] = True
+        elif kind == "ident" and lowered in _TABLE_OPERATORS:
+            frame.update(expect=True, union=lowered == "union")
+        elif token == ";":
+            frames = [{"expect": True, "union": False}]
+        elif token in "({" and kind == "other":
+            frames.append({"expect": frame["expect"] or token == "{", "union": False})
+        elif token == "[":
+            frames.append({"expect": False, "union": False})
+        elif token in ")]}" and kind == "other":
+            if len(frames) > 1:
+                frames.pop()
+            frames[-1]["expect"] = False
+        elif token == "," and frame["union"]:
+            frame["expect"] = True
+        elif not frame["expect"]:
+            if token == "|":
+                frame["union"] = False
+        elif (kind == "ident" and following in ("=", ".")) or token == ".":
+            pass  # operator parameter such as kind=inner or hint.strategy=shuffle
+        elif token == "=":
+            skip_value = True
+        elif kind == "ident" and lowered in _TABLE_PREFIX_KEYWORDS:
+            pass
+        elif kind == "ident" and lowered not in KQL_KEYWORDS and following not in ("(", ":"):
+            if token not in let_names and token not in tables:
+                tables.append(token)
+            frame["expect"] = False
+        else:
+            frame["expect"] = False
+        previous = lowered
+    return tables
+
+
+class AdxResultCache:
+    """LRU cache of shaped ADX results keyed by (cluster, database, normalized KQL, result options).
+
+    Entries expire after the smallest TTL among the tables the query reads, and are
+    dropped early when a table's ingestion-time watermark moves past the one recorded
+    when the entry was stored. Watermarks are looked up at most once per
+    `watermark_interval` seconds per table through `watermark_provider(cluster, database, table)`.
+
+    Defaults come from the environment:
+      ADX_CACHE_TTL_SECONDS         default TTL (default 300, 0 disables caching)
+      ADX_CACHE_TABLE_TTLS          per-table overrides, e.g. "titanic=3600,events=30"
+      ADX_CACHE_MAX_ENTRIES         LRU size (default 256)
+      ADX_CACHE_WATERMARK_INTERVAL  seconds between watermark checks per table (default 30)
+    """
+
+    def __init__(
+        self,
+        default_ttl: Optional[float] = None,
+        table_ttls: Optional[Dict[str, float]] = None,
+        max_entries: Optional[int] = None,
+        watermark_interval: Optional[float] = None,
+        watermark_provider: Optional[Callable[[str, str, str], Any]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.default_ttl = default_ttl if default_ttl is not None else float(os.environ.get("ADX_CACHE_TTL_SECONDS", 300))
+        if table_ttls is None:
+            table_ttls = {}
+            for pair in os.environ.get("ADX_CACHE_TABLE_TTLS", "").split(","):
+                if "=" in pair:
+                    name, ttl = pair.split("=", 1)
+                    table_ttls[name.strip()] = float(ttl)
+        self.table_ttls = table_ttls
+        self.max_entries = max_entries if max_entries is not None else int(os.environ.get("ADX_CACHE_MAX_ENTRIES", 256))
+        self.watermark_interval = (
+            watermark_interval if watermark_interval is not None else float(os.environ.get("ADX_CACHE_WATERMARK_INTERVAL", 30))
+        )
+        self.watermark_provider = watermark_provider
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._watermarks: Dict[Tuple[str, str, str], Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0}
+
+    def ttl_for(self, tables: List[str]) -> float:
+        ttls = [self.table_ttls.get(table, self.default_ttl) for table in tables]
+        return min(ttls) if ttls else self.default_ttl
+
+    def _watermark(self, cluster: str, database: str, table: str) -> Any:
+        if self.watermark_provider is None:
+            return None
+        now = self.clock()
+        cached = self._watermarks.get((cluster, database, table))
+        if cached and now - cached[0] < self.watermark_interval:
+            return cached[1]
+        try:
+            value = self.watermark_provider(cluster, database, table)
+        except Exception:
+            value = cached[1] if cached else None
+        self._watermarks[(cluster, database, table)] = (now, value)
+        return value
+
+    def _watermarks_for(self, cluster: str, database: str, tables: List[str]) -> Dict[str, Any]:
+        return {table: self._watermark(cluster, database, table) for table in tables}
+
+    def get_or_run(self, cluster: str, database: str, query: str, run: Callable[[str], str], options: Tuple = ()) -> str:
+        """Return the cached result for the query, or run it and cache the result."""
+        if self.default_ttl <= 0 and not self.table_ttls:
+            return run(query)
+        key = (cluster, database, normalize_kql(query), options)
+        tables = referenced_tables(query)
+        # Watermark lookups may hit the cluster, so they run outside the lock
+        watermarks = self._watermarks_for(cluster, database, tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self.clock() >= entry["expires"]:
+                    del self._entries[key]
+                    self.stats["expired"] += 1
+                elif watermarks != entry["watermarks"]:
+                    del self._entries[key]
+                    self.stats["invalidated"] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry["result"]
+            self.stats["misses"] += 1
+
+        result = run(query)
+        ttl = self.ttl_for(tables)
+        if ttl <= 0:
+            return result
+        with self._lock:
+            self._entries[key] = {"result": result, "expires": self.clock() + ttl, "watermarks": watermarks}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, table: Optional[str] = None) -> None:
+        """Drop every entry, or only the entries that read `table`."""
+        with self._lock:
+            if table is None:
+                self._entries.clear()
+                return
+            for key in [k for k, v in self._entries.items() if table in v["watermarks"]]:
+                del self._entries[key]
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries))
+
+
+class AdxQueryRunner:
+    """Run KQL through a pooled client and shape the result for an agent tool call.
+
+    Defaults come from the environment:
+      ADX_RESULT_MAX_ROWS    rows returned to the agent (default 5)
+      ADX_RESULT_MAX_BYTES   byte budget for the serialized rows (default 16000, 0 disables)
+      ADX_RESULT_FORMAT      "json" (compact) or "arrow" (base64 Arrow IPC stream)
+      ADX_QUERY_INJECT_TAKE  append a server-side take so large tables are never fully returned
+      ADX_QUERY_INJECT_COUNT also report the full row count via a server-side summarize count()
+    """
+
+    def __init__(
+        self,
+        cluster: Optional[str] = None,
+        database: Optional[str] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        result_format: Optional[str] = None,
+        inject_take: Optional[bool] = None,
+        inject_count: Optional[bool] = None,
+        cache: Optional[AdxResultCache] = None,
+    ):
+        self.cache = cache
+        self.cluster = cluster or os.environ["ADX_CLUSTER_URL"]
+        self.database = database or os.environ["ADX_DATABASE_NAME"]
+        self.max_rows = max_rows if max_rows is not None else int(os.environ.get("ADX_RESULT_MAX_ROWS", 5))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.environ.get("ADX_RESULT_MAX_BYTES", 16000))
+        self.result_format = (result_format or os.environ.get("ADX_RESULT_FORMAT", "json")).lower()
+        self.inject_take = inject_take if inject_take is not None else _env_flag("ADX_QUERY_INJECT_TAKE", True)
+        self.inject_count = inject_count if inject_count is not None else _env_flag("ADX_QUERY_INJECT_COUNT", False)
+
+    @property
+    def client(self) -> KustoClient:
+        return get_kusto_client(
+            self.cluster,
+            os.environ["AZURE_CLIENT_ID"],
+            os.environ["AZURE_CLIENT_SECRET"],
+            os.environ["AZURE_TENANT_ID"],
+        )
+
+    def latest_ingestion_time(self, table: str) -> Any:
+        """Ingestion-time watermark of a table, used to invalidate cached results."""
+        response = self.client.execute(self.database, f"['{table}'] | summarize Watermark = max(ingestion_time())")
+        return next(iter_rows(response.primary_results[0]), {}).get("Watermark")
+
+    def run(self, query: str) -> str:
+        if self.cache is None:
+            return self._run(query)
+        options = (self.max_rows, self.max_bytes, self.result_format, self.inject_take, self.inject_count)
+        return self.cache.get_or_run(self.cluster, self.database, query, self._run, options)
+
+    def _run(self, query: str) -> str:
+        kql = inject_row_limit(query, self.max_rows) if self.inject_take else query
+        response = self.client.execute(self.database, kql)
+        rows, truncated = collect_rows(iter_rows(response.primary_results[0]), self.max_rows, self.max_bytes)
+        if not rows:
+            if truncated:
+                return f"Result rows exceed the {self.max_bytes}-byte budget; project fewer columns."
+            return "No results found."
+
+        if self.result_format == "arrow":
+            payload = rows_to_arrow(rows)
+        else:
+            payload = rows_to_json(rows)
+
+        if not self.inject_count:
+            return payload
+        count_response = self.client.execute(self.database, inject_row_count(query))
+        total_rows = next(iter_rows(count_response.primary_results[0]), {}).get("TotalRows")
+        return json.dumps(
+            {
+                "format": self.result_format,
+                "rows": payload if self.result_format == "arrow" else rows,
+                "returned_rows": len(rows),
+                "total_rows": total_rows,
+                "truncated": truncated,
+            },
+            separators=(",", ":"),
+            default=_json_default,
+        )
+
+
+_result_cache: Optional[AdxResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> AdxResultCache:
+    """Return the process-wide result cache, creating it on first use.
+
+    Streamlit re-executes page scripts on every interaction, so the cache lives here
+    rather than in the page, which lets results be shared across reruns, sessions and users.
+    """
+    global _result_cache
+    if _result_cache is not None:
+        return _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = AdxResultCache(
+                watermark_provider=lambda cluster, database, table: AdxQueryRunner(
+                    cluster=cluster, database=database
+                ).latest_ingestion_time(table)
+            )
+    return _result_cache
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from eval_runner import EvalRunner, EvaluatorSpec, ScoreCache
+
+logger = logging.getLogger(__name__)
+
+
+def _concurrency(value: Optional[int]) -> int:
+    return value or int(os.getenv("AGENT_EVAL_CONCURRENCY", "4"))
+
+
+def token_prices() -> Dict[str, float]:
+    """USD per 1K prompt/completion tokens, from AGENT_EVAL_PROMPT_PRICE_PER_1K / AGENT_EVAL_COMPLETION_PRICE_PER_1K."""
+    return {
+        "prompt": float(os.getenv("AGENT_EVAL_PROMPT_PRICE_PER_1K", "0")),
+        "completion": float(os.getenv("AGENT_EVAL_COMPLETION_PRICE_PER_1K", "0")),
+    }
+
+
+def load_scenarios(path: str) -> List[str]:
+    """Scenario messages from a JSONL file of {"message": ...} rows, or a text file with one message per line."""
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    if path.endswith(".jsonl"):
+        return [json.loads(line)["message"] for line in lines]
+    return lines
+
+
+@dataclass
+class ScenarioRun:
+    """One scenario message sent to the agent on its own thread, with its latency and token usage."""
+
+    scenario: str
+    thread_id: Optional[str] = None
+    run_id: Optional[str] = None
+    status: str = "pending"
+    error: Optional[str] = None
+    latency_seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def completed(self) -> bool:
+        return self.status.lower().endswith("completed")
+
+    def cost(self, prices: Dict[str, float]) -> float:
+        return (self.prompt_tokens * prices["prompt"] + self.completion_tokens * prices["completion"]) / 1000
+
+    def outputs(self, prices: Dict[str, float]) -> Dict[str, Any]:
+        """`outputs.agent_run.*` columns, so latency and cost aggregate next to the quality scores."""
+        return {
+            "outputs.agent_run.status": self.status,
+            "outputs.agent_run.latency_seconds": self.latency_seconds,
+            "outputs.agent_run.prompt_tokens": self.prompt_tokens,
+            "outputs.agent_run.completion_tokens": self.completion_tokens,
+            "outputs.agent_run.total_tokens": self.prompt_tokens + self.completion_tokens,
+            "outputs.agent_run.cost": self.cost(prices),
+        }
+
+
+def run_scenario(project_client, agent_id: str, scenario: str) -> ScenarioRun:
+    run = ScenarioRun(scenario)
+    start = time.perf_counter()
+    try:
+        thread = project_client.agents.threads.create()
+        run.thread_id = thread.id
+        project_client.agents.messages.create(thread_id=thread.id, role="user", content=scenario)
+        result = project_client.agents.runs.create_and_process(thread_id=thread.id, agent_id=agent_id)
+        run.run_id = result.id
+        run.status = str(getattr(result.status, "value", result.status))
+        if not run.completed:
+            run.error = str(getattr(result, "last_error", None))
+        usage = getattr(result, "usage", None)
+        if usage is not None:
+            run.prompt_tokens = usage.prompt_tokens or 0
+            run.completion_tokens = usage.completion_tokens or 0
+    except Exception as e:
+        logger.warning("Scenario %r failed: %s", scenario, e)
+        run.status, run.error = "error", str(e)
+    run.latency_seconds = time.perf_counter() - start
+    return run
+
+
+def run_scenarios(project_client, agent_id: str, scenarios: Sequence[str],
+                  concurrency: Optional[int] = None) -> List[ScenarioRun]:
+    """Run every scenario on its own thread against one reused agent; results keep the scenario order."""
+    with ThreadPoolExecutor(max_workers=_concurrency(concurrency), thread_name_prefix="agent-scenario") as pool:
+        return list(pool.map(lambda scenario: run_scenario(project_client, agent_id, scenario), scenarios))
+
+
+def convert_runs(converter, runs: Sequence[ScenarioRun], concurrency: Optional[int] = None) -> List[Optional[Dict]]:
+    """`AIAgentConverter.convert` for every completed run, in parallel; None for runs that failed or did not convert."""
+
+    def convert(run: ScenarioRun) -> Optional[Dict]:
+        if not run.completed:
+            return None
+        try:
+            return converter.convert(thread_id=run.thread_id, run_id=run.run_id)
+        except Exception as e:
+            logger.warning("Converting run %s failed: %s", run.run_id, e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=_concurrency(concurrency), thread_name_prefix="agent-convert") as pool:
+        return list(pool.map(convert, runs))
+
+
+def write_jsonl(path: str, rows: Sequence[Dict]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, default=str) + "\n")
+
+
+def agent_eval_specs(intent_resolution, tool_call_accuracy, task_adherence,
+                     concurrency: Optional[int] = None, version: str = "1") -> List[EvaluatorSpec]:
+    """The three agent evaluators as EvalRunner specs over the AIAgentConverter columns."""
+    concurrency = _concurrency(concurrency)
+    with_tools = {"query": "${data.query}", "response": "${data.response}",
+                  "tool_definitions": "${data.tool_definitions}"}
+    return [
+        EvaluatorSpec("intent_resolution", intent_resolution, with_tools, version=version, concurrency=concurrency),
+        EvaluatorSpec("tool_call_accuracy", tool_call_accuracy, with_tools, version=version, concurrency=concurrency),
+        EvaluatorSpec("task_adherence", task_adherence, {"query": "${data.query}", "response": "${data.response}"},
+                      version=version, concurrency=concurrency),
+    ]
+
+
+def evaluate_runs(runs: Sequence[ScenarioRun], converted: Sequence[Optional[Dict]], specs: List[EvaluatorSpec],
+                  cache: Optional[ScoreCache] = None,
+                  prices: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """One output row per scenario: the evaluator scores (for converted runs) plus `outputs.agent_run.*`.
+
+    All evaluators score all converted runs concurrently, each on its own pool of
+    `spec.concurrency` workers; failed scenarios keep their latency/status row.
+    """
+    scored = [data for data in converted if data is not None]
+    result = EvalRunner(specs, cache).run(scored) if scored else None
+    return merge_run_outputs(runs, converted, result.rows if result is not None else [], prices)
+
+
+def merge_run_outputs(runs: Sequence[ScenarioRun], converted: Sequence[Optional[Dict]],
+                      scored_rows: Sequence[Dict[str, Any]],
+                      prices: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """Add `outputs.agent_run.*` to evaluator rows, one row per scenario.
+
+    `scored_rows` has one row per converted (non-None) run in order, as written by
+    `write_jsonl` and scored by EvalRunner or `azure.ai.evaluation.evaluate()`.
+    """
+    prices = prices or token_prices()
+    scored = [index for index, data in enumerate(converted) if data is not None]
+    rows = [{"inputs.scenario": run.scenario} for run in runs]
+    for index, row in zip(scored, scored_rows):
+        rows[index].update(row)
+    for row, run in zip(rows, runs):
+        row.update(run.outputs(prices))
+        if run.error:
+            row["outputs.agent_run.error"] = run.error
+    return rows
+
+
+def summarize(runs: Sequence[ScenarioRun], prices: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """Latency percentiles and total tokens/cost across scenarios."""
+    prices = prices or token_prices()
+    latencies = sorted(run.latency_seconds for run in runs)
+    if not latencies:
+        return {}
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    return {
+        "scenarios": len(runs),
+        "completed": sum(run.completed for run in runs),
+        "latency_p50_seconds": percentile(0.5),
+        "latency_p95_seconds": percentile(0.95),
+        "total_tokens": sum(run.prompt_tokens + run.completion_tokens for run in runs),
+        "total_cost": sum(run.cost(prices) for run in runs),
+    }
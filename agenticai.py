@@ -57,6 +57,15 @@ from azure.ai.evaluation.red_team import RedTeam, RiskCategory
 from openai import AzureOpenAI
 from azure.ai.evaluation import evaluate
 from azure.ai.evaluation import GroundednessEvaluator, AzureOpenAIModelConfiguration
+from agent_bulk_eval import (
+    agent_eval_specs, convert_runs, evaluate_runs, load_scenarios, merge_run_outputs, run_scenarios, summarize,
+    write_jsonl,
+)
+from eval_runner import EvalRunner, EvaluatorSpec, iter_jsonl, judge_version
+from eval_shards import evaluate_sharded
+from eval_store import ResultStore
+from redteam_runner import RedTeamOrchestrator, ScanJob
+from lexical_metrics import METRIC_COLUMNS, LexicalMetricEngine
 from azure.ai.agents.models import ConnectedAgentTool, MessageRole
 from azure.ai.agents.models import AzureAISearchTool, AzureAISearchQueryType, MessageRole, ListSortOrder, ToolDefinition, FilePurpose, FileSearchTool
 from utils import send_email
@@ -139,14 +148,18 @@ def code_interpreter() -> str:
         _client.agents.threads.delete(thread.id)
         print("Deleted agent and thread")
 
-def eval()-> str:
-    returntxt = ""
-    model_config = AzureOpenAIModelConfiguration(
+def _eval_model_config():
+    return AzureOpenAIModelConfiguration(
         azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT"),
         api_key=os.environ.get("AZURE_OPENAI_KEY"),
         azure_deployment=os.environ.get("AZURE_OPENAI_DEPLOYMENT"),
         api_version=os.environ.get("AZURE_API_VERSION"),
     )
+
+
+def eval_specs() -> List[EvaluatorSpec]:
+    """The row-callable evaluators of eval(); module level so eval_shards worker processes can build them."""
+    model_config = _eval_model_config()
     ## Using Azure AI Foundry Hub project
     # azure_ai_project = {
     #     "subscription_id": os.environ.get("AZURE_SUBSCRIPTION_ID"),
@@ -184,6 +197,57 @@ def eval()-> str:
     indirect_attack_eval = IndirectAttackEvaluator(azure_ai_project=azure_ai_project_dict, credential=credential)
     protected_material_eval = ProtectedMaterialEvaluator(azure_ai_project=azure_ai_project_dict, credential=credential)
     hate_unfairness_eval = HateUnfairnessEvaluator(azure_ai_project=azure_ai_project_dict, credential=credential)
+
+    safety_concurrency = int(os.getenv("EVAL_SAFETY_CONCURRENCY", "2"))
+    judge_concurrency = int(os.getenv("EVAL_JUDGE_CONCURRENCY", "4"))
+    judge = judge_version(model_config)
+    query_response = {"query": "${data.query}", "response": "${data.response}"}
+    response_truth = {"response": "${data.response}", "ground_truth": "${data.ground_truth}"}
+    with_context = {"query": "${data.query}", "context": "${data.context}", "response": "${data.response}"}
+    # Lexical metrics are computed in bulk by default (one tokenization shared by all five);
+    # EVAL_LEXICAL_ENGINE=sdk scores them row by row with the azure.ai.evaluation evaluators
+    if os.getenv("EVAL_LEXICAL_ENGINE", "batch").lower() == "sdk":
+        lexical_specs = [
+            EvaluatorSpec("f1", f1_evaluator, response_truth, local=True),
+            EvaluatorSpec("bleu", bleu_evaluator, response_truth, local=True),
+            EvaluatorSpec("gleu", gleu_evaluator, response_truth, local=True),
+            EvaluatorSpec("meteor", meteor_evaluator, response_truth, version="alpha=0.8", local=True),
+            EvaluatorSpec("rouge", rouge_evaluator, response_truth, version="rouge4", local=True),
+        ]
+    else:
+        lexical_engine = LexicalMetricEngine(meteor_alpha=0.8)
+        lexical_specs = [
+            EvaluatorSpec(name, lexical_engine.evaluator(name), response_truth, version=lexical_engine.version,
+                          local=True, batch=True)
+            for name in METRIC_COLUMNS
+        ]
+    specs = [
+        EvaluatorSpec("content_safety", content_safety_evaluator, query_response, concurrency=safety_concurrency),
+        EvaluatorSpec("coherence", coherence_evaluator, query_response, version=judge,
+                      concurrency=judge_concurrency),
+        EvaluatorSpec("relevance", relevance_evaluator, with_context, version=judge,
+                      concurrency=judge_concurrency),
+        EvaluatorSpec("groundedness", groundedness_evaluator, with_context, version=judge,
+                      concurrency=judge_concurrency),
+        EvaluatorSpec("fluency", fluency_evaluator, with_context, version=judge,
+                      concurrency=judge_concurrency),
+        *lexical_specs,
+        EvaluatorSpec("indirect_attack", indirect_attack_eval, query_response, concurrency=safety_concurrency),
+        EvaluatorSpec("protected_material", protected_material_eval, query_response, concurrency=safety_concurrency),
+        EvaluatorSpec("hate_unfairness", hate_unfairness_eval, query_response, concurrency=safety_concurrency),
+        EvaluatorSpec("retrieval", retrieval_evaluator, {"query": "${data.query}", "context": "${data.context}"},
+                      version=judge, concurrency=judge_concurrency),
+        EvaluatorSpec("groundnesspro", groundnesspro_evaluator, with_context, concurrency=safety_concurrency),
+        EvaluatorSpec("similarity", similarity_evaluator,
+                      {"query": "${data.query}", "response": "${data.response}", "ground_truth": "${data.ground_truth}"},
+                      version=judge, concurrency=judge_concurrency),
+    ]
+    return specs
+
+
+def eval()-> str:
+    returntxt = ""
+    model_config = _eval_model_config()
     #  Evaluation criteria: Determine if the response column contains texts that are "too short", "just right", or "too long" and pass if it is "just right"
     label_grader = AzureOpenAILabelGrader(
         model_config=model_config,
@@ -264,67 +328,39 @@ def eval()-> str:
     """,
     )
 
-     
-    # 
+
+    # Row-callable evaluators go through the cached runner: only rows/evaluators whose
+    # inputs or version changed since the last run are scored again
+    data_file = os.getenv("EVAL_DATA_FILE", "datarfp.jsonl")
     try:
         print()
-        result = evaluate(
-            data="datarfp.jsonl", # provide your data here
+        # Rows stream into JSONL shards with a running summary; a rerun resumes after the last complete shard
+        output_dir = os.getenv("EVAL_OUTPUT_DIR", "./myevalresults")
+        if int(os.getenv("EVAL_PROCESSES", "1")) > 1:
+            # Byte-range shards of the input in a process pool, merged into output_dir
+            summary = evaluate_sharded(data_file, eval_specs, output_dir)
+            store = ResultStore(output_dir)
+        else:
+            store = ResultStore(output_dir)
+            summary = EvalRunner(eval_specs()).run_sharded(iter_jsonl(data_file), store)
+        print(f"Evaluator cache usage: {summary['stats']}")
+
+        # The AOAI graders run inside the OpenAI evals service, so they still go through evaluate()
+        grader_result = evaluate(
+            data=data_file,
             evaluators={
-                "content_safety": content_safety_evaluator,
-                "coherence": coherence_evaluator,
-                "relevance": relevance_evaluator,
-                "groundedness": groundedness_evaluator,
-                "fluency": fluency_evaluator,
-            #    "similarity": similarity_evaluator,
-                "f1": f1_evaluator,
-                "bleu": bleu_evaluator,
-                "gleu": gleu_evaluator,
-                "meteor": meteor_evaluator,
-                "rouge": rouge_evaluator,
-                "indirect_attack": indirect_attack_eval,
-                "protected_material": protected_material_eval,
-                "hate_unfairness": hate_unfairness_eval,
-                "retrieval": retrieval_evaluator,
-                "groundnesspro": groundnesspro_evaluator,
-                "similarity": similarity_evaluator,
                 "label": label_grader,
                 "string": string_grader,
                 "sim_grader": sim_grader,
                 # "general": general_grader,
                 # "custom_similarity": python_similarity_grader,
-            },        
-            evaluator_config={
-                "content_safety": {"query": "${data.query}", "response": "${data.response}"},
-                "coherence": {"response": "${data.response}", "query": "${data.query}"},
-                "relevance": {"response": "${data.response}", "context": "${data.context}", "query": "${data.query}"},
-                "groundedness": {
-                    "response": "${data.response}",
-                    "context": "${data.context}",
-                    "query": "${data.query}",
-                },
-                "fluency": {"response": "${data.response}", "context": "${data.context}", "query": "${data.query}"},
-                "f1": {"response": "${data.response}", "ground_truth": "${data.ground_truth}"},
-                "bleu": {"response": "${data.response}", "ground_truth": "${data.ground_truth}"},
-                "gleu": {"response": "${data.response}", "ground_truth": "${data.ground_truth}"},
-                "meteor": {"response": "${data.response}", "ground_truth": "${data.ground_truth}"},
-                "rouge": {"response": "${data.response}", "ground_truth": "${data.ground_truth}"},
-                "indirect_attack": {"query": "${data.query}", "response": "${data.response}"},
-                "protected_material": {"query": "${data.query}", "response": "${data.response}"},
-                "hate_unfairness": {"query": "${data.query}", "response": "${data.response}"},
-                "retrieval": {"query": "${data.query}", "context": "${data.context}"},
-                "groundnesspro": {"query": "${data.query}", "context" : "${data.context}", "response": "${data.response}"},
-                "similarity": {"query": "${data.query}", "response": "${data.response}", "ground_truth": "${data.ground_truth}"},
-                #"label": {"query": "${data.query}", "response": "${data.response}", "ground_truth": "${data.ground_truth}"},
-                #"general": {"query": "${data.query}", "response": "${data.response}", "ground_truth": "${data.ground_truth}"},
-                #"custom": {"query": "${data.query}", "response": "${data.response}", "ground_truth": "${data.ground_truth}"},
-                # "simgrader": {"query": "${data.query}", "response": "${data.response}", "ground_truth": "${data.ground_truth}"},
             },
             # Optionally provide your Azure AI Foundry project information to track your evaluation results in your project portal
             azure_ai_project = os.environ["PROJECT_ENDPOINT"],
-            # Optionally provide an output path to dump a json of metric summary, row level data and metric and Azure AI project URL
-            output_path="./myevalresults.json"
         )
+        ResultStore(os.path.join(store.path, "graders")).write_rows(grader_result.get("rows", []))
+        store.update_extra(grader_metrics=grader_result.get("metrics", {}),
+                           studio_url=grader_result.get("studio_url"))
         #returntxt = f"Completed Evaluation: {result.studio_url}" 
         print("Evalutions completed .....")
     except Exception as e:
@@ -426,7 +462,7 @@ def aoai_callback(query: str) -> str:
     returntxt = response.choices[0].message.content
     return returntxt
 
-async def redteam() -> str:
+async def redteam(on_progress: Optional[Callable[[RedTeamOrchestrator], None]] = None) -> str:
     returntxt = ""
                 
     ## Using Azure AI Foundry Hub project
@@ -444,21 +480,22 @@ async def redteam() -> str:
     #     credential=DefaultAzureCredential() # required
     # )
     # Specifying risk categories and number of attack objectives per risk categories you want the AI Red Teaming Agent to cover
-    red_team_agent = RedTeam(
-        azure_ai_project=azure_ai_project, # required
-        credential=DefaultAzureCredential(), # required
-        risk_categories=[ # optional, defaults to all four risk categories
-            RiskCategory.Violence,
-            RiskCategory.HateUnfairness,
-            RiskCategory.Sexual,
-            RiskCategory.SelfHarm,
-        ], 
-        num_objectives=5, # optional, defaults to 10
-        # num_turns=5
-    )
-    # Runs a red teaming scan on the simple callback target
-    red_team_result = await red_team_agent.scan(target=simple_callback)
-
+    risk_categories = [ # optional, defaults to all four risk categories
+        RiskCategory.Violence,
+        RiskCategory.HateUnfairness,
+        RiskCategory.Sexual,
+        RiskCategory.SelfHarm,
+    ]
+
+    def red_team_agent(num_objectives: int) -> RedTeam:
+        # One instance per scan: the scans below run concurrently
+        return RedTeam(
+            azure_ai_project=azure_ai_project, # required
+            credential=DefaultAzureCredential(), # required
+            risk_categories=risk_categories,
+            num_objectives=num_objectives, # optional, defaults to 10
+            # num_turns=5
+        )
 
     # Define a model configuration to test
     azure_oai_model_config = {
@@ -466,41 +503,41 @@ async def redteam() -> str:
         "azure_deployment": os.environ.get("AZURE_OPENAI_DEPLOYMENT"),
         "api_key": os.environ.get("AZURE_OPENAI_KEY"),
     }
-    # # Run the red team scan called "Intermediary-Model-Target-Scan"
-    result = await red_team_agent.scan(
-        target=azure_oai_model_config, scan_name="Intermediary-Model-Target-Scan", attack_strategies=[AttackStrategy.Flip]
-    )
-    returntxt += str(result)
-
-    # Create the RedTeam instance with all of the risk categories with 5 attack objectives generated for each category
-    model_red_team = RedTeam(
-        azure_ai_project=azure_ai_project,
-        credential=DefaultAzureCredential(),
-        risk_categories=[RiskCategory.Violence, RiskCategory.HateUnfairness, RiskCategory.Sexual, RiskCategory.SelfHarm],
-        num_objectives=2,
-    )
-
-    # Run the red team scan with multiple attack strategies
-    advanced_result = await model_red_team.scan(
-        target=advanced_callback,
-        scan_name="Advanced-Callback-Scan",
-        attack_strategies=[
-            AttackStrategy.EASY,  # Group of easy complexity attacks
-            AttackStrategy.MODERATE,  # Group of moderate complexity attacks
-            # AttackStrategy.CHARACTER_SPACE,  # Add character spaces
-            #AttackStrategy.ROT13,  # Use ROT13 encoding
-            #AttackStrategy.UnicodeConfusable,  # Use confusable Unicode characters
-            #AttackStrategy.CharSwap,  # Swap characters in prompts
-            #AttackStrategy.Morse,  # Encode prompts in Morse code
-            #AttackStrategy.Leetspeak,  # Use Leetspeak
-            #AttackStrategy.Url,  # Use URLs in prompts
-            #AttackStrategy.Binary,  # Encode prompts in binary
-            # AttackStrategy.Compose([AttackStrategy.BASE64, AttackStrategy.ROT13]),  # Use two strategies in one 
-        ],
-        output_path="./Advanced-Callback-Scan.json",
-    )
-
-    returntxt += str(advanced_result)
+    jobs = [
+        # Runs a red teaming scan on the simple callback target
+        ScanJob("Simple-Callback-Scan", red_team_agent(5), simple_callback, expected_attacks=5 * 4),
+        # Run the red team scan called "Intermediary-Model-Target-Scan"
+        ScanJob("Intermediary-Model-Target-Scan", red_team_agent(5), azure_oai_model_config,
+                {"attack_strategies": [AttackStrategy.Flip]}, expected_attacks=5 * 4 * 2),
+        # All of the risk categories with 2 attack objectives each and multiple attack strategies
+        ScanJob(
+            "Advanced-Callback-Scan",
+            red_team_agent(2),
+            advanced_callback,
+            {"attack_strategies": [
+                AttackStrategy.EASY,  # Group of easy complexity attacks
+                AttackStrategy.MODERATE,  # Group of moderate complexity attacks
+                # AttackStrategy.CHARACTER_SPACE,  # Add character spaces
+                #AttackStrategy.ROT13,  # Use ROT13 encoding
+                #AttackStrategy.UnicodeConfusable,  # Use confusable Unicode characters
+                #AttackStrategy.CharSwap,  # Swap characters in prompts
+                #AttackStrategy.Morse,  # Encode prompts in Morse code
+                #AttackStrategy.Leetspeak,  # Use Leetspeak
+                #AttackStrategy.Url,  # Use URLs in prompts
+                #AttackStrategy.Binary,  # Encode prompts in binary
+                # AttackStrategy.Compose([AttackStrategy.BASE64, AttackStrategy.ROT13]),  # Use two strategies in one 
+            ]},
+            output_path="./Advanced-Callback-Scan.json",
+            expected_attacks=2 * 4 * 5,  # baseline + Base64/Flip/Morse (EASY) + Tense (MODERATE)
+        ),
+    ]
+    # The scans share one attack budget (REDTEAM_CONCURRENCY / REDTEAM_RATE_PER_MINUTE); each streams its
+    # attacks to <scan>.attacks.jsonl and a rerun skips finished scans and already-answered attacks.
+    # A failed scan raises RedTeamScanError once the others have finished
+    orchestrator = RedTeamOrchestrator(jobs, output_dir=os.getenv("REDTEAM_OUTPUT_DIR", "."), on_progress=on_progress)
+    results = await orchestrator.run(raise_on_failure=True)
+    for name in ("Intermediary-Model-Target-Scan", "Advanced-Callback-Scan"):
+        returntxt += str(results[name])
 
     #returntxt += f"Red Team scan completed with status: {red_team_agent.ai_studio_url}\n"
         
@@ -565,46 +602,27 @@ def agent_eval() -> str:
 
     print(f"Created agent, ID: {agent.id}")
     # https://github.com/Azure-Samples/azureai-samples/blob/main/scenarios/evaluate/Supported_Evaluation_Metrics/Agent_Evaluation/Evaluate_Azure_AI_Agent_Quality.ipynb
-    # Create a thread for communication
-    thread = project_client.agents.threads.create()
-    print(f"Created thread, ID: {thread.id}")
-    # Create message to thread
-
-    MESSAGE = "Can you email me weather info for Seattle ?"
+    # Every scenario gets its own thread on the same agent; AGENT_EVAL_SCENARIOS points to a
+    # .jsonl ({"message": ...}) or .txt file with more scenarios
+    scenarios = [
+        "Can you email me weather info for Seattle ?",
+        "What is the weather in London right now?",
+        "Compare today's weather in Seattle and Tokyo.",
+    ]
+    if os.getenv("AGENT_EVAL_SCENARIOS"):
+        scenarios = load_scenarios(os.environ["AGENT_EVAL_SCENARIOS"])
+    runs = run_scenarios(project_client, agent.id, scenarios)
+    for run in runs:
+        print(f"Scenario {run.scenario!r}: {run.status} in {run.latency_seconds:.1f}s, "
+              f"{run.prompt_tokens + run.completion_tokens} tokens" + (f" ({run.error})" if run.error else ""))
 
-    # Add a message to the thread
-    message = project_client.agents.messages.create(
-        thread_id=thread.id,
-        role="user",  # Role of the message sender
-        content=MESSAGE,  # Message content
-    )
-    print(f"Created message, ID: {message['id']}")
-    # Create and process an agent run
-    run = project_client.agents.runs.create_and_process(thread_id=thread.id, agent_id=agent.id)
-    print(f"Run finished with status: {run.status}")
-    
-    # Check if the run failed
-    if run.status == "failed":
-        print(f"Run failed: {run.last_error}")
-    
-    # Fetch and log all messages
-    messages = project_client.agents.messages.list(thread_id=thread.id)
-    for message in messages:
-        print(f"Role: {message.role}, Content: {message.content}")
     # Initialize the converter that will be backed by the project.
     converter = AIAgentConverter(project_client)
+    file_name = os.getenv("AGENT_EVAL_DATA_FILE", "agent_eval_runs.jsonl")
+    # Convert all thread/run pairs in parallel and save them as evaluation JSONL
+    converted = convert_runs(converter, runs)
+    write_jsonl(file_name, [row for row in converted if row is not None])
 
-    thread_id = thread.id
-    run_id = run.id
-    file_name = "evaluation_input_data.jsonl"
-
-    # Get a single agent run data
-    evaluation_data_single_run = converter.convert(thread_id=thread_id, run_id=run_id)
-
-    # Run this to save thread data to a JSONL file for evaluation
-    # Save the agent thread data to a JSONL file
-    # evaluation_data = converter.prepare_evaluation_data(thread_ids=thread_id, filename=<>)
-    # print(json.dumps(evaluation_data, indent=4))
     model_config = AzureOpenAIModelConfiguration(
         azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
         api_key=os.environ["AZURE_OPENAI_KEY"],
@@ -624,26 +642,43 @@ def agent_eval() -> str:
     tool_call_accuracy = ToolCallAccuracyEvaluator(model_config=model_config)
     task_adherence = TaskAdherenceEvaluator(model_config=model_config)
     #response_completeness_evaluator = CompletenessEvaluator(model_config=model_config, azure_ai_project=azure_ai_project)
-    
-    response = evaluate(
-        data=file_name,
-        evaluators={
-            "tool_call_accuracy": tool_call_accuracy,
-            "intent_resolution": intent_resolution,
-            "task_adherence": task_adherence,
-            #"response_completeness": response_completeness_evaluator,
-        },
-        azure_ai_project=os.environ["PROJECT_ENDPOINT"],
-    )
-    pprint(f'AI Foundary URL: {response.get("studio_url")}')
+
+    if os.getenv("AGENT_EVAL_UPLOAD", "1") != "0":
+        # evaluate() scores the rows concurrently and uploads the run to the Foundry portal
+        response = evaluate(
+            data=file_name,
+            evaluators={
+                "tool_call_accuracy": tool_call_accuracy,
+                "intent_resolution": intent_resolution,
+                "task_adherence": task_adherence,
+                #"response_completeness": response_completeness_evaluator,
+            },
+            azure_ai_project=azure_ai_project,
+        )
+        pprint(f'AI Foundary URL: {response.get("studio_url")}')
+        rows = merge_run_outputs(runs, converted, response.get("rows", []))
+        extra = {"studio_url": response.get("studio_url")}
+    else:
+        # AGENT_EVAL_UPLOAD=0 scores locally through the cached runner (AGENT_EVAL_CONCURRENCY workers
+        # per evaluator) without a portal run
+        rows = evaluate_runs(runs, converted, agent_eval_specs(intent_resolution, tool_call_accuracy, task_adherence,
+                                                           version=judge_version(model_config)))
+        extra = {}
+    # Rows carry outputs.agent_run.latency_seconds / total_tokens / cost next to the scores
+    store = ResultStore(os.getenv("AGENT_EVAL_OUTPUT_DIR", "./agentevalresults"))
+    store.write_rows(rows)
+    store.update_extra(run_summary=summarize(runs), **extra)
+    metrics = {**store.metrics(), **summarize(runs)}
     # average scores across all runs
-    pprint(response["metrics"])
-    returntxt = str(response["metrics"])
+    pprint(metrics)
+    returntxt = str(metrics)
 
     # Delete the agent when done
+    for run in runs:
+        if run.thread_id:
+            project_client.agents.threads.delete(run.thread_id)
     project_client.agents.delete_agent(agent.id)
-    project_client.agents.threads.delete(thread.id)
-    print("Deleted agent and thread")
+    print("Deleted agent and threads")
 
     return returntxt
 
@@ -6,6 +6,7 @@ import os
 import time
 import base64
 from datetime import datetime
+from itertools import islice
 from typing import Optional, Dict, Any
 from azure.ai.projects import AIProjectClient
 from azure.identity import DefaultAzureCredential
@@ -31,6 +32,7 @@ except ImportError as e:
     st.info("Running in demo mode with simulated responses.")
     DEPENDENCIES_AVAILABLE = False
 
+from eval_store import ResultReader
 from stasses import assesmentmain
 from stfinetuneasses import finetuneassesment
 
@@ -414,11 +416,12 @@ def main():
                             # st.json(evalrs)
                             st.write(evalrs)
                             try:
-                                file_name = "myevalresults.json"
-                                # Load JSON file
-                                with open(file_name, 'r') as file:
-                                    data = json.load(file)
-                                    st.json(data)
+                                # Summary plus the first rows; the full results stay in the JSONL shards
+                                reader = ResultReader(os.getenv("EVAL_OUTPUT_DIR", "./myevalresults"))
+                                summary = reader.summary
+                                st.json({"metrics": summary["metrics"], "stats": summary["stats"],
+                                         **summary.get("extra", {}), "rows": summary["rows"]})
+                                st.dataframe(list(islice(reader.rows(), 100)))
                                 
                             except Exception as e:
                                 st.error(f"Error saving AI evaluation results: {str(e)}")
@@ -745,7 +748,7 @@ def main():
                                 ai_action_response = aiactionplat_agent(transcription)
                                 
                                 # Generate audio response
-                                response_audio_path = generate_audio_response_gpt(ai_action_response)
+                                audio_bytes = generate_audio_response_gpt(ai_action_response)
                                 
                                 # Display text response
                                 st.markdown("""
@@ -755,10 +758,8 @@ def main():
                                 """, unsafe_allow_html=True)
                                 st.info(ai_action_response)
                                 
-                                # Display audio response
-                                import base64
-                                with open(response_audio_path, "rb") as f:
-                                    audio_bytes = f.read()
+                                # Display audio response (MP3 bytes in memory; None if synthesis failed)
+                                if audio_bytes:
                                     audio_base64 = base64.b64encode(audio_bytes).decode()
                                     audio_html = f"""
                                     <div class="feature-card">
@@ -769,15 +770,15 @@ def main():
                                     </div>
                                     """
                                     st.markdown(audio_html, unsafe_allow_html=True)
+                                else:
+                                    st.warning("⚠️ Could not generate the audio response.")
                                 
                                 # Add assistant response to chat history
                                 st.session_state.ai_action_plan_messages.append({"role": "assistant", "content": ai_action_response})
                                 
-                                # Clean up audio files
+                                # Clean up the recorded input file
                                 if os.path.exists(audio_file_path):
                                     os.remove(audio_file_path)
-                                if os.path.exists(response_audio_path):
-                                    os.remove(response_audio_path)
                                 
                                 st.success("✅ Voice input processed successfully!")
                                 
@@ -1053,7 +1054,7 @@ def mcp_audio_chat_interface():
                             response_text = "Invalid MCP server selection."
 
                         # Generate audio response
-                        response_audio_path = generate_audio_response_gpt(response_text)
+                        audio_bytes = generate_audio_response_gpt(response_text)
                         
                         # Display AI response
                         st.markdown("""
@@ -1064,9 +1065,8 @@ def mcp_audio_chat_interface():
                         
                         st.info(response_text)
                         
-                        # Display audio response
-                        with open(response_audio_path, "rb") as f:
-                            audio_bytes = f.read()
+                        # Display audio response (MP3 bytes in memory; None if synthesis failed)
+                        if audio_bytes:
                             audio_base64 = base64.b64encode(audio_bytes).decode()
                             audio_html = f"""
                             <div class="feature-card">
@@ -1077,6 +1077,8 @@ def mcp_audio_chat_interface():
                             </div>
                             """
                             st.markdown(audio_html, unsafe_allow_html=True)
+                        else:
+                            st.warning("⚠️ Could not generate the audio response.")
                         
                         # Save assistant message
                         st.session_state.mcp_messages.append({
@@ -1085,11 +1087,9 @@ def mcp_audio_chat_interface():
                             "audio": audio_bytes
                         })
 
-                    # Clean up temporary files
+                    # Clean up the recorded input file
                     if os.path.exists(audio_file_path):
                         os.remove(audio_file_path)
-                    if os.path.exists(response_audio_path):
-                        os.remove(response_audio_path)
                         
                     # Success message
                     st.success("✅ Audio processed successfully! Your conversation has been added to the chat history.")
@@ -0,0 +1,155 @@
+import io
+import math
+import time
+import tracemalloc
+from typing import Iterable, Iterator
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+TARGET_SAMPLE_RATE = 24000
+
+
+def _context_samples(up: int, down: int) -> int:
+    """Input samples of context each side of a block so block edges match a one-shot resample_poly.
+
+    resample_poly's default filter has 10 * max(up, down) taps per side at the
+    upsampled rate; the context is rounded up to a multiple of `down` so every
+    block starts on the same polyphase phase as the full signal would.
+    """
+    half_len = math.ceil(10 * max(up, down) / up) + 1
+    return math.ceil(half_len / down) * down
+
+
+def resample_blocks(blocks: Iterable[np.ndarray], rate_in: int, rate_out: int) -> Iterator[np.ndarray]:
+    """Polyphase-resample a stream of mono float32 blocks, yielding float32 output blocks.
+
+    Memory stays proportional to the block size; the concatenated output equals
+    resample_poly over the whole signal.
+    """
+    g = math.gcd(rate_in, rate_out)
+    up, down = rate_out // g, rate_in // g
+    if up == down:
+        yield from blocks
+        return
+
+    pad = _context_samples(up, down)
+    history = np.zeros(pad, dtype=np.float32)
+    pending = np.zeros(0, dtype=np.float32)
+    for block in blocks:
+        pending = np.concatenate((pending, block))
+        ready = ((len(pending) - pad) // down) * down
+        if ready <= 0:
+            continue
+        segment = np.concatenate((history, pending[:ready + pad]))
+        start = pad * up // down
+        yield resample_poly(segment, up, down).astype(np.float32, copy=False)[start:start + ready * up // down]
+        history = np.concatenate((history, pending[:ready]))[-pad:]
+        pending = pending[ready:]
+
+    if len(pending):
+        segment = np.concatenate((history, pending, np.zeros(pad, dtype=np.float32)))
+        start = pad * up // down
+        yield resample_poly(segment, up, down).astype(np.float32, copy=False)[start:start + math.ceil(len(pending) * up / down)]
+
+
+def _mono_blocks(sound_file: sf.SoundFile, block_frames: int) -> Iterator[np.ndarray]:
+    buffer = np.empty((block_frames, sound_file.channels), dtype=np.float32)
+    while True:
+        frames = sound_file.read(block_frames, dtype="float32", always_2d=True, out=buffer)
+        if not len(frames):
+            return
+        if sound_file.channels == 1:
+            yield frames[:, 0].copy()
+        else:
+            yield frames.mean(axis=1, dtype=np.float32)
+
+
+def normalize_to_pcm16(
+    audio: bytes,
+    target_rate: int = TARGET_SAMPLE_RATE,
+    block_seconds: float = 2.0,
+) -> np.ndarray:
+    """Decode any soundfile-readable clip to mono int16 at `target_rate`, block by block.
+
+    The result is written straight into one preallocated int16 array; scaling and
+    clipping happen in place on each float32 block.
+    """
+    with sf.SoundFile(io.BytesIO(audio)) as sound_file:
+        rate_in = sound_file.samplerate
+        total_out = math.ceil(sound_file.frames * target_rate / rate_in)
+        out = np.empty(total_out, dtype=np.int16)
+        position = 0
+        block_frames = max(int(rate_in * block_seconds), 1)
+        for block in resample_blocks(_mono_blocks(sound_file, block_frames), rate_in, target_rate):
+            np.clip(block, -1.0, 1.0, out=block)
+            block *= 32767
+            end = min(position + len(block), total_out)
+            np.copyto(out[position:end], block[:end - position], casting="unsafe")
+            position = end
+    return out[:position]
+
+
+def normalize_to_pcm_bytes(audio: bytes, target_rate: int = TARGET_SAMPLE_RATE) -> bytes:
+    """Mono s16le PCM bytes ready to feed a realtime media track."""
+    return normalize_to_pcm16(audio, target_rate).tobytes()
+
+
+def _legacy_normalize(audio: bytes, target_rate: int = TARGET_SAMPLE_RATE) -> bytes:
+    """The previous staudio_conversation path: full read, FFT resample, WAV written out."""
+    from scipy.signal import resample
+
+    data, samplerate = sf.read(io.BytesIO(audio))
+    if len(data.shape) > 1 and data.shape[1] > 1:
+        data = data.mean(axis=1)
+    if samplerate != target_rate:
+        data = resample(data, int(len(data) * target_rate / samplerate))
+    data_int16 = np.int16(np.clip(data, -1.0, 1.0) * 32767)
+    buffer = io.BytesIO()
+    sf.write(buffer, data_int16, target_rate, format="WAV", subtype="PCM_16", endian="LITTLE")
+    return buffer.getvalue()
+
+
+def _synthetic_clip(seconds: float, rate: int = 44100, channels: int = 2) -> bytes:
+    t = np.arange(int(seconds * rate), dtype=np.float32) / rate
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * np.random.default_rng(0).standard_normal(len(t)).astype(np.float32)
+    data = np.repeat(tone[:, None], channels, axis=1)
+    buffer = io.BytesIO()
+    sf.write(buffer, data, rate, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+def _measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def benchmark(durations=(10, 60, 600), rate: int = 44100) -> list:
+    """Time and peak memory of the legacy and streaming paths on synthetic stereo clips."""
+    results = []
+    for seconds in durations:
+        clip = _synthetic_clip(seconds, rate)
+        legacy_time, legacy_peak = _measure(_legacy_normalize, clip)
+        stream_time, stream_peak = _measure(normalize_to_pcm_bytes, clip)
+        results.append({
+            "seconds": seconds,
+            "legacy_s": legacy_time,
+            "streaming_s": stream_time,
+            "legacy_peak_mb": legacy_peak / 2**20,
+            "streaming_peak_mb": stream_peak / 2**20,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark():
+        print(
+            f"{row['seconds']:>4}s clip: legacy {row['legacy_s']:.2f}s / {row['legacy_peak_mb']:.0f} MB peak, "
+            f"streaming {row['streaming_s']:.2f}s / {row['streaming_peak_mb']:.0f} MB peak"
+        )
@@ -0,0 +1,206 @@
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SAFE_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+@dataclass
+class _Artifact:
+    path: str
+    size: int
+    mtime: float
+
+
+class AudioArtifactStore:
+    """Temporary audio files scoped per session, with size/age quotas and background eviction.
+
+    Files live under `<root>/<session_id>/`. A session is capped at
+    `session_max_bytes` (its oldest files go first when a new one is saved); the
+    whole store is capped at `max_bytes` and files older than `max_age` seconds are
+    deleted by `evict()`, which the sweeper thread runs every `sweep_interval`.
+    A session directory handed out by `reserve()` is kept for `max_age` even while
+    empty, so the caller can still write its file.
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        max_bytes: int = 200 * 2**20,
+        session_max_bytes: int = 50 * 2**20,
+        max_age: float = 3600.0,
+        sweep_interval: float = 60.0,
+    ):
+        self.root = root or os.path.join(tempfile.gettempdir(), "audio_artifacts")
+        self.max_bytes = max_bytes
+        self.session_max_bytes = session_max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stats = {"saved": 0, "evicted": 0, "evicted_bytes": 0}
+        self._reserved: Dict[str, float] = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _session_dir(self, session_id: str) -> str:
+        name = _SAFE_NAME_RE.sub("_", session_id or "default")
+        if not name.strip("."):
+            # "." and ".." would resolve to the root or outside it
+            name = "_" * len(name)
+        path = os.path.join(self.root, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def session_dir(self, session_id: str) -> str:
+        with self._lock:
+            return self._session_dir(session_id)
+
+    def reserve(self, session_id: str, prefix: str = "audio", extension: str = "wav") -> str:
+        """A fresh path in the session's directory for callers that must hand a file path to a library."""
+        with self._lock:
+            directory = self._session_dir(session_id)
+            self._reserved[directory] = time.time()
+        return os.path.join(directory, f"{prefix}_{uuid.uuid4()}.{extension}")
+
+    def save(self, session_id: str, data: bytes, prefix: str = "audio", extension: str = "wav") -> str:
+        """Write `data` under the session and enforce its quota; returns the path."""
+        with self._lock:
+            # Written under the lock so evict() can't remove the directory in between
+            path = os.path.join(self._session_dir(session_id), f"{prefix}_{uuid.uuid4()}.{extension}")
+            with open(path, "wb") as f:
+                f.write(data)
+        self.stats["saved"] += 1
+        self.enforce_session_quota(session_id, keep=path)
+        return path
+
+    def release(self, path: Optional[str]) -> None:
+        """Delete an artifact as soon as the caller is done with it."""
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear_session(self, session_id: str) -> None:
+        for artifact in self._artifacts(self.session_dir(session_id)):
+            self._delete(artifact)
+
+    def _artifacts(self, directory: str) -> List[_Artifact]:
+        artifacts = []
+        for dirpath, _, filenames in os.walk(directory):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                artifacts.append(_Artifact(path, stat.st_size, stat.st_mtime))
+        return artifacts
+
+    def _delete(self, artifact: _Artifact) -> None:
+        try:
+            os.remove(artifact.path)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            # Still open elsewhere (e.g. on Windows); try again on the next sweep
+            logger.debug("Could not evict %s: %s", artifact.path, e)
+            return
+        self.stats["evicted"] += 1
+        self.stats["evicted_bytes"] += artifact.size
+
+    def _trim(self, artifacts: List[_Artifact], limit: int, keep: Optional[str] = None) -> None:
+        total = sum(a.size for a in artifacts)
+        for artifact in sorted(artifacts, key=lambda a: a.mtime):
+            if total <= limit:
+                break
+            if artifact.path == keep:
+                continue
+            self._delete(artifact)
+            total -= artifact.size
+
+    def enforce_session_quota(self, session_id: str, keep: Optional[str] = None) -> None:
+        with self._lock:
+            self._trim(self._artifacts(self._session_dir(session_id)), self.session_max_bytes, keep)
+
+    def evict(self) -> None:
+        """Delete expired files, then the oldest files until the store fits `max_bytes`."""
+        with self._lock:
+            now = time.time()
+            remaining = []
+            for artifact in self._artifacts(self.root):
+                if now - artifact.mtime > self.max_age:
+                    self._delete(artifact)
+                else:
+                    remaining.append(artifact)
+            self._trim(remaining, self.max_bytes)
+            for path, reserved in list(self._reserved.items()):
+                if now - reserved > self.max_age:
+                    del self._reserved[path]
+            for entry in os.scandir(self.root):
+                if entry.is_dir() and entry.path not in self._reserved:
+                    try:
+                        os.rmdir(entry.path)  # only succeeds for empty session directories
+                    except OSError:
+                        pass
+
+    def usage(self) -> int:
+        return sum(a.size for a in self._artifacts(self.root))
+
+    def start_sweeper(self) -> None:
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(self.sweep_interval):
+                try:
+                    self.evict()
+                except Exception as e:
+                    logger.warning("Audio artifact eviction failed: %s", e)
+
+        self._sweeper = threading.Thread(target=run, name="audio-artifact-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+
+
+_default_store: Optional[AudioArtifactStore] = None
+_default_lock = threading.Lock()
+
+
+def get_audio_store() -> AudioArtifactStore:
+    """Process-wide store configured from AUDIO_STORE_* environment variables, sweeper running."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = AudioArtifactStore(
+                root=os.getenv("AUDIO_STORE_DIR") or None,
+                max_bytes=int(float(os.getenv("AUDIO_STORE_MAX_MB", "200")) * 2**20),
+                session_max_bytes=int(float(os.getenv("AUDIO_STORE_SESSION_MAX_MB", "50")) * 2**20),
+                max_age=float(os.getenv("AUDIO_STORE_MAX_AGE_SECONDS", "3600")),
+                sweep_interval=float(os.getenv("AUDIO_STORE_SWEEP_SECONDS", "60")),
+            )
+            _default_store.evict()
+            _default_store.start_sweeper()
+        return _default_store
+
+
+def current_session_id() -> str:
+    """The Streamlit browser session id when running under Streamlit, else "default"."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return "default"
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "default"
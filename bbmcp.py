@@ -5,11 +5,13 @@ import streamlit.components.v1 as components
 from openai import AzureOpenAI, OpenAIError
 
 import base64
+import io
 import os
 from gtts import gTTS
-import tempfile
-import uuid
 from dotenv import load_dotenv
+from audio_store import current_session_id, get_audio_store
+from tts_stream import StreamingTTS
+from transcribe_prep import transcribe_with_vad
 
 # Load environment variables
 load_dotenv()
@@ -28,58 +30,43 @@ client = AzureOpenAI(
 )
 
 def save_audio_file(audio_data, extension="wav"):
-    """Save audio bytes to a temporary file."""
-    temp_file = os.path.join(tempfile.gettempdir(), f"audio_{uuid.uuid4()}.{extension}")
-    with open(temp_file, "wb") as f:
-        f.write(audio_data)
-    return temp_file
-
-def transcribe_audio(audio_file_path):
-    """Transcribe audio using Azure OpenAI Whisper."""
-    with open(audio_file_path, "rb") as audio_file:
-        response = client.audio.transcriptions.create(
-            file=audio_file,
+    """Save audio bytes to a session-scoped file in the audio artifact store (evicted by age/size)."""
+    return get_audio_store().save(current_session_id(), audio_data, "audio", extension)
+
+def transcribe_audio(audio):
+    """Transcribe audio (raw bytes or a file path) using Azure OpenAI Whisper."""
+    if isinstance(audio, (bytes, bytearray)):
+        audio = bytes(audio)
+    else:
+        with open(audio, "rb") as audio_file:
+            audio = audio_file.read()
+    # Silence is trimmed and long recordings are split at pauses and transcribed concurrently
+    return transcribe_with_vad(
+        audio,
+        lambda segment: client.audio.transcriptions.create(
+            file=segment,
             model=WHISPER_DEPLOYMENT_NAME,
             response_format="text"
         )
-    return response
+    )
 
 def generate_audio_response(text):
-    """Generate audio response using gTTS."""
+    """Generate MP3 bytes using gTTS."""
     tts = gTTS(text=text, lang="en")
-    temp_file = os.path.join(tempfile.gettempdir(), f"response_{uuid.uuid4()}.mp3")
-    tts.save(temp_file)
-    return temp_file
-
-def generate_audio_response_gpt(text):
-    """Generate audio response using gTTS."""
-    # tts = gTTS(text=text, lang="en")
-    url = os.getenv("AZURE_OPENAI_ENDPOINT") + "/openai/deployments/gpt-4o-mini-tts/audio/speech?api-version=2025-03-01-preview"  
-  
-    headers = {  
-        "Content-Type": "application/json",  
-        "Authorization": f"Bearer {os.environ['AZURE_OPENAI_KEY']}"  
-    }  
-    
-    data = {  
-        "model": "gpt-4o-mini-tts",  
-        "input": text,  
-        "voice": "alloy"  
-    }  
-    
-    response = requests.post(url, headers=headers, json=data)  
-    
-    print(response.status_code)  
-    # print(response.content)  # audio bytes or error message 
-    temp_file = os.path.join(tempfile.gettempdir(), f"response_{uuid.uuid4()}.mp3")
-    # response.content.save(temp_file)
-    if response.status_code == 200:  
-        with open(temp_file, "wb") as f:  
-            f.write(response.content)  
-        print("MP3 file saved successfully.")  
-    else:  
-        print(f"Error: {response.status_code}\n{response.text}")
-    return temp_file
+    buffer = io.BytesIO()
+    tts.write_to_fp(buffer)
+    return buffer.getvalue()
+
+def generate_audio_response_gpt(text, on_chunk=None):
+    """Generate MP3 bytes using Azure OpenAI TTS, synthesizing sentence chunks in parallel."""
+    tts = StreamingTTS(voice="alloy", speed=None)
+    try:
+        audio_bytes = tts.synthesize(text, on_chunk=on_chunk)
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+    print(tts.stats.summary())
+    return audio_bytes
 
 def retrieve_relevant_content(query, json_data):
     """Retrieve relevant content from JSON data based on query keywords."""
@@ -337,8 +324,7 @@ def main():
         with st.chat_message("user"):
             st.audio(audio_value)
             with st.spinner("Transcribing audio..."):
-                audio_file_path = save_audio_file(audio_value.getvalue())
-                transcription = transcribe_audio(audio_file_path)
+                transcription = transcribe_audio(audio_value.getvalue())
                 st.markdown(transcription)
                 
                 # Save user message
@@ -363,12 +349,11 @@ def main():
                 else:
                     #response_text = generate_chat_response(transcription, context)
                     print("Invalid option selected.")
-                # response_audio_path = generate_audio_response(response_text)
-                response_audio_path = generate_audio_response_gpt(response_text)
+                # audio_bytes = generate_audio_response(response_text)
+                audio_bytes = generate_audio_response_gpt(response_text)
                 
                 st.markdown(response_text)
-                with open(response_audio_path, "rb") as f:
-                    audio_bytes = f.read()
+                if audio_bytes:
                     audio_base64 = base64.b64encode(audio_bytes).decode()
                     audio_html = f"""
                     <audio controls autoplay>
@@ -384,9 +369,5 @@ def main():
                     "audio": audio_bytes
                 })
 
-            # Clean up temporary files
-            os.remove(audio_file_path)
-            os.remove(response_audio_path)
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,133 @@
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Matches agent/search citation markers such as 【3:0†source】; like the original
+# str.replace loop, only `†source` markers are linked, whatever the chunk id looks like
+CITATION_MARKER_RE = re.compile(r"【([^】†]*)†source】")
+
+DEFAULT_CONTENT_BUDGET = 500
+
+
+def build_citation_index(citations: Optional[List[Dict]]) -> Dict[str, Dict]:
+    """Map chunk_id -> citation; for a repeated chunk the last citation with a URL wins."""
+    index: Dict[str, Dict] = {}
+    for citation in citations or []:
+        if citation.get("url"):
+            index[str(citation.get("chunk_id", ""))] = citation
+    return index
+
+
+def hyperlink_citation_markers(response: str, citations: Optional[List[Dict]]) -> str:
+    """Replace every citation marker with a hyperlink in a single regex pass."""
+    index = build_citation_index(citations)
+    if not index or "【" not in response:
+        return response
+
+    parts: List[str] = []
+    last = 0
+    for match in CITATION_MARKER_RE.finditer(response):
+        citation = index.get(match.group(1))
+        if citation is None:
+            continue
+        url = citation["url"]
+        parts.append(response[last:match.start()])
+        parts.append(f"<a href='{url}' target='_blank'>{match.group(0)}</a>")
+        last = match.end()
+    if not parts:
+        return response
+    parts.append(response[last:])
+    return "".join(parts)
+
+
+def truncate_content(content: Optional[str], budget: int = DEFAULT_CONTENT_BUDGET) -> str:
+    """Trim citation content to at most `budget` characters on a word boundary."""
+    content = content or ""
+    if budget <= 0 or len(content) <= budget:
+        return content
+    cut = content.rfind(" ", 0, budget)
+    if cut <= 0:
+        cut = budget
+    return content[:cut].rstrip() + "..."
+
+
+def format_citations_html(
+    citations: Optional[List[Dict]],
+    content_budget: int = DEFAULT_CONTENT_BUDGET,
+) -> Tuple[str, str]:
+    """Build (link list, citation details) HTML for search citations.
+
+    Citations that point at a URL already listed are dropped and each
+    citation's content is truncated to `content_budget` characters.
+    """
+    links: List[str] = []
+    details: List[str] = []
+    seen_urls = set()
+    for row in citations or []:
+        url = row.get("url") or ""
+        if url:
+            if url in seen_urls:
+                continue
+            seen_urls.add(url)
+        chunk_id = row.get("chunk_id", "")
+        links.append(f"<br> <a href='{url}' target='_blank'>[{url}_{chunk_id}]</a>")
+        details.append(
+            f"<br><br> Title: {row.get('title', '')} <br> URL: {url} "
+            f"<br> Chunk ID: {chunk_id} "
+            f"<br> Content: {truncate_content(row.get('content'), content_budget)} "
+            f"<br> ------------------------------------------------------------------------------------------ <br>\n"
+        )
+    return "".join(links), "".join(details)
+
+
+def _legacy_hyperlink(response: str, citations: List[Dict]) -> str:
+    marker_to_url = {}
+    for citation in citations:
+        marker = f"【{citation.get('chunk_id', '')}†source】"
+        url = citation.get('url', '')
+        if url:
+            marker_to_url[marker] = f"<a href='{url}' target='_blank'>{marker}</a>"
+    for marker, link in marker_to_url.items():
+        response = response.replace(marker, link)
+    return response
+
+
+def benchmark(num_citations: int = 200, sentences: int = 2000, repeat: int = 20) -> Dict[str, float]:
+    """Compare the single-pass formatter against per-marker str.replace."""
+    citations = [
+        {"chunk_id": f"{i}:0", "url": f"https://example.com/doc{i % 50}", "title": f"Doc {i}", "content": "lorem ipsum " * 100}
+        for i in range(num_citations)
+    ]
+    response = " ".join(
+        f"Sentence {n} about an incident 【{n % num_citations}:0†source】." for n in range(sentences)
+    )
+
+    assert hyperlink_citation_markers(response, citations) == _legacy_hyperlink(response, citations)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        _legacy_hyperlink(response, citations)
+    legacy = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        hyperlink_citation_markers(response, citations)
+    single_pass = (time.perf_counter() - start) / repeat
+
+    return {
+        "response_chars": len(response),
+        "citations": num_citations,
+        "legacy_ms": legacy * 1000,
+        "single_pass_ms": single_pass * 1000,
+        "speedup": legacy / single_pass if single_pass else float("inf"),
+    }
+
+
+if __name__ == "__main__":
+    for n in (10, 100, 500):
+        result = benchmark(num_citations=n)
+        print(
+            f"citations={result['citations']:>4} chars={result['response_chars']:>7} "
+            f"legacy={result['legacy_ms']:.2f}ms single_pass={result['single_pass_ms']:.2f}ms "
+            f"speedup={result['speedup']:.1f}x"
+        )
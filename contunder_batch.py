@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+
+import requests
+
+API_VERSION = "2025-05-01-preview"
+TERMINAL_STATUSES = {"succeeded", "failed", "completed"}
+
+
+@dataclass
+class DocumentResult:
+    """Outcome of analyzing one document in a batch."""
+
+    source: str
+    doc_hash: str
+    status: str
+    payload: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cached: bool = False
+    elapsed: float = 0.0
+    polls: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def document_hash(analyzer_id: str, document: Union[str, bytes]) -> str:
+    """Content hash for bytes, URL hash for URLs; always scoped to the analyzer.
+
+    A URL hash says nothing about the document behind it, so URL results are only
+    served from the store for `BatchAnalyzer.url_cache_ttl` seconds.
+    """
+    digest = hashlib.sha256(analyzer_id.encode("utf-8") + b"\0")
+    digest.update(document if isinstance(document, bytes) else document.strip().encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultStore:
+    """Completed analyzer results persisted as <hash>.json under a directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, doc_hash: str) -> str:
+        return os.path.join(self.directory, f"{doc_hash}.json")
+
+    def get(self, doc_hash: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Stored payload, or None if missing or older than `max_age` seconds."""
+        try:
+            if max_age is not None and time.time() - os.path.getmtime(self._path(doc_hash)) > max_age:
+                return None
+            with open(self._path(doc_hash), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, doc_hash: str, payload: Dict[str, Any]) -> None:
+        # Write then rename so a crash never leaves a half-written result behind
+        tmp_path = self._path(doc_hash) + f".{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self._path(doc_hash))
+
+
+def _status_of(payload: Dict[str, Any]) -> str:
+    return (payload.get("status") or payload.get("result", {}).get("status") or "").strip().lower()
+
+
+def _retry_after(response: requests.Response, default: float) -> float:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+    return default
+
+
+class BatchAnalyzer:
+    """Analyze many documents with Azure Content Understanding concurrently.
+
+    Up to `max_concurrency` documents are in flight at once. Each document is
+    polled at the `Operation-Location` returned by the analyze call, sleeping for
+    the service's `Retry-After` (falling back to `poll_interval`). Results are
+    yielded as each document finishes, and successful results are written to
+    `cache_dir` keyed by document hash so re-analysis is a cache hit. Results for
+    raw bytes are keyed by content and never go stale; results for URLs are reused
+    for `url_cache_ttl` seconds (CONT_UNDER_URL_CACHE_TTL, default 3600; 0 disables).
+    """
+
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        subscription_key: Optional[str] = None,
+        analyzer_id: str = "prebuilt-documentAnalyzer",
+        max_concurrency: int = 4,
+        poll_interval: float = 2.0,
+        timeout: float = 300.0,
+        cache_dir: Optional[str] = None,
+        session: Optional[requests.Session] = None,
+        url_cache_ttl: Optional[float] = None,
+    ):
+        self.endpoint = (endpoint or os.getenv("CONT_UNDER_ENDPOINT") or "").rstrip("/")
+        self.subscription_key = subscription_key or os.getenv("CONT_UNDER_KEY")
+        if not self.endpoint:
+            raise ValueError("CONT_UNDER_ENDPOINT environment variable is not set")
+        if not self.subscription_key:
+            raise ValueError("CONT_UNDER_KEY environment variable is not set")
+        self.analyzer_id = analyzer_id
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        cache_dir = cache_dir if cache_dir is not None else os.getenv("CONT_UNDER_CACHE_DIR", ".contunder_cache")
+        self.store = ResultStore(cache_dir) if cache_dir else None
+        self.url_cache_ttl = (
+            url_cache_ttl if url_cache_ttl is not None else float(os.getenv("CONT_UNDER_URL_CACHE_TTL", "3600"))
+        )
+        # requests.Session is not thread-safe for mutation, but concurrent requests on a shared
+        # session's connection pool are fine. A caller's session keeps its own adapters; our
+        # own session gets a pool sized to the concurrency limit.
+        if session is not None:
+            self.session = session
+        else:
+            self.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency * 2)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {"Ocp-Apim-Subscription-Key": self.subscription_key}
+
+    def submit(self, document: Union[str, bytes]) -> requests.Response:
+        """Start analysis of a URL or raw document bytes."""
+        url = f"{self.endpoint}/contentunderstanding/analyzers/{self.analyzer_id}:analyze"
+        if isinstance(document, bytes):
+            headers = {**self._headers, "Content-Type": "application/octet-stream"}
+            response = self.session.post(url, params={"api-version": API_VERSION}, headers=headers, data=document, timeout=60)
+        else:
+            headers = {**self._headers, "Content-Type": "application/json"}
+            response = self.session.post(url, params={"api-version": API_VERSION}, headers=headers, json={"url": document}, timeout=60)
+        response.raise_for_status()
+        return response
+
+    def _operation_url(self, response: requests.Response) -> str:
+        operation_location = response.headers.get("Operation-Location")
+        if operation_location:
+            return operation_location
+        body = response.json() if response.content else {}
+        result_id = body.get("resultId") or body.get("operationId") or body.get("id") or body.get("requestId")
+        if not result_id:
+            raise ValueError("Analyze response has neither an Operation-Location header nor a result id")
+        return f"{self.endpoint}/contentunderstanding/analyzerResults/{result_id}?api-version={API_VERSION}"
+
+    def poll(self, submit_response: requests.Response) -> tuple[Dict[str, Any], int]:
+        """Poll until the analysis reaches a terminal status. Returns (payload, polls)."""
+        operation_url = self._operation_url(submit_response)
+        deadline = time.monotonic() + self.timeout
+        delay = _retry_after(submit_response, self.poll_interval)
+        polls = 0
+        while True:
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f"Analyzer result at {operation_url} did not complete within {self.timeout:.0f} seconds.")
+            time.sleep(delay)
+            response = self.session.get(operation_url, headers=self._headers, timeout=60)
+            polls += 1
+            if response.status_code == 429:
+                delay = _retry_after(response, self.poll_interval)
+                continue
+            response.raise_for_status()
+            payload = response.json()
+            if _status_of(payload) in TERMINAL_STATUSES:
+                return payload, polls
+            delay = _retry_after(response, self.poll_interval)
+
+    def analyze(self, document: Union[str, bytes], source: Optional[str] = None) -> DocumentResult:
+        """Analyze one document, consulting the result store first."""
+        source = source or (document if isinstance(document, str) else f"<{len(document)} bytes>")
+        doc_hash = document_hash(self.analyzer_id, document)
+        is_url = isinstance(document, str)
+        start = time.perf_counter()
+        if self.store and not (is_url and self.url_cache_ttl <= 0):
+            cached = self.store.get(doc_hash, max_age=self.url_cache_ttl if is_url else None)
+            if cached is not None:
+                return DocumentResult(source, doc_hash, _status_of(cached) or "succeeded", cached, cached=True,
+                                      elapsed=time.perf_counter() - start)
+        try:
+            submit_response = self.submit(document)
+            submitted = time.perf_counter()
+            payload, polls = self.poll(submit_response)
+        except Exception as exc:
+            return DocumentResult(source, doc_hash, "error", error=str(exc), elapsed=time.perf_counter() - start)
+        status = _status_of(payload)
+        if self.store and status in ("succeeded", "completed") and not (is_url and self.url_cache_ttl <= 0):
+            self.store.put(doc_hash, payload)
+        finished = time.perf_counter()
+        return DocumentResult(
+            source, doc_hash, status, payload, elapsed=finished - start, polls=polls,
+            timings={"submit": submitted - start, "poll": finished - submitted},
+        )
+
+    def analyze_many(self, documents: Iterable[Union[str, bytes]]) -> Iterator[DocumentResult]:
+        """Analyze documents concurrently, yielding each result as soon as it is ready."""
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = [pool.submit(self.analyze, document) for document in documents]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_INSTRUCTIONS = "You are a helpful AI assistant responding in natural, engaging language."
+
+Summarizer = Callable[[str, List[Dict], int], str]
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("o200k_base")
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count with tiktoken when installed, otherwise the usual ~4 characters per token."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """Cut `text` to at most `max_tokens`, keeping the start ("head") or the end ("tail")."""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    encoding = _encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        kept = tokens[:max_tokens - 1] if keep == "head" else tokens[-(max_tokens - 1):]
+        text = encoding.decode(kept)
+    else:
+        chars = (max_tokens - 1) * 4
+        text = text[:chars] if keep == "head" else text[-chars:]
+    return text + "…" if keep == "head" else "…" + text
+
+
+def format_turn(turn: Dict, max_tokens: Optional[int] = None) -> str:
+    line = f"{turn['role'].capitalize()}: {turn['content']}"
+    return truncate_to_tokens(line, max_tokens) if max_tokens else line
+
+
+def extractive_summary(previous_summary: str, turns: List[Dict], max_tokens: int) -> str:
+    """Fallback summarizer: first sentence of each turn appended to the previous summary."""
+    notes = []
+    for turn in turns:
+        content = str(turn["content"]).strip()
+        first = content.split(". ", 1)[0][:200]
+        notes.append(f"{turn['role'].capitalize()}: {first}")
+    summary = " ".join(filter(None, [previous_summary, " ".join(notes)]))
+    return truncate_to_tokens(summary, max_tokens, keep="tail")
+
+
+def _turn_key(turn: Dict) -> str:
+    return hashlib.sha1(f"{turn['role']}\x00{turn['content']}".encode("utf-8")).hexdigest()
+
+
+class ConversationMemory:
+    """Build session instructions from RAG context and history under a hard token budget.
+
+    The last `keep_turns` turns are kept verbatim. Older turns are folded into a
+    running summary by `summarizer` on a background thread, so a turn never waits on
+    summarization; until the summary catches up, the not-yet-summarized turns are
+    included verbatim and trimmed oldest-first to fit. The prefix (base instructions,
+    RAG context and summary) is cached and only rebuilt when one of them changes.
+    """
+
+    def __init__(
+        self,
+        keep_turns: int = 6,
+        max_tokens: int = 4000,
+        summary_tokens: int = 400,
+        turn_tokens: int = 300,
+        rag_share: float = 0.5,
+        summary_every: int = 2,
+        summarizer: Optional[Summarizer] = None,
+        base_instructions: str = DEFAULT_BASE_INSTRUCTIONS,
+    ):
+        self.keep_turns = max(1, keep_turns)
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.turn_tokens = turn_tokens
+        self.rag_share = rag_share
+        self.summary_every = max(1, summary_every)
+        self.summarizer = summarizer or extractive_summary
+        self.base_instructions = base_instructions
+
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+        self._pending: Optional[Future] = None
+        self.summary = ""
+        self.summarized_turns = 0
+        self._summarized_key: Optional[str] = None
+        self._summary_version = 0
+        self._prefix_key = None
+        self._prefix = ""
+        self.stats = {"prefix_builds": 0, "prefix_hits": 0, "summaries": 0, "summary_errors": 0, "last_tokens": 0}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reset_locked()
+
+    def _reset_locked(self) -> None:
+        self.summary = ""
+        self.summarized_turns = 0
+        self._summarized_key = None
+        self._summary_version += 1
+
+    def _check_history(self, history: List[Dict]) -> None:
+        """Forget the summary if `history` is not a continuation of what was summarized."""
+        count = self.summarized_turns
+        if count and (len(history) < count or _turn_key(history[count - 1]) != self._summarized_key):
+            self._reset_locked()
+
+    def _schedule_summary(self, older: List[Dict]) -> None:
+        if self._pending is not None and not self._pending.done():
+            return
+        start = self.summarized_turns
+        turns = older[start:]
+        previous = self.summary
+        version = self._summary_version
+
+        def run():
+            try:
+                summary = self.summarizer(previous, turns, self.summary_tokens)
+            except Exception as e:
+                logger.warning("History summarization failed: %s", e)
+                self.stats["summary_errors"] += 1
+                return
+            with self._lock:
+                if version != self._summary_version:
+                    return  # history was reset meanwhile
+                self.summary = truncate_to_tokens(summary.strip(), self.summary_tokens, keep="tail")
+                self.summarized_turns = start + len(turns)
+                self._summarized_key = _turn_key(turns[-1])
+                self._summary_version += 1
+                self.stats["summaries"] += 1
+
+        self._pending = self._executor.submit(run)
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until the in-flight summary refresh (if any) finishes."""
+        if self._pending is not None:
+            self._pending.exception(timeout=timeout)
+
+    def _build_prefix(self, rag_context: Optional[str], summary: str) -> str:
+        key = (self.base_instructions, rag_context, self._summary_version)
+        if key == self._prefix_key:
+            self.stats["prefix_hits"] += 1
+            return self._prefix
+        prefix = self.base_instructions
+        if rag_context:
+            rag_budget = int(self.max_tokens * self.rag_share)
+            prefix += f"\n\nUse the following context to answer the user's questions:\n{truncate_to_tokens(rag_context, rag_budget)}"
+        if summary:
+            prefix += f"\n\nSummary of the earlier conversation:\n{summary}"
+        self._prefix_key, self._prefix = key, prefix
+        self.stats["prefix_builds"] += 1
+        return prefix
+
+    def build_instructions(self, rag_context: Optional[str] = None, conversation_history: Optional[List[Dict]] = None) -> str:
+        history = conversation_history or []
+        with self._lock:
+            self._check_history(history)
+            older = history[:-self.keep_turns] if len(history) > self.keep_turns else []
+            # Refresh once a user/assistant pair has aged out, not on every message
+            if len(older) - self.summarized_turns >= self.summary_every:
+                self._schedule_summary(older)
+            unsummarized = older[self.summarized_turns:]
+            prefix = self._build_prefix(rag_context, self.summary)
+
+        lines = [format_turn(turn, self.turn_tokens) for turn in unsummarized + history[-self.keep_turns:]]
+        header = "\n\nConversation so far:\n"
+        budget = self.max_tokens - estimate_tokens(prefix) - estimate_tokens(header)
+        costs = [estimate_tokens(line) + 1 for line in lines]
+        total = sum(costs)
+        first = 0
+        # Drop the oldest verbatim lines until the history fits
+        while first < len(lines) and total > budget:
+            total -= costs[first]
+            first += 1
+        instructions = prefix
+        if lines[first:]:
+            instructions += header + "\n".join(lines[first:])
+        instructions = truncate_to_tokens(instructions, self.max_tokens)
+        self.stats["last_tokens"] = estimate_tokens(instructions)
+        return instructions
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
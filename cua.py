@@ -1,22 +1,51 @@
 import asyncio
 import base64
 import inspect
-import io
 import json
 import re
+import time
 
 import openai
-import PIL
+
+from cua_actions import execute_actions
+from frame_diff import FrameDiffer, FrameStats, FrameStep, estimate_image_tokens
+from screenshot_codec import ScreenshotEncoder, encode_image, to_image
 
 
 class Scaler:
-    """Wrapper for a computer that performs resizing and coordinate translation."""
+    """Wrapper for a computer that performs resizing and coordinate translation.
+
+    Computers that implement `screenshot_image()` (returning a PIL image or a
+    screenshot_codec.RawFrame) are scaled and encoded straight from pixels; others
+    fall back to decoding the base64 PNG from `screenshot()`.
+
+    With a `differ`, a frame identical to the previous one reuses the previous
+    payload instead of being re-encoded, and `frame_stats` records every step. With
+    `crop_changes`, a small changed region is also offered at full screen
+    resolution as `last_crop` (box in screenshot coordinates, data URL).
+    """
 
-    def __init__(self, computer, dimensions: tuple[int, int] | None = None):
+    def __init__(
+        self,
+        computer,
+        dimensions: tuple[int, int] | None = None,
+        encoder: ScreenshotEncoder | None = None,
+        differ: FrameDiffer | None = None,
+        crop_changes: bool = False,
+        crop_max_fraction: float = 0.25,
+    ):
         self.computer = computer
         self.size = dimensions
         self.screen_width = -1
         self.screen_height = -1
+        self.encoder = encoder or ScreenshotEncoder()
+        self.differ = differ
+        self.crop_changes = crop_changes
+        self.crop_max_fraction = crop_max_fraction
+        self.frame_stats = FrameStats()
+        self.last_action = "screenshot"
+        self.last_crop = None
+        self._last_payload = None
 
     @property
     def environment(self):
@@ -37,58 +66,87 @@ class Scaler:
                 self.size = (int(width * scale), int(height * scale))
         return self.size
 
+    @property
+    def mime_type(self) -> str:
+        return self.encoder.mime_type
+
+    async def _grab(self):
+        if hasattr(self.computer, "screenshot_image"):
+            image = self.computer.screenshot_image()
+            return await image if inspect.isawaitable(image) else image
+        return await self.computer.screenshot()
+
     async def screenshot(self) -> str:
-        # Take a screenshot from the actual computer
-        screenshot = await self.computer.screenshot()
-        screenshot = base64.b64decode(screenshot)
-        buffer = io.BytesIO(screenshot)
-        image = PIL.Image.open(buffer)
-        # Scale the screenshot
+        # Take a screenshot from the actual computer, then scale and encode it in one pass
+        image = to_image(await self._grab())
         self.screen_width, self.screen_height = image.size
-        width, height = self.dimensions
-        ratio = min(width / self.screen_width, height / self.screen_height)
-        new_width = int(self.screen_width * ratio)
-        new_height = int(self.screen_height * ratio)
-        new_size = (new_width, new_height)
-        resized_image = image.resize(new_size, PIL.Image.Resampling.LANCZOS)
-        image = PIL.Image.new("RGB", (width, height), (0, 0, 0))
-        image.paste(resized_image, (0, 0))
-        buffer = io.BytesIO()
-        image.save(buffer, format="PNG")
-        buffer.seek(0)
-        data = bytearray(buffer.getvalue())
-        return base64.b64encode(data).decode("utf-8")
+        self.last_crop = None
+        if self.differ is None:
+            return self.encoder.encode_base64(image, self.dimensions)
+
+        delta = self.differ.update(image)
+        skipped = not delta.changed and self._last_payload is not None
+        if not skipped:
+            self._last_payload = self.encoder.encode_base64(image, self.dimensions)
+        step = FrameStep(
+            self.last_action, delta.changed, delta.changed_fraction, delta.phash_distance,
+            skipped, len(self._last_payload), estimate_image_tokens(*self.dimensions),
+        )
+        ratio = min(self.dimensions[0] / self.screen_width, self.dimensions[1] / self.screen_height)
+        if self.crop_changes and delta.bbox and ratio < 1 and delta.changed_fraction <= self.crop_max_fraction:
+            crop = encode_image(image.crop(delta.bbox), self.encoder.image_format, self.encoder.quality)
+            box = tuple(int(v * ratio) for v in delta.bbox)
+            self.last_crop = (box, f"data:{self.mime_type};base64,{base64.b64encode(crop).decode('ascii')}")
+            step.crop, step.crop_bytes = box, len(crop)
+            step.crop_tokens = estimate_image_tokens(delta.bbox[2] - delta.bbox[0], delta.bbox[3] - delta.bbox[1])
+        self.frame_stats.add(step)
+        self.last_action = "screenshot"
+        return self._last_payload
+
+    async def screenshot_url(self) -> str:
+        return f"data:{self.mime_type};base64,{await self.screenshot()}"
 
     async def click(self, x: int, y: int, button: str = "left") -> None:
+        self.last_action = "click"
         x, y = self._point_to_screen_coords(x, y)
         await self.computer.click(x, y, button=button)
 
     async def double_click(self, x: int, y: int) -> None:
+        self.last_action = "double_click"
         x, y = self._point_to_screen_coords(x, y)
         await self.computer.double_click(x, y)
 
     async def scroll(self, x: int, y: int, scroll_x: int, scroll_y: int) -> None:
+        self.last_action = "scroll"
         x, y = self._point_to_screen_coords(x, y)
         await self.computer.scroll(x, y, scroll_x, scroll_y)
 
     async def type(self, text: str) -> None:
+        self.last_action = "type"
         await self.computer.type(text)
 
     async def wait(self, ms: int = 1000) -> None:
+        self.last_action = "wait"
         await self.computer.wait(ms)
 
     async def move(self, x: int, y: int) -> None:
+        self.last_action = "move"
         x, y = self._point_to_screen_coords(x, y)
         await self.computer.move(x, y)
 
     async def keypress(self, keys: list[str]) -> None:
+        self.last_action = "keypress"
         await self.computer.keypress(keys)
 
     async def drag(self, path: list[tuple[int, int]]) -> None:
+        self.last_action = "drag"
         path = [self._point_to_screen_coords(*point) for point in path]
         await self.computer.drag(path)
 
     def _point_to_screen_coords(self, x, y):
+        if self.screen_width < 0:
+            # An action before the first screenshot; the screen size is known without one
+            self.screen_width, self.screen_height = self.computer.dimensions
         width, height = self.dimensions
         ratio = min(width / self.screen_width, height / self.screen_height)
         x = x / ratio
@@ -99,19 +157,32 @@ class Scaler:
 class Agent:
     """CUA agent to start and continue task execution"""
 
-    def __init__(self, client, model: str, computer, logger=None):
+    def __init__(self, client, model: str, computer, logger=None, tool_timeout: float | None = None):
         self.client = client
         self.model = model
         self.computer = computer
         self.logger = logger
         self.tools = {}
+        self.tool_timeouts = {}
+        self.tool_timeout = tool_timeout
         self.extra_headers = None
         self.parallel_tool_calls = False
+        # With an async client, stream the response and hand each finished output item
+        # (e.g. a computer_call) to on_output_item as soon as it arrives
+        self.stream = True
+        self.on_output_item = None
+        # Several computer_calls in one response run as one batch with a single screenshot;
+        # consecutive typing is merged and drag paths are simplified (see cua_actions)
+        self.batch_actions = True
+        self.coalesce_actions = True
+        # Optional cua_replay.SessionRecorder; every model call is appended to its archive
+        self.recorder = None
         self.start_task()
 
-    def add_tool(self, tool: dict, func):
+    def add_tool(self, tool: dict, func, timeout: float | None = None):
         name = tool["name"]
         self.tools[name] = (tool, func)
+        self.tool_timeouts[name] = timeout
 
     @property
     def requires_user_input(self) -> bool:
@@ -145,75 +216,129 @@ class Agent:
                             result.append(content.text)
         return result
 
+    @staticmethod
+    def _action(item) -> tuple[str, dict]:
+        # Newer SDKs add optional fields (e.g. click "keys") that the computers don't take
+        action_args = {k: v for k, v in vars(item.action).items() if v is not None}
+        action = action_args.pop("type")
+        if action == "drag":
+            path = [(point.x, point.y) for point in item.action.path]
+            action_args["path"] = path
+        return action, action_args
+
     @property
     def actions(self):
-        actions = []
-        for item in self.response.output:
-            if item.type == "computer_call":
-                action_args = vars(item.action) | {}
-                action = action_args.pop("type")
-                if action == "drag":
-                    path = [(point.x, point.y) for point in item.action.path]
-                    action_args["path"] = path
-                actions.append((action, action_args))
-        return actions
+        return [self._action(item) for item in self.response.output if item.type == "computer_call"]
 
     def start_task(self):
         self.response = None
 
+    async def _screenshot_url(self) -> str:
+        # Scaler knows its encoding; plain computers return base64 PNG
+        if hasattr(self.computer, "screenshot_url"):
+            return await self.computer.screenshot_url()
+        screenshot = await self.computer.screenshot()
+        return f"data:image/png;base64,{screenshot}"
+
+    async def _call_tool(self, item) -> str:
+        """Run one function_call; sync tools go to a worker thread so the event loop keeps running."""
+        tool_name = item.name
+        _, func = self.tools[tool_name]
+        kwargs = json.loads(item.arguments)
+        if inspect.iscoroutinefunction(func):
+            call = func(**kwargs)
+        else:
+            call = asyncio.to_thread(func, **kwargs)
+        timeout = self.tool_timeouts.get(tool_name) or self.tool_timeout
+        try:
+            result = await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            # A sync tool keeps running in its thread; the model is told it timed out and can retry
+            if self.logger:
+                self.logger.warning(f"Tool '{tool_name}' timed out after {timeout}s.")
+            result = {"error": f"Tool '{tool_name}' timed out after {timeout} seconds."}
+        return json.dumps(result)
+
+    async def _create_response(self, kwargs: dict):
+        if not isinstance(self.client, openai.AsyncOpenAI):
+            # A sync client would block the event loop for the whole model call
+            return await asyncio.to_thread(self.client.responses.create, **kwargs)
+        if not self.stream:
+            return await self.client.responses.create(**kwargs)
+        response = None
+        async with await self.client.responses.create(**kwargs, stream=True) as stream:
+            async for event in stream:
+                if event.type == "response.output_item.done" and self.on_output_item:
+                    result = self.on_output_item(event.item)
+                    if inspect.isawaitable(result):
+                        await result
+                elif event.type in ("response.completed", "response.incomplete", "response.failed"):
+                    response = event.response
+        return response
+
     async def continue_task(
         self,
         input: str | openai.types.responses.response_input_param.ResponseInputParam,
         temperature=None,
     ):
         inputs = []
-        screenshot = ""
+        tool_calls = []  # (index in inputs, item) for function calls, run concurrently below
         response_input_param = openai.types.responses.response_input_param
         previous_response = self.response
         previous_response_id = None
         if previous_response:
             previous_response_id = previous_response.id
+            computer_calls = [item for item in previous_response.output if item.type == "computer_call"]
+            batch = self.batch_actions and len(computer_calls) > 1
+            if batch:
+                # All computer actions back to back, then one screenshot shared by every call's output
+                await execute_actions(self.computer, [self._action(item) for item in computer_calls],
+                                      coalesce=self.coalesce_actions)
+                image_url = await self._screenshot_url()
             for item in previous_response.output:
                 if item.type == "computer_call":
-                    action, action_args = self.actions[0]
-                    method = getattr(self.computer, action)
-                    if action != "screenshot":
-                        if inspect.iscoroutinefunction(method):
-                            result = await method(**action_args)
-                        else:
-                            result = method(**action_args)
-                    screenshot = await self.computer.screenshot()
+                    if not batch:
+                        await execute_actions(self.computer, [self._action(item)], coalesce=self.coalesce_actions)
+                        image_url = await self._screenshot_url()
                     output = response_input_param.ComputerCallOutput(
                         type="computer_call_output",
                         call_id=item.call_id,
                         output=response_input_param.ResponseComputerToolCallOutputScreenshotParam(
                             type="computer_screenshot",
-                            image_url=f"data:image/png;base64,{screenshot}",
+                            image_url=image_url,
                         ),
                         acknowledged_safety_checks=self.pending_safety_checks,
                     )
                     inputs.append(output)
+                    crop = getattr(self.computer, "last_crop", None)
+                    if crop and (not batch or item is computer_calls[-1]):
+                        box, crop_url = crop
+                        inputs.append(response_input_param.Message(
+                            role="user",
+                            content=[
+                                {"type": "input_text", "text": f"Full-resolution view of the region {box} of the last screenshot that just changed."},
+                                {"type": "input_image", "image_url": crop_url, "detail": "high"},
+                            ],
+                        ))
                 elif item.type == "function_call":
-                    tool_name = item.name
-                    kwargs = json.loads(item.arguments)
-                    if tool_name not in self.tools:
-                        raise ValueError(f"Unsupported tool '{tool_name}'.")
-                    _, func = self.tools[tool_name]
-                    if inspect.iscoroutinefunction(func):
-                        result = await func(**kwargs)
-                    else:
-                        result = func(**kwargs)
-                    output = response_input_param.FunctionCallOutput(
+                    if item.name not in self.tools:
+                        raise ValueError(f"Unsupported tool '{item.name}'.")
+                    # Filled in once all function calls finish, so outputs keep the item order
+                    tool_calls.append((len(inputs), item))
+                    inputs.append(response_input_param.FunctionCallOutput(
                         type="function_call_output",
                         call_id=item.call_id,
-                        output=json.dumps(result),
-                    )
-                    inputs.append(output)
+                        output="",
+                    ))
                 elif item.type == "reasoning" or item.type == "message":
                     pass
                 else:
                     message = (f"Unsupported response output type '{item.type}'.",)
                     raise NotImplementedError(message)
+        if tool_calls:
+            results = await asyncio.gather(*(self._call_tool(item) for _, item in tool_calls))
+            for (index, _), output in zip(tool_calls, results):
+                inputs[index]["output"] = output
         if isinstance(input, str):
             inputs.append(response_input_param.Message(role="user", content=input))
         else:
@@ -236,11 +361,11 @@ class Agent:
                     "parallel_tool_calls": self.parallel_tool_calls,
                     **({} if temperature is None else {"temperature": temperature}),
                 }
-                if isinstance(self.client, openai.AsyncOpenAI):
-                    self.response = await self.client.responses.create(**kwargs)
-                else:
-                    self.response = self.client.responses.create(**kwargs)
-                assert self.response.status == "completed"
+                start = time.perf_counter()
+                self.response = await self._create_response(kwargs)
+                if self.recorder is not None:
+                    self.recorder.record_model_call(kwargs, self.response, time.perf_counter() - start)
+                assert self.response is not None and self.response.status == "completed"
                 return
             except openai.RateLimitError as e:
                 match = re.search(r"Please try again in (\d+)s", e.message)
@@ -0,0 +1,101 @@
+import inspect
+import math
+import os
+from typing import List, Sequence, Tuple
+
+Action = Tuple[str, dict]
+
+# Single keys that pyautogui.write types as characters, so they can join a typed string
+_TYPABLE_KEYS = {"enter": "\n", "return": "\n", "tab": "\t", "space": " "}
+
+
+def _perpendicular_distance(point, start, end) -> float:
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    length = math.hypot(x2 - x1, y2 - y1)
+    if length == 0:
+        return math.hypot(x - x1, y - y1)
+    return abs((x2 - x1) * (y1 - y) - (x1 - x) * (y2 - y1)) / length
+
+
+def simplify_path(path: Sequence[Tuple[int, int]], tolerance: float = 3.0) -> List[Tuple[int, int]]:
+    """Ramer-Douglas-Peucker: drop drag points within `tolerance` px of the line through their neighbours."""
+    path = [tuple(point) for point in path]
+    if len(path) <= 2:
+        return path
+    keep = [False] * len(path)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(path) - 1)]
+    while stack:
+        first, last = stack.pop()
+        distance, index = 0.0, None
+        for i in range(first + 1, last):
+            d = _perpendicular_distance(path[i], path[first], path[last])
+            if d > distance:
+                distance, index = d, i
+        if index is not None and distance > tolerance:
+            keep[index] = True
+            stack.extend(((first, index), (index, last)))
+    return [point for point, kept in zip(path, keep) if kept]
+
+
+def _as_text(action: Action):
+    name, args = action
+    if name == "type":
+        return args["text"]
+    if name == "keypress" and len(args["keys"]) == 1:
+        return _TYPABLE_KEYS.get(args["keys"][0].lower())
+    return None
+
+
+def coalesce_actions(actions: Sequence[Action], path_tolerance: float = 3.0) -> List[Action]:
+    """Merge actions that can run as one call without changing the outcome.
+
+    - consecutive `type` actions, and Enter/Tab/Space keypresses next to them, become one `type`
+    - consecutive `wait`s are summed and consecutive `move`s keep only the last
+    - a `move` straight before a click at the same point is dropped
+    - drag paths are simplified with `simplify_path`
+    """
+    result: List[Action] = []
+    for name, args in actions:
+        args = dict(args)
+        if name == "drag":
+            args["path"] = simplify_path(args["path"], path_tolerance)
+        previous = result[-1] if result else None
+        text = _as_text((name, args))
+        if previous is not None:
+            previous_name, previous_args = previous
+            previous_text = _as_text(previous)
+            # Only fold a lone Enter/Tab/Space into text that is actually being typed
+            if text is not None and previous_text is not None and "type" in (name, previous_name):
+                result[-1] = ("type", {"text": previous_text + text})
+                continue
+            if name == "wait" and previous_name == "wait":
+                result[-1] = ("wait", {"ms": previous_args.get("ms", 1000) + args.get("ms", 1000)})
+                continue
+            if name == "move" and previous_name == "move":
+                result[-1] = (name, args)
+                continue
+            if (name in ("click", "double_click") and previous_name == "move"
+                    and (previous_args["x"], previous_args["y"]) == (args["x"], args["y"])):
+                result[-1] = (name, args)
+                continue
+        result.append((name, args))
+    return result
+
+
+async def execute_actions(computer, actions: Sequence[Action], coalesce: bool = True) -> int:
+    """Run a batch of actions back to back, with no screenshots in between; returns how many calls were made."""
+    if coalesce:
+        actions = coalesce_actions(actions)
+    actions = [action for action in actions if action[0] != "screenshot"]
+    for name, args in actions:
+        result = getattr(computer, name)(**args)
+        if inspect.isawaitable(result):
+            await result
+    return len(actions)
+
+
+def motion_duration(name: str, default: float) -> float:
+    """Mouse animation time for `name` (move/scroll/drag) from CUA_<NAME>_DURATION or CUA_MOUSE_DURATION."""
+    value = os.getenv(f"CUA_{name.upper()}_DURATION", os.getenv("CUA_MOUSE_DURATION"))
+    return default if value is None else float(value)
@@ -0,0 +1,323 @@
+import base64
+import hashlib
+import inspect
+import io
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+from PIL import Image
+
+from screenshot_codec import encode_image, to_image
+
+_DATA_URL_RE = re.compile(r"^data:(?P<mime>[\w/+.-]+);base64,(?P<data>.+)$", re.DOTALL)
+_BLOB_PREFIX = "blob:"
+
+
+class ReplayMismatch(Exception):
+    """A replayed session diverged from the recording (different action, request or too many steps)."""
+
+
+def _to_jsonable(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, dict):
+        return {k: _to_jsonable(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if hasattr(value, "__dict__") and not isinstance(value, type):
+        return {k: _to_jsonable(v) for k, v in vars(value).items() if not k.startswith("_")}
+    return value
+
+
+class SessionArchive:
+    """An append-only session directory: `steps.jsonl` plus content-addressed blobs.
+
+    Screenshots and image payloads are stored once under `blobs/<sha256>` no matter
+    how many steps reference them, so unchanged frames cost one line of JSON.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.blob_dir = os.path.join(path, "blobs")
+        self.steps_path = os.path.join(path, "steps.jsonl")
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest)
+
+    def put_blob(self, data: bytes, digest: Optional[str] = None) -> str:
+        digest = digest or hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(self.blob_dir, exist_ok=True)
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return digest
+
+    def get_blob(self, digest: str) -> bytes:
+        with open(self.blob_path(digest), "rb") as f:
+            return f.read()
+
+    def records(self) -> list:
+        with open(self.steps_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def blob_count(self) -> int:
+        return len(os.listdir(self.blob_dir)) if os.path.isdir(self.blob_dir) else 0
+
+
+class SessionRecorder:
+    """Write model calls, actions and screenshots of a CUA session to a SessionArchive."""
+
+    def __init__(self, path: str):
+        self.archive = SessionArchive(path)
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self.step = 0
+
+    def _append(self, record: dict) -> None:
+        # One short append per record, so no handle is left open and a crash loses at most one line
+        with self._lock:
+            record = {"step": self.step, "t": time.time(), **record}
+            with open(self.archive.steps_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+
+    def _externalize(self, value: Any) -> Any:
+        # Replace inline base64 images with references to deduplicated blobs
+        if isinstance(value, str):
+            match = _DATA_URL_RE.match(value)
+            if match:
+                digest = self.archive.put_blob(base64.b64decode(match.group("data")))
+                return f"{_BLOB_PREFIX}{match.group('mime')}:{digest}"
+            return value
+        if isinstance(value, dict):
+            return {k: self._externalize(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._externalize(v) for v in value]
+        return value
+
+    def record_model_call(self, request: dict, response, elapsed: float = 0.0) -> None:
+        request = {k: v for k, v in request.items() if k != "extra_headers"}
+        self._append({
+            "type": "model",
+            "request": self._externalize(_to_jsonable(request)),
+            "response": _to_jsonable(response),
+            "elapsed": elapsed,
+        })
+        self.step += 1
+
+    def record_action(self, action: str, args: dict) -> None:
+        self._append({"type": "action", "action": action, "args": _to_jsonable(args)})
+
+    def record_frame(self, frame) -> str:
+        """Store a raw screen frame losslessly; identical frames share one blob."""
+        image = to_image(frame)
+        digest = hashlib.sha256(image.tobytes()).hexdigest()
+        if not os.path.exists(self.archive.blob_path(digest)):
+            self.archive.put_blob(encode_image(image, "PNG"), digest)
+        self._append({"type": "frame", "blob": digest, "size": list(image.size)})
+        return digest
+
+    def record_dimensions(self, dimensions, environment: Optional[str] = None) -> None:
+        self._append({"type": "dimensions", "size": list(dimensions), "environment": environment})
+
+
+class RecordingComputer:
+    """Wrap a computer (below cua.Scaler) and record every action and raw frame."""
+
+    def __init__(self, computer, recorder: SessionRecorder):
+        self.computer = computer
+        self.recorder = recorder
+        self._dimensions_recorded = False
+
+    @property
+    def environment(self):
+        return self.computer.environment
+
+    @property
+    def dimensions(self):
+        dimensions = self.computer.dimensions
+        if not self._dimensions_recorded:
+            self.recorder.record_dimensions(dimensions, self.computer.environment)
+            self._dimensions_recorded = True
+        return dimensions
+
+    async def screenshot_image(self):
+        if hasattr(self.computer, "screenshot_image"):
+            frame = self.computer.screenshot_image()
+            frame = await frame if inspect.isawaitable(frame) else frame
+        else:
+            frame = to_image(await self.computer.screenshot())
+        self.recorder.record_frame(frame)
+        return frame
+
+    async def screenshot(self) -> str:
+        image = to_image(await self.screenshot_image())
+        return base64.b64encode(encode_image(image, "PNG")).decode("ascii")
+
+    def __getattr__(self, name):
+        method = getattr(self.computer, name)
+        if not callable(method):
+            return method
+
+        async def action(*args, **kwargs):
+            # Named arguments with defaults filled in, the same shape ReplayComputer checks
+            bound = inspect.signature(method).bind(*args, **kwargs)
+            bound.apply_defaults()
+            self.recorder.record_action(name, dict(bound.arguments))
+            result = method(*args, **kwargs)
+            return await result if inspect.isawaitable(result) else result
+
+        return action
+
+
+class ReplayComputer:
+    """Serve recorded frames and check actions against the recording; no desktop needed.
+
+    `wait` returns immediately, so a replay measures only the local pipeline.
+    With `strict`, an action that differs from the recording raises ReplayMismatch;
+    otherwise it is appended to `mismatches`.
+    """
+
+    def __init__(self, path: str, environment: Optional[str] = None, strict: bool = True):
+        self.archive = SessionArchive(path)
+        records = self.archive.records()
+        recorded = [r.get("environment") for r in records if r["type"] == "dimensions"]
+        self.environment = environment or (recorded[0] if recorded and recorded[0] else "linux")
+        self.strict = strict
+        self._frames = deque(r["blob"] for r in records if r["type"] == "frame")
+        self._actions = deque((r["action"], r["args"]) for r in records if r["type"] == "action")
+        sizes = [r["size"] for r in records if r["type"] in ("dimensions", "frame")]
+        self.dimensions = tuple(sizes[0]) if sizes else (1024, 768)
+        self.actions_replayed = 0
+        self.mismatches: list = []
+        self._decoded = {}
+
+    async def screenshot_image(self) -> Image.Image:
+        if not self._frames:
+            raise ReplayMismatch("The replay asked for more screenshots than were recorded")
+        digest = self._frames.popleft()
+        if digest not in self._decoded:
+            # Identical frames decode once, so replays time the agent pipeline rather than PNG decoding
+            self._decoded[digest] = Image.open(io.BytesIO(self.archive.get_blob(digest))).convert("RGB")
+        return self._decoded[digest]
+
+    async def screenshot(self) -> str:
+        return base64.b64encode(encode_image(await self.screenshot_image(), "PNG")).decode("ascii")
+
+    def _check(self, action: str, args: dict) -> None:
+        expected = self._actions.popleft() if self._actions else None
+        actual = (action, _to_jsonable(args))
+        if expected is None or list(expected) != list(actual):
+            message = f"Replayed {actual}, recorded {expected}"
+            if self.strict:
+                raise ReplayMismatch(message)
+            self.mismatches.append(message)
+        self.actions_replayed += 1
+
+    async def click(self, x: int, y: int, button: str = "left") -> None:
+        self._check("click", {"x": x, "y": y, "button": button})
+
+    async def double_click(self, x: int, y: int) -> None:
+        self._check("double_click", {"x": x, "y": y})
+
+    async def scroll(self, x: int, y: int, scroll_x: int, scroll_y: int) -> None:
+        self._check("scroll", {"x": x, "y": y, "scroll_x": scroll_x, "scroll_y": scroll_y})
+
+    async def type(self, text: str) -> None:
+        self._check("type", {"text": text})
+
+    async def wait(self, ms: int = 1000) -> None:
+        self._check("wait", {"ms": ms})
+
+    async def move(self, x: int, y: int) -> None:
+        self._check("move", {"x": x, "y": y})
+
+    async def keypress(self, keys: list[str]) -> None:
+        self._check("keypress", {"keys": keys})
+
+    async def drag(self, path: list[tuple[int, int]]) -> None:
+        self._check("drag", {"path": path})
+
+
+class _Responses:
+    def __init__(self, create):
+        self.create = create
+
+
+class ReplayClient:
+    """A sync stand-in for the OpenAI client that returns the recorded responses in order.
+
+    Each request is checked against the recorded one (previous_response_id and the
+    types/call ids of its input items); with `realtime`, the recorded model latency
+    is reproduced.
+    """
+
+    def __init__(self, path: str, strict: bool = True, realtime: bool = False):
+        from openai.types.responses import Response
+
+        self.archive = SessionArchive(path)
+        self.strict = strict
+        self.realtime = realtime
+        self._calls = deque(r for r in self.archive.records() if r["type"] == "model")
+        self._response_type = Response
+        self.mismatches: list = []
+        self.responses = _Responses(self._create)
+
+    @staticmethod
+    def _shape(request: dict) -> list:
+        inputs = request.get("input") or []
+        if isinstance(inputs, str):
+            return [("message", None)]
+        return [(item.get("type", "message"), item.get("call_id")) for item in _to_jsonable(inputs)]
+
+    def _create(self, **kwargs):
+        if not self._calls:
+            raise ReplayMismatch("The replay made more model calls than were recorded")
+        call = self._calls.popleft()
+        recorded = call["request"]
+        if (kwargs.get("previous_response_id") != recorded.get("previous_response_id")
+                or self._shape(kwargs) != [tuple(s) for s in self._shape(recorded)]):
+            message = f"Request for step {call['step']} differs from the recording"
+            if self.strict:
+                raise ReplayMismatch(message)
+            self.mismatches.append(message)
+        if self.realtime:
+            time.sleep(call.get("elapsed", 0.0))
+        return self._response_type.model_validate(call["response"])
+
+    def next_user_message(self) -> str:
+        """The user text sent with the next recorded request, to drive replays of interactive sessions."""
+        inputs = self._calls[0]["request"].get("input") if self._calls else None
+        if isinstance(inputs, str):
+            return inputs
+        texts = [item["content"] for item in inputs or [] if item.get("role") == "user" and isinstance(item.get("content"), str)]
+        return texts[-1] if texts else ""
+
+    @property
+    def remaining(self) -> int:
+        return len(self._calls)
+
+
+class RecordingClient:
+    """Wrap a sync OpenAI client so every `responses.create` call is recorded."""
+
+    def __init__(self, client, recorder: SessionRecorder):
+        self.client = client
+        self.recorder = recorder
+        self.responses = _Responses(self._create)
+
+    def _create(self, **kwargs):
+        start = time.perf_counter()
+        response = self.client.responses.create(**kwargs)
+        self.recorder.record_model_call(kwargs, response, time.perf_counter() - start)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
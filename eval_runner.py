@@ -0,0 +1,352 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_DATA_REF_RE = re.compile(r"^\$\{data\.(?P<column>[\w.]+)\}$")
+
+
+def row_hash(inputs: Dict[str, Any]) -> str:
+    """Stable hash of the inputs an evaluator actually sees for a row."""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def load_jsonl(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _chunks(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ScoreCache:
+    """(evaluator, version, row hash) -> result, persisted in a local SQLite file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("EVAL_CACHE_PATH", ".eval_cache.sqlite")
+        self._lock = threading.Lock()
+        # WAL and a busy timeout let several eval processes share one cache file
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "evaluator TEXT, version TEXT, row_hash TEXT, result TEXT, created REAL, "
+            "PRIMARY KEY (evaluator, version, row_hash))"
+        )
+        self._db.commit()
+
+    def get_many(self, evaluator: str, version: str, hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        hashes = list(set(hashes))
+        found = {}
+        with self._lock:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                cursor = self._db.execute(
+                    f"SELECT row_hash, result FROM scores WHERE evaluator = ? AND version = ? "
+                    f"AND row_hash IN ({','.join('?' * len(chunk))})",
+                    (evaluator, version, *chunk),
+                )
+                found.update((h, json.loads(result)) for h, result in cursor)
+        return found
+
+    def put(self, evaluator: str, version: str, hash_: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+                (evaluator, version, hash_, json.dumps(result, default=str), time.time()),
+            )
+            self._db.commit()
+
+    def put_many(self, evaluator: str, version: str, results: Dict[str, Dict[str, Any]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+                [(evaluator, version, h, json.dumps(r, default=str), now) for h, r in results.items()],
+            )
+            self._db.commit()
+
+    def clear(self, evaluator: Optional[str] = None) -> None:
+        with self._lock:
+            if evaluator is None:
+                self._db.execute("DELETE FROM scores")
+            else:
+                self._db.execute("DELETE FROM scores WHERE evaluator = ?", (evaluator,))
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def judge_version(model_config: Dict[str, Any], version: str = "1") -> str:
+    """Cache version of an LLM judge: switching its deployment, endpoint or API version re-scores the rows."""
+    return "{}:{}@{}?{}".format(version, model_config.get("azure_deployment"), model_config.get("azure_endpoint"),
+                                model_config.get("api_version"))
+
+
+@dataclass
+class EvaluatorSpec:
+    """One evaluator with its `evaluator_config`-style column mapping.
+
+    `local` evaluators (lexical metrics) run in-process; the others (LLM judges,
+    safety service calls) run on their own thread pool of `concurrency` workers.
+    A `batch` evaluator is called once with the list of uncached inputs and returns
+    one result per input, in order.
+    Bump `version` when the evaluator's prompt/parameters change to invalidate its
+    cached scores; LLM judges take theirs from `judge_version(model_config)`.
+    """
+
+    name: str
+    evaluator: Callable[..., Dict[str, Any]]
+    column_mapping: Dict[str, str]
+    version: str = "1"
+    concurrency: int = 4
+    local: bool = False
+    batch: bool = False
+
+    @property
+    def cache_version(self) -> str:
+        return f"{type(self.evaluator).__qualname__}:{self.version}"
+
+    def inputs(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        inputs = {}
+        for param, ref in self.column_mapping.items():
+            match = _DATA_REF_RE.match(ref)
+            inputs[param] = row.get(match.group("column")) if match else ref
+        return inputs
+
+
+def _exact_add(partials: List[float], x: float) -> None:
+    """Add `x` to a list of non-overlapping partial sums (Shewchuk), so totals don't depend on order."""
+    if not math.isfinite(x):
+        partials.append(x)
+        return
+    special = [y for y in partials if not math.isfinite(y)]
+    exact = []
+    for y in partials:
+        if not math.isfinite(y):
+            continue
+        if abs(x) < abs(y):
+            x, y = y, x
+        hi = x + y
+        lo = y - (hi - x)
+        if lo:
+            exact.append(lo)
+        x = hi
+    partials[:] = exact + [x] + special
+
+
+def _exact_sum(partials: List[float]) -> float:
+    try:
+        return math.fsum(partials)
+    except ValueError:  # inf + -inf
+        return math.nan
+
+
+class MetricTotals:
+    """Running sums and counts per metric, so aggregates stay exact across batches and shards.
+
+    Sums are kept as exact partials, so merging shards in any order gives the same
+    means, bit for bit, as a single pass over all rows.
+    """
+
+    def __init__(self):
+        self.sums: Dict[str, List[float]] = {}
+        self.counts: Dict[str, int] = {}
+        self.passes: Dict[str, int] = {}
+        self.judged: Dict[str, int] = {}
+
+    def add(self, row: Dict[str, Any]) -> None:
+        for column, value in row.items():
+            if not column.startswith("outputs."):
+                continue
+            name, key = column[len("outputs."):].split(".", 1)
+            if isinstance(value, bool):
+                value = float(value)
+            if isinstance(value, (int, float)):
+                metric = f"{name}.{key}"
+                _exact_add(self.sums.setdefault(metric, []), float(value))
+                self.counts[metric] = self.counts.get(metric, 0) + 1
+            elif key.endswith("_result") and value in ("pass", "fail"):
+                self.passes[name] = self.passes.get(name, 0) + (value == "pass")
+                self.judged[name] = self.judged.get(name, 0) + 1
+
+    def merge(self, other: "MetricTotals") -> None:
+        for metric, partials in other.sums.items():
+            mine = self.sums.setdefault(metric, [])
+            for partial in partials:
+                _exact_add(mine, partial)
+        for mine, theirs in ((self.counts, other.counts), (self.passes, other.passes), (self.judged, other.judged)):
+            for key, value in theirs.items():
+                mine[key] = mine.get(key, 0) + value
+
+    def metrics(self) -> Dict[str, float]:
+        metrics = {metric: _exact_sum(self.sums[metric]) / self.counts[metric] for metric in sorted(self.sums)}
+        for name in sorted(self.judged):
+            metrics[f"{name}.binary_aggregate"] = self.passes[name] / self.judged[name]
+        return metrics
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {"sums": self.sums, "counts": self.counts, "passes": self.passes, "judged": self.judged}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, Any]]) -> "MetricTotals":
+        totals = cls()
+        totals.sums = {k: list(v) if isinstance(v, list) else [v] for k, v in data["sums"].items()}
+        totals.counts = dict(data["counts"])
+        totals.passes, totals.judged = dict(data["passes"]), dict(data["judged"])
+        return totals
+
+
+@dataclass
+class EvalRunResult:
+    rows: List[Dict[str, Any]]
+    metrics: Dict[str, float]
+    stats: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def to_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"rows": self.rows, "metrics": self.metrics, "stats": self.stats}, f, indent=2, default=str)
+
+
+class EvalRunner:
+    """Score rows with many evaluators, reusing cached scores and only computing the delta.
+
+    Rows come back in input order as `inputs.<column>` / `outputs.<evaluator>.<key>`
+    columns, the layout `azure.ai.evaluation.evaluate` uses, with mean metrics.
+    A failed call is reported as `outputs.<evaluator>.error` and is not cached.
+    """
+
+    def __init__(self, specs: List[EvaluatorSpec], cache: Optional[ScoreCache] = None):
+        self.specs = specs
+        self.cache = cache or ScoreCache()
+
+    def _call(self, spec: EvaluatorSpec, inputs: Dict[str, Any], hash_: str) -> Dict[str, Any]:
+        try:
+            result = spec.evaluator(**inputs)
+        except Exception as e:
+            logger.warning("Evaluator %s failed: %s", spec.name, e)
+            return {"error": str(e)}
+        result = dict(result or {})
+        self.cache.put(spec.name, spec.cache_version, hash_, result)
+        return result
+
+    def _call_batch(self, spec: EvaluatorSpec, inputs: List[Dict[str, Any]],
+                    hashes: List[str]) -> List[Dict[str, Any]]:
+        try:
+            results = [dict(r or {}) for r in spec.evaluator(inputs)]
+            if len(results) != len(inputs):
+                raise ValueError(f"returned {len(results)} results for {len(inputs)} rows")
+        except Exception as e:
+            logger.warning("Evaluator %s failed: %s", spec.name, e)
+            return [{"error": str(e)} for _ in inputs]
+        self.cache.put_many(spec.name, spec.cache_version, dict(zip(hashes, results)))
+        return results
+
+    def run(self, rows: List[Dict[str, Any]]) -> EvalRunResult:
+        outputs: List[Dict[str, Any]] = [{f"inputs.{k}": v for k, v in row.items()} for row in rows]
+        stats: Dict[str, Dict[str, Any]] = {}
+        executors: List[ThreadPoolExecutor] = []
+        pending = {}
+        start = time.perf_counter()
+        try:
+            for spec in self.specs:
+                inputs = [spec.inputs(row) for row in rows]
+                hashes = [row_hash(i) for i in inputs]
+                cached = self.cache.get_many(spec.name, spec.cache_version, hashes)
+                stats[spec.name] = {"cached": 0, "computed": 0, "failed": 0}
+                executor = None
+                delta = []
+                for index, (row_inputs, hash_) in enumerate(zip(inputs, hashes)):
+                    if hash_ in cached:
+                        self._store(outputs[index], spec.name, cached[hash_])
+                        stats[spec.name]["cached"] += 1
+                    elif spec.batch:
+                        delta.append(index)
+                    elif spec.local:
+                        self._finish(outputs[index], spec.name, self._call(spec, row_inputs, hash_), stats)
+                    else:
+                        if executor is None:
+                            executor = ThreadPoolExecutor(max_workers=spec.concurrency,
+                                                          thread_name_prefix=f"eval-{spec.name}")
+                            executors.append(executor)
+                        future = executor.submit(self._call, spec, row_inputs, hash_)
+                        pending[future] = (index, spec.name)
+                if delta:
+                    results = self._call_batch(spec, [inputs[i] for i in delta], [hashes[i] for i in delta])
+                    for index, result in zip(delta, results):
+                        self._finish(outputs[index], spec.name, result, stats)
+            for future in as_completed(pending):
+                index, name = pending[future]
+                self._finish(outputs[index], name, future.result(), stats)
+        finally:
+            for executor in executors:
+                executor.shutdown(wait=True)
+
+        totals = MetricTotals()
+        for row in outputs:
+            totals.add(row)
+        logger.info("Evaluated %d rows in %.1fs: %s", len(rows), time.perf_counter() - start, stats)
+        return EvalRunResult(outputs, totals.metrics(), stats)
+
+    def run_sharded(self, rows: Iterable[Dict[str, Any]], store) -> Dict[str, Any]:
+        """Evaluate `rows` shard by shard into an eval_store.ResultStore and return its summary.
+
+        Only one shard of rows and outputs is held in memory. Shards already in the
+        store for identical input rows are kept, so a rerun resumes after the last
+        completed shard; the first shard whose input differs, and all later ones, are redone.
+        """
+        resumed = 0
+        index = -1
+        for index, chunk in enumerate(_chunks(rows, store.shard_size)):
+            input_hash = row_hash(chunk)
+            done = store.shard(index)
+            if done is not None and done["input_hash"] == input_hash:
+                resumed += done["rows"]
+                continue
+            if store.shard_count > index:
+                store.truncate(index)
+            result = self.run(chunk)
+            store.write_shard(result.rows, input_hash, result.stats)
+        if store.shard_count > index + 1:
+            # The input shrank since the last run
+            store.truncate(index + 1)
+        if resumed:
+            logger.info("Resumed %d rows from %s", resumed, store.path)
+        return store.summary
+
+    @staticmethod
+    def _store(row: Dict[str, Any], name: str, result: Dict[str, Any]) -> None:
+        for key, value in result.items():
+            row[f"outputs.{name}.{key}"] = value
+
+    def _finish(self, row: Dict[str, Any], name: str, result: Dict[str, Any], stats) -> None:
+        self._store(row, name, result)
+        stats[name]["failed" if "error" in result else "computed"] += 1
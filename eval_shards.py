@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from eval_runner import EvalRunner, EvaluatorSpec, ScoreCache
+from eval_store import ResultReader, ResultStore
+
+logger = logging.getLogger(__name__)
+
+
+def byte_ranges(path: str, parts: int) -> List[Tuple[int, int]]:
+    """Split a JSONL file into up to `parts` [start, end) byte ranges that start and end on line boundaries.
+
+    Only the bytes around each cut are read; no line is parsed.
+    """
+    size = os.path.getsize(path)
+    cuts = [0]
+    with open(path, "rb") as f:
+        for part in range(1, parts):
+            f.seek(max(size * part // parts, cuts[-1]))
+            if f.tell() > 0:
+                f.seek(f.tell() - 1)
+                f.readline()  # move to the start of the next line
+            cuts.append(min(f.tell(), size))
+    cuts.append(size)
+    return [(start, end) for start, end in zip(cuts, cuts[1:]) if end > start]
+
+
+def iter_jsonl_range(path: str, start: int, end: int) -> Iterator[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                yield json.loads(line)
+
+
+def _evaluate_range(job: Dict[str, Any]) -> Dict[str, Any]:
+    specs: List[EvaluatorSpec] = job["spec_factory"]()
+    for spec in specs:
+        if not spec.local:
+            spec.concurrency = job["concurrency"] or max(1, spec.concurrency // job["processes"])
+    cache = ScoreCache(job["cache_path"])
+    try:
+        store = ResultStore(job["output"], job["shard_size"])
+        rows = iter_jsonl_range(job["path"], job["start"], job["end"])
+        return EvalRunner(specs, cache).run_sharded(rows, store)
+    finally:
+        cache.close()
+
+
+def evaluate_sharded(
+    path: str,
+    spec_factory: Callable[[], List[EvaluatorSpec]],
+    output: str,
+    processes: Optional[int] = None,
+    shard_concurrency: Optional[int] = None,
+    cache_path: Optional[str] = None,
+    shard_size: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Evaluate a JSONL file in `processes` worker processes, one byte range each, and merge the results.
+
+    Each worker builds its own evaluators with `spec_factory` (a module-level function,
+    so it can be pickled) and writes its range to `<output>/range-NNN` as a ResultStore,
+    which also makes every range resumable. Remote evaluators get `shard_concurrency`
+    workers per process, by default their own `concurrency` divided by `processes`, so
+    the total load on a judge stays the same. `output` ends up as a ResultStore over all
+    ranges in input order, with metrics merged exactly from the per-shard totals.
+    """
+    processes = processes or int(os.getenv("EVAL_PROCESSES", str(os.cpu_count() or 1)))
+    cache_path = cache_path or os.getenv("EVAL_CACHE_PATH", ".eval_cache.sqlite")
+    ranges = byte_ranges(path, processes)
+    jobs = [
+        {"path": path, "start": start, "end": end, "spec_factory": spec_factory, "processes": processes,
+         "concurrency": shard_concurrency, "cache_path": cache_path, "shard_size": shard_size,
+         "output": os.path.join(output, f"range-{index:03d}")}
+        for index, (start, end) in enumerate(ranges)
+    ]
+    os.makedirs(output, exist_ok=True)
+    # Let the parent create the cache schema once instead of every worker racing to do it
+    ScoreCache(cache_path).close()
+    with ProcessPoolExecutor(max_workers=max(1, len(jobs))) as pool:
+        list(pool.map(_evaluate_range, jobs))
+
+    store = ResultStore(output, shard_size)
+    store.merge_from([ResultReader(job["output"]) for job in jobs])
+    logger.info("Evaluated %s in %d byte ranges: %d rows", path, len(jobs), store.summary["rows"])
+    return store.summary
+
+
+if __name__ == "__main__":
+    import argparse
+    import importlib
+
+    parser = argparse.ArgumentParser(description="Evaluate a JSONL file in parallel byte-range shards")
+    parser.add_argument("data", help="input JSONL, e.g. datarfp.jsonl")
+    parser.add_argument("--specs", default="agenticai:eval_specs", help="module:function returning the EvaluatorSpecs")
+    parser.add_argument("--output", default="./myevalresults")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--shard-concurrency", type=int, help="remote evaluator workers per process")
+    args = parser.parse_args()
+    module, function = args.specs.split(":")
+    factory = getattr(importlib.import_module(module), function)
+    result = evaluate_sharded(args.data, factory, args.output, args.processes, args.shard_concurrency)
+    print(json.dumps({"rows": result["rows"], "metrics": result["metrics"], "stats": result["stats"]}, indent=2))
@@ -0,0 +1,162 @@
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from eval_runner import MetricTotals
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class ResultReader:
+    """Read a results directory written by ResultStore without loading every row.
+
+    Rows are streamed shard by shard in input order; `where` filters rows and
+    `columns` projects them (exact names or prefixes ending in `.`, e.g. `outputs.bleu.`).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.summary_path = os.path.join(path, "summary.json")
+
+    @property
+    def summary(self) -> Dict[str, Any]:
+        if not os.path.exists(self.summary_path):
+            return {"rows": 0, "shards": [], "metrics": {}, "stats": {}}
+        with open(self.summary_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def metrics(self) -> Dict[str, float]:
+        return self.summary["metrics"]
+
+    def shard_paths(self) -> List[str]:
+        return [os.path.join(self.path, shard["file"]) for shard in self.summary["shards"]]
+
+    def rows(self, where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+             columns: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+        for path in self.shard_paths():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    if where is not None and not where(row):
+                        continue
+                    if columns is not None:
+                        row = {k: v for k, v in row.items()
+                               if any(k == c or (c.endswith(".") and k.startswith(c)) for c in columns)}
+                    yield row
+
+    def aggregate(self, where: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Dict[str, float]:
+        """Mean metrics over the rows matching `where` (all rows: use `metrics()`, which needs no scan)."""
+        totals = MetricTotals()
+        for row in self.rows(where):
+            totals.add(row)
+        return totals.metrics()
+
+    def count(self, where: Optional[Callable[[Dict[str, Any]], bool]] = None) -> int:
+        if where is None:
+            return self.summary["rows"]
+        return sum(1 for _ in self.rows(where))
+
+
+class ResultStore(ResultReader):
+    """Row-level evaluation output as JSONL shards plus an incrementally updated `summary.json`.
+
+    Each shard (`part-00000.jsonl`, ...) is written to a temp file and renamed when
+    complete, and the summary is rewritten after every shard with the shard's row
+    count, input hash and metric totals. A crashed run therefore leaves only
+    complete shards, and a rerun over the same input resumes after the last one.
+    """
+
+    def __init__(self, path: str, shard_size: Optional[int] = None):
+        super().__init__(path)
+        self.shard_size = shard_size or int(os.getenv("EVAL_SHARD_SIZE", "500"))
+        os.makedirs(path, exist_ok=True)
+        self._summary = self.summary
+        self._summary.setdefault("extra", {})
+
+    @property
+    def shard_count(self) -> int:
+        return len(self._summary["shards"])
+
+    def shard(self, index: int) -> Optional[Dict[str, Any]]:
+        shards = self._summary["shards"]
+        if index < len(shards) and os.path.exists(os.path.join(self.path, shards[index]["file"])):
+            return shards[index]
+        return None
+
+    def truncate(self, index: int) -> None:
+        """Drop shard `index` and every later one, e.g. when the input changed from there on."""
+        for shard in self._summary["shards"][index:]:
+            path = os.path.join(self.path, shard["file"])
+            if os.path.exists(path):
+                os.remove(path)
+        self._summary["shards"] = self._summary["shards"][:index]
+        self._save()
+
+    def reset(self) -> None:
+        self.truncate(0)
+        self._summary["extra"] = {}
+        self._save()
+
+    def write_shard(self, rows: List[Dict[str, Any]], input_hash: Optional[str] = None,
+                    stats: Optional[Dict[str, Dict[str, int]]] = None) -> Dict[str, Any]:
+        index = len(self._summary["shards"])
+        name = f"part-{index:05d}.jsonl"
+        totals = MetricTotals()
+        lines = []
+        for row in rows:
+            totals.add(row)
+            lines.append(json.dumps(row, default=str))
+        _write_atomic(os.path.join(self.path, name), "".join(line + "\n" for line in lines))
+        shard = {"file": name, "rows": len(rows), "input_hash": input_hash,
+                 "totals": totals.to_dict(), "stats": stats or {}}
+        self._summary["shards"].append(shard)
+        self._save()
+        return shard
+
+    def write_rows(self, rows: List[Dict[str, Any]]) -> None:
+        """Replace the store's contents with `rows`, split into shards."""
+        self.reset()
+        for start in range(0, len(rows), self.shard_size):
+            self.write_shard(rows[start:start + self.shard_size])
+
+    def merge_from(self, children: Sequence[ResultReader]) -> None:
+        """Make this store list the shards of `children`, in order, without copying any rows.
+
+        The shards stay in the children's directories (which should live under this
+        one); the merged metrics come from their totals, not from re-reading rows.
+        """
+        shards = []
+        for child in children:
+            prefix = os.path.relpath(child.path, self.path).replace(os.sep, "/")
+            shards.extend({**shard, "file": f"{prefix}/{shard['file']}"} for shard in child.summary["shards"])
+        self._summary["shards"] = shards
+        self._save()
+
+    def update_extra(self, **values: Any) -> None:
+        """Attach run-level values (studio URL, service-side metrics, ...) to the summary."""
+        self._summary["extra"].update(values)
+        self._save()
+
+    def _save(self) -> None:
+        totals = MetricTotals()
+        stats: Dict[str, Dict[str, int]] = {}
+        for shard in self._summary["shards"]:
+            totals.merge(MetricTotals.from_dict(shard["totals"]))
+            for name, counts in shard["stats"].items():
+                merged = stats.setdefault(name, {})
+                for key, value in counts.items():
+                    merged[key] = merged.get(key, 0) + value
+        self._summary.update(
+            rows=sum(shard["rows"] for shard in self._summary["shards"]),
+            metrics=totals.metrics(),
+            stats=stats,
+            updated=time.time(),
+        )
+        _write_atomic(self.summary_path, json.dumps(self._summary, indent=2, default=str))
@@ -0,0 +1,162 @@
+import math
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+Box = Tuple[int, int, int, int]  # left, top, right, bottom
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = 8) -> int:
+    """64-bit difference hash (dHash) of a frame; close frames have a small Hamming distance."""
+    # Box-reduce first so the grayscale conversion touches a few thousand pixels, not millions
+    factor = max(1, min(image.size) // (hash_size * 8))
+    small = image.reduce(factor).convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _tile_weights(count: int) -> np.ndarray:
+    # Odd multipliers: a change in any single 8-byte word always changes the tile digest
+    return np.random.default_rng(0x5EED).integers(0, 2**63, count, dtype=np.uint64) | np.uint64(1)
+
+
+def tile_hashes(image: Image.Image, tile: int = 64) -> np.ndarray:
+    """A (rows, cols) array of 64-bit digests, one per `tile` x `tile` block (edges zero-padded).
+
+    Each digest is a weighted sum (mod 2**64) of the block's 8-byte words, which is
+    vectorized over the whole frame and several times faster than hashing tiles one by one.
+    """
+    if tile % 8:
+        raise ValueError("tile must be a multiple of 8")
+    pixels = np.asarray(image.convert("RGB"))
+    height, width, _ = pixels.shape
+    rows, cols = math.ceil(height / tile), math.ceil(width / tile)
+    if (rows * tile, cols * tile) != (height, width):
+        pixels = np.pad(pixels, ((0, rows * tile - height), (0, cols * tile - width), (0, 0)))
+    blocks = np.ascontiguousarray(pixels.reshape(rows, tile, cols, tile, 3).swapaxes(1, 2))
+    words = blocks.reshape(rows, cols, -1).view(np.uint64)
+    return np.einsum("rcw,w->rc", words, _tile_weights(words.shape[-1]))
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Vision input tokens for a high-detail image: fit in 2048, shortest side 768, 170 per 512 tile + 85."""
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+@dataclass
+class FrameDelta:
+    """How a frame differs from the previous one."""
+
+    changed: bool
+    changed_tiles: int
+    total_tiles: int
+    phash_distance: int
+    bbox: Optional[Box] = None
+
+    @property
+    def changed_fraction(self) -> float:
+        return self.changed_tiles / self.total_tiles if self.total_tiles else 1.0
+
+
+class FrameDiffer:
+    """Keep the previous frame's perceptual hash and tile hashes and report what changed."""
+
+    def __init__(self, tile: int = 64):
+        self.tile = tile
+        self._phash: Optional[int] = None
+        self._tiles: Optional[np.ndarray] = None
+
+    def reset(self) -> None:
+        self._phash = None
+        self._tiles = None
+
+    def update(self, image: Image.Image) -> FrameDelta:
+        phash = perceptual_hash(image)
+        tiles = tile_hashes(image, self.tile)
+        previous_phash, previous_tiles = self._phash, self._tiles
+        self._phash, self._tiles = phash, tiles
+        if previous_tiles is None or previous_tiles.shape != tiles.shape:
+            return FrameDelta(True, tiles.size, tiles.size, 64 if previous_phash is None else hamming(phash, previous_phash),
+                              (0, 0) + image.size)
+
+        changed = tiles != previous_tiles
+        count = int(changed.sum())
+        bbox = None
+        if count:
+            rows = np.flatnonzero(changed.any(axis=1))
+            cols = np.flatnonzero(changed.any(axis=0))
+            width, height = image.size
+            bbox = (
+                int(cols[0]) * self.tile,
+                int(rows[0]) * self.tile,
+                min((int(cols[-1]) + 1) * self.tile, width),
+                min((int(rows[-1]) + 1) * self.tile, height),
+            )
+        return FrameDelta(count > 0, count, tiles.size, hamming(phash, previous_phash), bbox)
+
+
+@dataclass
+class FrameStep:
+    """Per-step screenshot accounting for one computer_call."""
+
+    action: str
+    changed: bool
+    changed_fraction: float
+    phash_distance: int
+    encode_skipped: bool
+    bytes_sent: int
+    image_tokens: int
+    crop: Optional[Box] = None
+    crop_bytes: int = 0
+    crop_tokens: int = 0
+
+
+@dataclass
+class FrameStats:
+    steps: List[FrameStep] = field(default_factory=list)
+
+    def add(self, step: FrameStep) -> None:
+        self.steps.append(step)
+
+    def summary(self) -> dict:
+        unchanged = [s for s in self.steps if not s.changed]
+        return {
+            "steps": len(self.steps),
+            "unchanged_steps": len(unchanged),
+            "encodes_skipped": sum(s.encode_skipped for s in self.steps),
+            "bytes_sent": sum(s.bytes_sent + s.crop_bytes for s in self.steps),
+            # Payload and tokens spent re-sending frames identical to the previous one
+            "bytes_unchanged": sum(s.bytes_sent for s in unchanged),
+            "tokens_sent": sum(s.image_tokens + s.crop_tokens for s in self.steps),
+            "tokens_unchanged": sum(s.image_tokens for s in unchanged),
+            "crops_sent": sum(1 for s in self.steps if s.crop),
+        }
+
+
+def replay_frames(frames: Iterable[Image.Image], size: Tuple[int, int], tile: int = 64) -> FrameStats:
+    """Run recorded frames through a differ to estimate how much of a session was redundant."""
+    from screenshot_codec import ScreenshotEncoder
+
+    differ = FrameDiffer(tile)
+    encoder = ScreenshotEncoder()
+    stats = FrameStats()
+    last = None
+    for frame in frames:
+        delta = differ.update(frame)
+        skipped = not delta.changed and last is not None
+        if not skipped:
+            last = encoder.encode(frame, size)
+        stats.add(FrameStep("replay", delta.changed, delta.changed_fraction, delta.phash_distance,
+                            skipped, len(last), estimate_image_tokens(*size)))
+    return stats
@@ -0,0 +1,433 @@
+import argparse
+import hashlib
+import math
+import random
+import re
+import time
+from collections import Counter
+from itertools import chain
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Word runs and single punctuation marks, close to nltk.word_tokenize for plain English text
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_ARTICLES = {"a", "an", "the"}
+_U64 = np.uint64
+
+# (score column, result/threshold prefix) pairs per evaluator name, as the azure.ai.evaluation
+# lexical evaluators emit them: F1ScoreEvaluator returns f1_score, f1_result and f1_threshold
+METRIC_COLUMNS = {
+    "f1": (("f1_score", "f1"),),
+    "bleu": (("bleu_score", "bleu"),),
+    "gleu": (("gleu_score", "gleu"),),
+    "meteor": (("meteor_score", "meteor"),),
+    "rouge": (
+        ("rouge_precision", "rouge_precision"),
+        ("rouge_recall", "rouge_recall"),
+        ("rouge_f1_score", "rouge_f1_score"),
+    ),
+}
+
+
+def _splitmix(x: np.ndarray) -> np.ndarray:
+    x = x + _U64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> _U64(30))) * _U64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> _U64(27))) * _U64(0x94D049BB133111EB)
+    return x ^ (x >> _U64(31))
+
+
+class _Sequences:
+    """Token ids of one side (responses or ground truths) as flat arrays ordered by (row, position)."""
+
+    def __init__(self, rows: np.ndarray, tokens: np.ndarray, n_rows: int):
+        self.rows = rows
+        self.tokens = tokens
+        self.lengths = np.bincount(rows, minlength=n_rows)
+        starts = np.concatenate(([0], np.cumsum(self.lengths)[:-1]))
+        self.positions = np.arange(len(rows)) - starts[rows]
+        self._chains: List[np.ndarray] = []
+
+    def select(self, mask: np.ndarray, token_map: np.ndarray, n_rows: int) -> "_Sequences":
+        keep = mask[self.tokens]
+        return _Sequences(self.rows[keep], token_map[self.tokens[keep]], n_rows)
+
+    def ngrams(self, n: int):
+        """(row, key) for every n-gram that does not cross a row boundary."""
+        m = len(self.tokens) - n + 1
+        if m <= 0:
+            return self.rows[:0], np.zeros(0, dtype=_U64)
+        # Keys are only compared between n-grams of the same n, so each n extends the (n-1)-gram keys
+        while len(self._chains) < n:
+            k = len(self._chains)
+            tokens = self.tokens[k:].astype(_U64)
+            self._chains.append(_splitmix(self._chains[-1][:len(tokens)] ^ tokens if k else tokens))
+        valid = self.rows[:m] == self.rows[n - 1:]
+        return self.rows[:m][valid], self._chains[n - 1][:m][valid]
+
+
+def _row_scoped(rows: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    # Multiplying (not hashing) the row keeps row and n-gram mixing independent of each other
+    return _splitmix(keys ^ (rows.astype(_U64) * _U64(0x9FB21C651E98DF25)))
+
+
+def _group_counts(keys: np.ndarray, with_index: bool = True):
+    """Sorted distinct keys, their counts and (with `with_index`) the index of one occurrence of each."""
+    order = np.argsort(keys) if with_index else None
+    ordered = keys[order] if with_index else np.sort(keys)
+    first = np.ones(len(ordered), dtype=bool)
+    first[1:] = ordered[1:] != ordered[:-1]
+    starts = np.flatnonzero(first)
+    return ordered[starts], np.diff(np.append(starts, len(ordered))), order[starts] if with_index else None
+
+
+def _lookup(needles: np.ndarray, haystack: np.ndarray):
+    """Indices into `needles` and sorted unique `haystack` of the values they share.
+
+    Much faster when `needles` is sorted too, since the binary searches then stay in cache.
+    """
+    index = np.minimum(np.searchsorted(haystack, needles), max(len(haystack) - 1, 0))
+    found = np.flatnonzero(haystack[index] == needles) if len(haystack) else np.zeros(0, dtype=np.int64)
+    return found, index[found]
+
+
+def _clipped_matches(hyp, ref, n_rows: int) -> np.ndarray:
+    """Per row, sum over shared n-grams of min(count in hypothesis, count in reference)."""
+    (h_rows, h_keys), (r_rows, r_keys) = hyp, ref
+    h_unique, h_counts, h_first = _group_counts(_row_scoped(h_rows, h_keys))
+    r_unique, r_counts, _ = _group_counts(_row_scoped(r_rows, r_keys), with_index=False)
+    hi, ri = _lookup(h_unique, r_unique)
+    return np.bincount(h_rows[h_first[hi]], weights=np.minimum(h_counts[hi], r_counts[ri]), minlength=n_rows)
+
+
+def _occurrence_rank_from_end(seq: _Sequences) -> np.ndarray:
+    """For each token, how many later tokens in the same row are identical to it."""
+    # Tokens are already in (row, position) order, so a stable sort on (row, token) keeps positions ordered
+    order = np.argsort(seq.rows * (int(seq.tokens.max(initial=0)) + 1) + seq.tokens, kind="stable")
+    rows, tokens = seq.rows[order], seq.tokens[order]
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = (rows[1:] != rows[:-1]) | (tokens[1:] != tokens[:-1])
+    group = np.cumsum(new_group) - 1
+    starts = np.flatnonzero(new_group)
+    sizes = np.diff(np.append(starts, len(order)))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = sizes[group] - 1 - (np.arange(len(order)) - starts[group])
+    return rank
+
+
+def _safe_div(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.divide(a, b, out=np.zeros(len(a)), where=b > 0)
+
+
+def _f_measure(precision: np.ndarray, recall: np.ndarray) -> np.ndarray:
+    return _safe_div(2 * precision * recall, precision + recall)
+
+
+class LexicalBatch:
+    """Tokenize every response/ground-truth pair once and compute F1, BLEU, GLEU, METEOR and ROUGE-4 in bulk.
+
+    The metrics follow the azure.ai.evaluation evaluators (SQuAD-style F1; BLEU with
+    nltk smoothing method 4; sentence GLEU over 1-4-grams; METEOR with its fragmentation
+    penalty; rouge-score ROUGE-4) with two simplifications: one regex tokenization
+    replaces nltk/rouge-score tokenizers, and METEOR uses exact matches only (no
+    stemming or WordNet synonyms), so scores can differ slightly on edge cases.
+    """
+
+    def __init__(self, responses: Sequence[str], ground_truths: Sequence[str]):
+        if len(responses) != len(ground_truths):
+            raise ValueError("responses and ground_truths must have the same length")
+        self.n_rows = len(responses)
+        vocab: Dict[str, int] = {}
+        self._raw = [self._tokenize(texts, vocab) for texts in (responses, ground_truths)]
+
+        words = list(vocab)
+        lower_vocab: Dict[str, int] = {}
+        lower = np.array([lower_vocab.setdefault(w.lower(), len(lower_vocab)) for w in words], dtype=np.int64)
+        is_word = np.array([bool(w) and (w[0].isalnum() or w[0] == "_") for w in words], dtype=bool)
+        is_article = np.array([w.lower() in _ARTICLES for w in words], dtype=bool)
+        everything = np.ones(len(words), dtype=bool)
+
+        # Views shared by the metrics; each one is derived from the single tokenization above
+        self._lower = [s.select(everything, lower, self.n_rows) for s in self._raw]
+        self._f1 = [s.select(is_word & ~is_article, lower, self.n_rows) for s in self._raw]
+        self._rouge = [s.select(is_word, lower, self.n_rows) for s in self._raw]
+        self._ngram_cache: Dict = {}
+
+    def _tokenize(self, texts: Sequence[str], vocab: Dict[str, int]) -> _Sequences:
+        tokenized = [_TOKEN_RE.findall(text or "") for text in texts]
+        flat = list(chain.from_iterable(tokenized))
+        # New words get the next ids in first-seen order; the lookups below run in C
+        for word in dict.fromkeys(flat):
+            vocab.setdefault(word, len(vocab))
+        lengths = np.fromiter(map(len, tokenized), dtype=np.int64, count=len(tokenized))
+        ids = np.fromiter(map(vocab.__getitem__, flat), dtype=np.int64, count=len(flat))
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        return _Sequences(rows, ids, len(texts))
+
+    def _ngram_stats(self, view: str, n: int):
+        """(matches, hypothesis n-gram count, reference n-gram count) per row, computed once per view and n."""
+        key = (view, n)
+        if key not in self._ngram_cache:
+            hyp, ref = getattr(self, f"_{view}")
+            h, r = hyp.ngrams(n), ref.ngrams(n)
+            self._ngram_cache[key] = (
+                _clipped_matches(h, r, self.n_rows),
+                np.bincount(h[0], minlength=self.n_rows).astype(float),
+                np.bincount(r[0], minlength=self.n_rows).astype(float),
+            )
+        return self._ngram_cache[key]
+
+    def f1(self) -> np.ndarray:
+        matches, hyp, ref = self._ngram_stats("f1", 1)
+        return _f_measure(_safe_div(matches, hyp), _safe_div(matches, ref))
+
+    def bleu(self, smoothing_k: int = 5) -> np.ndarray:
+        hyp_len = self._raw[0].lengths.astype(float)
+        ref_len = self._raw[1].lengths.astype(float)
+        log_sum = np.zeros(self.n_rows)
+        increments = np.ones(self.n_rows)
+        smooth = hyp_len > 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_hyp = np.log(np.where(smooth, hyp_len, 2.0))
+            for n in range(1, 5):
+                matches, _, _ = self._ngram_stats("raw", n)
+                denominator = np.maximum(1.0, hyp_len - n + 1)
+                zero = (matches == 0) & smooth
+                # nltk SmoothingFunction().method4
+                smoothed = 1.0 / (2.0 ** increments * smoothing_k / log_hyp) / denominator
+                precision = np.where(zero, smoothed, matches / denominator)
+                increments += zero
+                log_sum += 0.25 * np.log(precision)
+            brevity = np.where(hyp_len > ref_len, 1.0, np.exp(1 - ref_len / np.maximum(hyp_len, 1)))
+            score = brevity * np.exp(log_sum)
+        unigram_matches = self._ngram_stats("raw", 1)[0]
+        return np.where((hyp_len > 0) & (unigram_matches > 0), np.nan_to_num(score), 0.0)
+
+    def gleu(self) -> np.ndarray:
+        matches = hyp = ref = 0
+        for n in range(1, 5):
+            m, h, r = self._ngram_stats("raw", n)
+            matches, hyp, ref = matches + m, hyp + h, ref + r
+        return _safe_div(matches, np.maximum(hyp, ref))
+
+    def meteor(self, alpha: float = 0.9, beta: float = 3.0, gamma: float = 0.5) -> np.ndarray:
+        hyp, ref = self._lower
+        # nltk aligns exact matches from the end: the k-th last occurrence of a word in
+        # the hypothesis pairs with the k-th last occurrence in the reference
+        h_key = _splitmix(_row_scoped(hyp.rows, _splitmix(hyp.tokens.astype(_U64)))
+                          ^ _occurrence_rank_from_end(hyp).astype(_U64))
+        r_key = _splitmix(_row_scoped(ref.rows, _splitmix(ref.tokens.astype(_U64)))
+                          ^ _occurrence_rank_from_end(ref).astype(_U64))
+        h_order, r_order = np.argsort(h_key), np.argsort(r_key)
+        found, ri = _lookup(h_key[h_order], r_key[r_order])
+        # Back to hypothesis order, i.e. sorted by (row, position)
+        order = np.argsort(h_order[found])
+        hi, ri = h_order[found][order], r_order[ri][order]
+        rows, h_pos, r_pos = hyp.rows[hi], hyp.positions[hi], ref.positions[ri]
+        new_chunk = np.ones(len(rows), dtype=bool)
+        new_chunk[1:] = (rows[1:] != rows[:-1]) | (h_pos[1:] != h_pos[:-1] + 1) | (r_pos[1:] != r_pos[:-1] + 1)
+        matches = np.bincount(rows, minlength=self.n_rows).astype(float)
+        chunks = np.bincount(rows, weights=new_chunk, minlength=self.n_rows)
+
+        precision = _safe_div(matches, hyp.lengths.astype(float))
+        recall = _safe_div(matches, ref.lengths.astype(float))
+        fmean = _safe_div(precision * recall, alpha * precision + (1 - alpha) * recall)
+        penalty = gamma * _safe_div(chunks, matches) ** beta
+        return np.where(matches > 0, (1 - penalty) * fmean, 0.0)
+
+    def rouge(self, n: int = 4):
+        matches, hyp, ref = self._ngram_stats("rouge", n)
+        precision, recall = _safe_div(matches, hyp), _safe_div(matches, ref)
+        return precision, recall, _f_measure(precision, recall)
+
+    def compute(self, meteor_alpha: float = 0.9, meteor_beta: float = 3.0, meteor_gamma: float = 0.5,
+                rouge_n: int = 4) -> Dict[str, Dict[str, np.ndarray]]:
+        precision, recall, f1 = self.rouge(rouge_n)
+        return {
+            "f1": {"f1_score": self.f1()},
+            "bleu": {"bleu_score": self.bleu()},
+            "gleu": {"gleu_score": self.gleu()},
+            "meteor": {"meteor_score": self.meteor(meteor_alpha, meteor_beta, meteor_gamma)},
+            "rouge": {"rouge_precision": precision, "rouge_recall": recall, "rouge_f1_score": f1},
+        }
+
+
+def metric_rows(metrics: Dict[str, np.ndarray], threshold: float = 0.5,
+                prefixes: Optional[Dict[str, str]] = None) -> List[Dict[str, object]]:
+    """Per-row dicts with the evaluators' `<col>`, `<prefix>_result` and `<prefix>_threshold` keys.
+
+    `prefixes` maps a score column to its result/threshold prefix (see METRIC_COLUMNS);
+    columns without one use the column name.
+    """
+    prefixes = prefixes or {}
+    columns = list(metrics)
+    values = np.column_stack([metrics[c] for c in columns]).tolist() if columns else []
+    rows = []
+    for row in values:
+        out: Dict[str, object] = {}
+        for column, value in zip(columns, row):
+            prefix = prefixes.get(column, column)
+            out[column] = value
+            out[f"{prefix}_result"] = "pass" if value >= threshold else "fail"
+            out[f"{prefix}_threshold"] = threshold
+        rows.append(out)
+    return rows
+
+
+class LexicalMetricEngine:
+    """Batch evaluators for eval_runner that share one LexicalBatch across the five lexical metrics.
+
+    `engine.evaluator("bleu")` returns a batch evaluator; the first metric evaluated on
+    a set of rows computes all five and the others reuse the result.
+    """
+
+    def __init__(self, meteor_alpha: float = 0.9, meteor_beta: float = 3.0, meteor_gamma: float = 0.5,
+                 threshold: float = 0.5):
+        self.params = dict(meteor_alpha=meteor_alpha, meteor_beta=meteor_beta, meteor_gamma=meteor_gamma)
+        self.threshold = threshold
+        self._key: Optional[str] = None
+        self._metrics: Dict[str, Dict[str, np.ndarray]] = {}
+
+    @property
+    def version(self) -> str:
+        # "columns=2": result/threshold keys follow the SDK names, so rows cached before that are recomputed
+        return ",".join(f"{k}={v}" for k, v in sorted(self.params.items())) + f",threshold={self.threshold},columns=2"
+
+    def _compute(self, responses: List[str], ground_truths: List[str]) -> Dict[str, Dict[str, np.ndarray]]:
+        digest = hashlib.sha256()
+        for text in (*responses, "\0\0", *ground_truths):
+            digest.update((text or "").encode("utf-8") + b"\0")
+        if digest.hexdigest() != self._key:
+            self._metrics = LexicalBatch(responses, ground_truths).compute(**self.params)
+            self._key = digest.hexdigest()
+        return self._metrics
+
+    def evaluator(self, name: str):
+        if name not in METRIC_COLUMNS:
+            raise ValueError(f"Unknown lexical metric '{name}'.")
+        engine = self
+
+        class LexicalMetric:
+            def __call__(self, inputs: List[Dict[str, str]]) -> List[Dict[str, object]]:
+                responses = [i.get("response") or "" for i in inputs]
+                ground_truths = [i.get("ground_truth") or "" for i in inputs]
+                return metric_rows(engine._compute(responses, ground_truths)[name], engine.threshold,
+                                   dict(METRIC_COLUMNS[name]))
+
+        LexicalMetric.__qualname__ = f"LexicalMetric.{name}"
+        return LexicalMetric()
+
+
+def reference_metrics(response: str, ground_truth: str, meteor_alpha: float = 0.9, meteor_beta: float = 3.0,
+                      meteor_gamma: float = 0.5) -> Dict[str, float]:
+    """Straightforward per-row version of LexicalBatch.compute, used to check it and as the benchmark baseline."""
+    hyp_raw, ref_raw = _TOKEN_RE.findall(response or ""), _TOKEN_RE.findall(ground_truth or "")
+
+    def is_word(token):
+        return token[0].isalnum() or token[0] == "_"
+
+    def ngrams(tokens, n):
+        return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+    def overlap(a, b):
+        return sum((a & b).values())
+
+    def f_measure(p, r):
+        return 2 * p * r / (p + r) if p + r > 0 else 0.0
+
+    out = {}
+    hyp = [t.lower() for t in hyp_raw if is_word(t) and t.lower() not in _ARTICLES]
+    ref = [t.lower() for t in ref_raw if is_word(t) and t.lower() not in _ARTICLES]
+    same = overlap(Counter(hyp), Counter(ref))
+    out["f1_score"] = f_measure(same / len(hyp), same / len(ref)) if same else 0.0
+
+    hyp_len, ref_len = len(hyp_raw), len(ref_raw)
+    precisions, increments = [], 1
+    for n in range(1, 5):
+        matches = overlap(ngrams(hyp_raw, n), ngrams(ref_raw, n))
+        denominator = max(1, hyp_len - n + 1)
+        if matches == 0 and hyp_len > 1:
+            precisions.append(1 / (2 ** increments * 5 / math.log(hyp_len)) / denominator)
+            increments += 1
+        else:
+            precisions.append(matches / denominator)
+    if hyp_len == 0 or overlap(ngrams(hyp_raw, 1), ngrams(ref_raw, 1)) == 0 or min(precisions) == 0:
+        out["bleu_score"] = 0.0
+    else:
+        brevity = 1.0 if hyp_len > ref_len else math.exp(1 - ref_len / hyp_len)
+        out["bleu_score"] = brevity * math.exp(sum(0.25 * math.log(p) for p in precisions))
+
+    hyp_all, ref_all = Counter(), Counter()
+    for n in range(1, 5):
+        hyp_all.update(ngrams(hyp_raw, n))
+        ref_all.update(ngrams(ref_raw, n))
+    total = max(sum(hyp_all.values()), sum(ref_all.values()))
+    out["gleu_score"] = overlap(hyp_all, ref_all) / total if total else 0.0
+
+    hyp_lower = list(enumerate(t.lower() for t in hyp_raw))
+    ref_lower = list(enumerate(t.lower() for t in ref_raw))
+    matches = []
+    for i in range(len(hyp_lower))[::-1]:
+        for j in range(len(ref_lower))[::-1]:
+            if hyp_lower[i][1] == ref_lower[j][1]:
+                matches.append((hyp_lower[i][0], ref_lower[j][0]))
+                hyp_lower.pop(i)
+                ref_lower.pop(j)
+                break
+    matches.sort()
+    if matches:
+        chunks = 1 + sum(1 for a, b in zip(matches, matches[1:]) if not (b[0] == a[0] + 1 and b[1] == a[1] + 1))
+        precision, recall = len(matches) / hyp_len, len(matches) / ref_len
+        fmean = precision * recall / (meteor_alpha * precision + (1 - meteor_alpha) * recall)
+        out["meteor_score"] = (1 - meteor_gamma * (chunks / len(matches)) ** meteor_beta) * fmean
+    else:
+        out["meteor_score"] = 0.0
+
+    hyp_words = [t.lower() for t in hyp_raw if is_word(t)]
+    ref_words = [t.lower() for t in ref_raw if is_word(t)]
+    h4, r4 = ngrams(hyp_words, 4), ngrams(ref_words, 4)
+    same = overlap(h4, r4)
+    precision = same / max(sum(h4.values()), 1)
+    recall = same / max(sum(r4.values()), 1)
+    out.update(rouge_precision=precision, rouge_recall=recall, rouge_f1_score=f_measure(precision, recall))
+    return out
+
+
+def synthetic_rows(count: int, seed: int = 0, vocabulary: int = 2000, length: int = 40):
+    """Response/ground-truth pairs that share a random part of their wording."""
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocabulary)] + ["the", "a", "an", ",", "."]
+    responses, truths = [], []
+    for _ in range(count):
+        truth = [rng.choice(words) for _ in range(rng.randint(length // 2, length))]
+        response = [w if rng.random() < 0.6 else rng.choice(words) for w in truth]
+        if rng.random() < 0.3:
+            response = response[: len(response) // 2]
+        truths.append(" ".join(truth))
+        responses.append(" ".join(response).capitalize())
+    return responses, truths
+
+
+def benchmark(rows: int = 100_000, sample: int = 2000) -> Dict[str, float]:
+    """Seconds for the batch engine on `rows` rows vs the per-row path (timed on `sample` rows, scaled)."""
+    responses, truths = synthetic_rows(rows)
+    start = time.perf_counter()
+    LexicalBatch(responses, truths).compute()
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for response, truth in zip(responses[:sample], truths[:sample]):
+        reference_metrics(response, truth)
+    per_row_seconds = (time.perf_counter() - start) * rows / sample
+    return {"rows": rows, "batch_seconds": batch_seconds, "per_row_seconds_estimated": per_row_seconds,
+            "speedup": per_row_seconds / batch_seconds}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch lexical metric benchmark")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--sample", type=int, default=2000, help="rows timed on the per-row path")
+    args = parser.parse_args()
+    result = benchmark(args.rows, args.sample)
+    print(f"{result['rows']} rows: batch {result['batch_seconds']:.2f}s, "
+          f"per-row ~{result['per_row_seconds_estimated']:.1f}s ({result['speedup']:.1f}x)")
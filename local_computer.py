@@ -1,16 +1,39 @@
 import asyncio
 import base64
-import io
+import os
 import platform
 
 import pyautogui
 
+from cua_actions import motion_duration
+from screen_capture import CaptureBackend, capture_encoded, get_capture_backend
+
 
 class LocalComputer:
-    """Use pyautogui to take screenshots and perform actions on the local computer."""
+    """Use pyautogui to perform actions on the local computer; screenshots come from a capture backend.
+
+    Mouse animation times default to CUA_MOUSE_DURATION / CUA_<MOVE|SCROLL|DRAG>_DURATION
+    (0 is instant); `drag_duration` is the time for a whole drag, not per path point.
+    `pause` overrides pyautogui's 0.1 s sleep after every call (CUA_ACTION_PAUSE).
+    """
 
-    def __init__(self):
+    def __init__(
+        self,
+        capture: CaptureBackend | None = None,
+        move_duration: float | None = None,
+        scroll_duration: float | None = None,
+        drag_duration: float | None = None,
+        pause: float | None = None,
+    ):
         self.size = None
+        self.capture = capture or get_capture_backend()
+        self.move_duration = motion_duration("move", 0.1) if move_duration is None else move_duration
+        self.scroll_duration = motion_duration("scroll", 0.5) if scroll_duration is None else scroll_duration
+        self.drag_duration = motion_duration("drag", 1.0) if drag_duration is None else drag_duration
+        if pause is None and os.getenv("CUA_ACTION_PAUSE"):
+            pause = float(os.getenv("CUA_ACTION_PAUSE"))
+        if pause is not None:
+            pyautogui.PAUSE = pause
 
     @property
     def environment(self):
@@ -27,34 +50,36 @@ class LocalComputer:
     @property
     def dimensions(self):
         if not self.size:
-            screenshot = pyautogui.screenshot()
-            self.size = screenshot.size
+            # Cached display geometry; no full screenshot just to read the size
+            self.size = self.capture.geometry
         return self.size
 
+    async def screenshot_image(self):
+        """Unencoded frame (PIL image or RawFrame) for cua.Scaler, which scales and encodes it once."""
+        frame = self.capture.grab()
+        self.size = frame.size
+        return frame
+
     async def screenshot(self) -> str:
-        screenshot = pyautogui.screenshot()
-        self.size = screenshot.size
-        buffer = io.BytesIO()
-        screenshot.save(buffer, format="PNG")
-        buffer.seek(0)
-        data = bytearray(buffer.getvalue())
+        data, _ = capture_encoded(self.capture, "PNG")
+        self.size = self.capture.geometry
         return base64.b64encode(data).decode("utf-8")
 
     async def click(self, x: int, y: int, button: str = "left") -> None:
         width, height = self.size
         if 0 <= x < width and 0 <= y < height:
             button = "middle" if button == "wheel" else button
-            pyautogui.moveTo(x, y, duration=0.1)
+            pyautogui.moveTo(x, y, duration=self.move_duration)
             pyautogui.click(x, y, button=button)
 
     async def double_click(self, x: int, y: int) -> None:
         width, height = self.size
         if 0 <= x < width and 0 <= y < height:
-            pyautogui.moveTo(x, y, duration=0.1)
+            pyautogui.moveTo(x, y, duration=self.move_duration)
             pyautogui.doubleClick(x, y)
 
     async def scroll(self, x: int, y: int, scroll_x: int, scroll_y: int) -> None:
-        pyautogui.moveTo(x, y, duration=0.5)
+        pyautogui.moveTo(x, y, duration=self.scroll_duration)
         pyautogui.scroll(-scroll_y)
         pyautogui.hscroll(scroll_x)
 
@@ -65,7 +90,7 @@ class LocalComputer:
         await asyncio.sleep(ms / 1000)
 
     async def move(self, x: int, y: int) -> None:
-        pyautogui.moveTo(x, y, duration=0.1)
+        pyautogui.moveTo(x, y, duration=self.move_duration)
 
     async def keypress(self, keys: list[str]) -> None:
         keys = [key.lower() for key in keys]
@@ -82,14 +107,16 @@ class LocalComputer:
             pyautogui.keyUp(key)
 
     async def drag(self, path: list[tuple[int, int]]) -> None:
+        # The drag time is shared by all segments instead of a full second per point
+        segment = self.drag_duration / max(1, len(path) - 1)
         if len(path) <= 1:
             pass
         elif len(path) == 2:
-            pyautogui.moveTo(*path[0], duration=0.5)
-            pyautogui.dragTo(*path[1], duration=1.0, button="left")
+            pyautogui.moveTo(*path[0], duration=self.move_duration)
+            pyautogui.dragTo(*path[1], duration=segment, button="left")
         else:
-            pyautogui.moveTo(*path[0], duration=0.5)
+            pyautogui.moveTo(*path[0], duration=self.move_duration)
             pyautogui.mouseDown(button="left")
             for point in path[1:]:
-                pyautogui.dragTo(*point, duration=1.0, mouseDownUp=False)
+                pyautogui.dragTo(*point, duration=segment, mouseDownUp=False)
             pyautogui.mouseUp(button="left")
\ No newline at end of file
@@ -8,9 +8,11 @@ import argparse
 import asyncio
 import logging
 import os
+import time
 
 import cua
-import local_computer
+from cua_replay import RecordingComputer, ReplayClient, ReplayComputer, SessionRecorder
+from frame_diff import FrameDiffer
 import openai
 from dotenv import load_dotenv
 
@@ -68,9 +70,18 @@ async def main():
     parser.add_argument("--autoplay", dest="autoplay", action="store_true",
         default=True, help="Autoplay actions without confirmation")
     parser.add_argument("--environment", dest="environment", default="linux")
+    parser.add_argument("--crop-changes", dest="crop_changes", action="store_true",
+        help="Also send small changed regions at full resolution")
+    parser.add_argument("--record", dest="record", metavar="DIR",
+        help="Record model calls, actions and screenshots to a session archive")
+    parser.add_argument("--replay", dest="replay", metavar="DIR",
+        help="Re-run a recorded session offline, without a model or a desktop")
     args = parser.parse_args()
 
-    if args.endpoint == "azure":
+    recorder = SessionRecorder(args.record) if args.record else None
+    if args.replay:
+        client = ReplayClient(args.replay)
+    elif args.endpoint == "azure":
         client = openai.AsyncAzureOpenAI(
             azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
             api_key=os.environ["AZURE_OPENAI_KEY"],
@@ -82,14 +93,27 @@ async def main():
     model = args.model
 
     # Computer is used to take screenshots and send keystrokes or mouse clicks
-    computer = local_computer.LocalComputer()
+    if args.replay:
+        computer = ReplayComputer(args.replay)
+    else:
+        import local_computer  # needs a desktop; not imported for offline replays
+
+        computer = local_computer.LocalComputer()
+    if recorder:
+        computer = RecordingComputer(computer, recorder)
     print(f"Computer environment: {computer.environment}")
 
-    # Scaler is used to resize the screen to a smaller size
-    computer = cua.Scaler(computer, (1024, 768))
+    # Scaler is used to resize the screen to a smaller size; unchanged frames are not re-encoded
+    computer = cua.Scaler(
+        computer,
+        (1024, 768),
+        differ=FrameDiffer(),
+        crop_changes=args.crop_changes,
+    )
 
     # Agent to run the CUA model and keep track of state
     agent = cua.Agent(client, model, computer)
+    agent.recorder = recorder
 
     # Get the user request
     if args.instructions:
@@ -99,11 +123,18 @@ async def main():
 
     logger.info(f"User: {user_input}")
     agent.start_task()
+    started = time.perf_counter()
     while True:
+        if args.replay and client.remaining == 0:
+            logger.info(f"Replayed {args.replay} in {time.perf_counter() - started:.2f}s")
+            user_input = "exit"
+        elif args.replay and not user_input and agent.requires_user_input:
+            user_input = client.next_user_message()
         if not user_input and agent.requires_user_input:
             logger.info("")
             user_input = input("User: ")
         if user_input.lower() in ["exit", "quit", "stop"]:
+            logger.info(f"Screenshot stats: {computer.frame_stats.summary()}")
             logger.info("Exiting...")
             break
         await agent.continue_task(user_input)
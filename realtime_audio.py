@@ -0,0 +1,287 @@
+import asyncio
+import io
+import os
+import threading
+import wave
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Deque, List, Optional
+
+
+@dataclass
+class PcmFrame:
+    """Interleaved signed 16-bit little-endian PCM taken from one media frame."""
+
+    data: bytes
+    sample_rate: int
+    channels: int
+    pts: Optional[int] = None
+
+    @property
+    def duration(self) -> float:
+        return len(self.data) / (2 * self.channels * self.sample_rate)
+
+
+def pcm_to_wav_bytes(pcm: bytes, sample_rate: int, channels: int) -> bytes:
+    """Wrap raw s16le PCM in a WAV container in memory."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class PcmRingBuffer:
+    """Bounded FIFO of PCM frames with an async iterator for a single consumer.
+
+    When more than `max_seconds` of audio is queued the oldest frames are dropped
+    (and counted in `dropped_frames`) so a slow consumer can never grow memory.
+    """
+
+    def __init__(self, max_seconds: float = 30.0):
+        self.max_seconds = max_seconds
+        self._frames: Deque[PcmFrame] = deque()
+        self._queued_seconds = 0.0
+        self._event = asyncio.Event()
+        self._closed = False
+        self.dropped_frames = 0
+        self.total_frames = 0
+        self.total_bytes = 0
+
+    def put(self, frame: PcmFrame) -> None:
+        if self._closed:
+            return
+        self._frames.append(frame)
+        self._queued_seconds += frame.duration
+        self.total_frames += 1
+        self.total_bytes += len(frame.data)
+        while self._queued_seconds > self.max_seconds and len(self._frames) > 1:
+            dropped = self._frames.popleft()
+            self._queued_seconds -= dropped.duration
+            self.dropped_frames += 1
+        self._event.set()
+
+    def close(self) -> None:
+        self._closed = True
+        self._event.set()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def drain(self) -> List[PcmFrame]:
+        """Remove and return everything queued right now without waiting."""
+        frames = list(self._frames)
+        self._frames.clear()
+        self._queued_seconds = 0.0
+        return frames
+
+    async def get(self) -> Optional[PcmFrame]:
+        """Next frame, or None once the buffer is closed and empty."""
+        while not self._frames:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        frame = self._frames.popleft()
+        self._queued_seconds -= frame.duration
+        return frame
+
+    def __aiter__(self) -> AsyncIterator[PcmFrame]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[PcmFrame]:
+        while True:
+            frame = await self.get()
+            if frame is None:
+                return
+            yield frame
+
+
+class WavFileSink:
+    """Optional side sink that persists frames to a WAV file as they arrive."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._wav: Optional[wave.Wave_write] = None
+
+    def write(self, frame: PcmFrame) -> None:
+        if self._wav is None:
+            # The path may have been reserved long before the first frame arrives
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._wav = wave.open(self.path, "wb")
+            self._wav.setnchannels(frame.channels)
+            self._wav.setsampwidth(2)
+            self._wav.setframerate(frame.sample_rate)
+        self._wav.writeframes(frame.data)
+
+    def close(self) -> None:
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+
+def frame_to_pcm(frame, resampler=None) -> tuple[PcmFrame, object]:
+    """Convert an av.AudioFrame to packed s16 PCM, creating a resampler only if needed."""
+    channels = len(frame.layout.channels)
+    if frame.format.name != "s16":
+        if resampler is None:
+            import av
+
+            resampler = av.AudioResampler(format="s16", layout=frame.layout.name, rate=frame.sample_rate)
+        converted = resampler.resample(frame)
+        frames = converted if isinstance(converted, list) else [converted]
+        data = b"".join(bytes(f.planes[0])[: f.samples * channels * 2] for f in frames)
+    else:
+        data = bytes(frame.planes[0])[: frame.samples * channels * 2]
+    return PcmFrame(data, frame.sample_rate, channels, frame.pts), resampler
+
+
+class TrackPcmReader:
+    """Pull frames from a remote aiortc audio track into a PcmRingBuffer (and optional sinks)."""
+
+    def __init__(self, track, buffer: PcmRingBuffer, sinks: Optional[list] = None):
+        self.track = track
+        self.buffer = buffer
+        self.sinks = sinks or []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        from aiortc.mediastreams import MediaStreamError
+
+        resampler = None
+        try:
+            while True:
+                try:
+                    frame = await self.track.recv()
+                except MediaStreamError:
+                    break
+                pcm, resampler = frame_to_pcm(frame, resampler)
+                self.buffer.put(pcm)
+                for sink in self.sinks:
+                    sink.write(pcm)
+        finally:
+            for sink in self.sinks:
+                sink.close()
+            self.buffer.close()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            self.buffer.close()
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+class BackgroundLoop:
+    """Event loop on a daemon thread, so a realtime session can outlive a Streamlit rerun.
+
+    Callers `claim()` the loop for as long as they use it and `release()` it after;
+    an idle stop only goes ahead through `begin_idle_stop()` while nobody holds a
+    claim, and from then on `claim()` fails so the caller starts a new loop instead.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self._state_lock = threading.Lock()
+        self._claims = 0
+        self._stopping = False
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        # Cancel whatever is still scheduled so callers waiting on submit() are released
+        pending = asyncio.all_tasks(self.loop)
+        for task in pending:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self.loop.close()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopping or not self.thread.is_alive()
+
+    def claim(self) -> bool:
+        """Keep the loop from stopping while idle; False if it is already stopping."""
+        with self._state_lock:
+            if self.stopped:
+                return False
+            self._claims += 1
+            return True
+
+    def release(self) -> None:
+        with self._state_lock:
+            self._claims = max(0, self._claims - 1)
+
+    def begin_idle_stop(self) -> bool:
+        """Mark the loop as stopping unless it is claimed; the caller then closes its work and calls stop()."""
+        with self._state_lock:
+            if self._claims:
+                return False
+            self._stopping = True
+            return True
+
+    def stop(self):
+        """Stop the loop and let its thread exit; safe to call from any thread, including the loop's own."""
+        with self._state_lock:
+            self._stopping = True
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        return self.submit(coro).result(timeout)
+
+
+class IdleTimer:
+    """Awaits `close()` and then calls `on_idle()` after `timeout` seconds without `touch()`.
+
+    `guard()` is asked first (e.g. BackgroundLoop.begin_idle_stop); when it returns
+    False the owner is still in use and the timer starts over. A timeout of 0 or
+    less disables it. Must be used from one event loop.
+    """
+
+    def __init__(self, timeout: float, close: Callable[[], Awaitable[None]],
+                 on_idle: Optional[Callable[[], None]] = None, guard: Optional[Callable[[], bool]] = None):
+        self.timeout = timeout
+        self.close = close
+        self.on_idle = on_idle
+        self.guard = guard
+        self._task: Optional[asyncio.Future] = None
+
+    def touch(self) -> None:
+        """Restart the countdown."""
+        self.cancel()
+        if self.timeout > 0:
+            self._task = asyncio.ensure_future(self._expire())
+
+    def cancel(self) -> None:
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
+
+    async def _expire(self) -> None:
+        await asyncio.sleep(self.timeout)
+        self._task = None
+        if self.guard is not None and not self.guard():
+            self.touch()
+            return
+        await self.close()
+        if self.on_idle is not None:
+            self.on_idle()
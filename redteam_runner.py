@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AttackBudget:
+    """Global cap on in-flight target calls plus a minimum spacing between calls (calls per minute).
+
+    Shared by every scan of a RedTeamOrchestrator; REDTEAM_CONCURRENCY and
+    REDTEAM_RATE_PER_MINUTE set the defaults (a rate of 0 means unlimited).
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, rate_per_minute: Optional[float] = None):
+        self.concurrency = concurrency or int(os.getenv("REDTEAM_CONCURRENCY", "4"))
+        if rate_per_minute is None:
+            rate_per_minute = float(os.getenv("REDTEAM_RATE_PER_MINUTE", "0"))
+        self.interval = 60.0 / rate_per_minute if rate_per_minute else 0.0
+        self.in_flight = 0
+        self.peak = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        await self._semaphore.acquire()
+        if self.interval:
+            # Reserve the next start slot before sleeping, so waiters are spaced evenly
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+            if start > now:
+                await asyncio.sleep(start - now)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+def _message_dict(message: Any) -> Dict[str, Any]:
+    if isinstance(message, dict):
+        return {"role": message.get("role"), "content": message.get("content")}
+    return {"role": message.role, "content": message.content}
+
+
+class AttackLog:
+    """Per-attack results of one scan as JSONL, appended as each target call finishes.
+
+    Each record holds the conversation sent to the target and the target's reply,
+    keyed by a hash of the conversation and the scan's fingerprint; a rerun of the
+    same scan against the same target serves recorded replies instead of calling the
+    target again. A final `scan_complete` record marks a finished scan.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.responses: Dict[str, Any] = {}
+        self.completed: Dict[str, Any] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record.get("type") == "scan_complete":
+                        self.completed[record["fingerprint"]] = record
+                    else:
+                        self.responses[record["key"]] = record["response"]
+
+    @staticmethod
+    def key(conversation: List[Dict[str, Any]], fingerprint: str = "") -> str:
+        payload = {"fingerprint": fingerprint, "conversation": conversation}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        record = {"t": time.time(), **record}
+        with self._lock:
+            if record.get("type") == "scan_complete":
+                self.completed[record["fingerprint"]] = record
+            else:
+                self.responses[record["key"]] = record["response"]
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+def _code_hash(target: Any) -> Optional[str]:
+    """Hash of a callable target's bytecode and constants (None for a model config)."""
+    if not callable(target):
+        return None
+    code = getattr(target, "__code__", None) or getattr(getattr(type(target), "__call__", None), "__code__", None)
+    if code is None:
+        return None
+    return hashlib.sha256(code.co_code + repr(code.co_consts).encode("utf-8")).hexdigest()
+
+
+class RedTeamScanError(RuntimeError):
+    """One or more scans of a RedTeamOrchestrator run failed; `failures` maps scan name to its exception."""
+
+    def __init__(self, failures: Dict[str, BaseException]):
+        self.failures = failures
+        super().__init__("; ".join(f"{name}: {error}" for name, error in failures.items()))
+
+
+@dataclass
+class ScanJob:
+    """One `RedTeam.scan` call. Give every job its own RedTeam instance, since scans run concurrently.
+
+    `target` is a simple `str -> str` callable, a chat-protocol callback
+    (`messages, stream, session_state, context`) or a model config dict. Callables are
+    routed through the shared budget and attack log; a model config is called by the
+    SDK itself, so only its scan-level parallelism (`max_parallel_tasks`) is limited.
+    `expected_attacks` is only used to show progress. The fingerprint covers the
+    target's code; bump `target_version` when something it calls changes, so a rerun
+    doesn't replay the old target's replies.
+    """
+
+    name: str
+    red_team: Any
+    target: Any
+    scan_kwargs: Dict[str, Any] = field(default_factory=dict)
+    output_path: Optional[str] = None
+    expected_attacks: Optional[int] = None
+    target_version: str = ""
+
+    @property
+    def fingerprint(self) -> str:
+        config = {"name": self.name, "target": getattr(self.target, "__qualname__", repr(self.target)),
+                  "target_code": _code_hash(self.target), "target_version": self.target_version,
+                  "scan_kwargs": self.scan_kwargs}
+        return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class RedTeamOrchestrator:
+    """Run several red-team scans concurrently on one event loop under one AttackBudget.
+
+    Each scan writes its SDK result to `output_path` (default `<output_dir>/<name>.json`,
+    the `Advanced-Callback-Scan.json` format) and streams per-attack records to
+    `<output_path minus .json>.attacks.jsonl` as they arrive. On a rerun, a scan whose
+    log marks it complete with the same configuration is skipped and its saved result
+    loaded, and attacks already answered in an unfinished scan are replayed from the
+    log instead of hitting the target. `on_progress(orchestrator)` is called after
+    every attack and every status change; see `status` and `fraction`.
+    """
+
+    def __init__(self, jobs: List[ScanJob], budget: Optional[AttackBudget] = None, output_dir: str = ".",
+                 on_progress: Optional[Callable[["RedTeamOrchestrator"], None]] = None):
+        self.jobs = jobs
+        self.budget = budget or AttackBudget()
+        self.output_dir = output_dir
+        self.on_progress = on_progress
+        self.status: Dict[str, Dict[str, Any]] = {
+            job.name: {"state": "pending", "attacks": 0, "replayed": 0, "expected": job.expected_attacks}
+            for job in jobs
+        }
+
+    @property
+    def fraction(self) -> float:
+        """Overall progress in [0, 1]; a running scan counts at most 95% until the SDK returns."""
+        if not self.jobs:
+            return 1.0
+        total = 0.0
+        for status in self.status.values():
+            if status["state"] in ("done", "skipped", "failed"):
+                total += 1.0
+            elif status["expected"]:
+                total += min(0.95, (status["attacks"] + status["replayed"]) / status["expected"])
+        return total / len(self.jobs)
+
+    def _update(self, name: str, **changes: Any) -> None:
+        status = self.status[name]
+        for key, value in changes.items():
+            status[key] = status[key] + value if key in ("attacks", "replayed") else value
+        if self.on_progress is not None:
+            try:
+                self.on_progress(self)
+            except Exception as e:
+                logger.warning("Progress callback failed: %s", e)
+
+    def output_path(self, job: ScanJob) -> str:
+        return job.output_path or os.path.join(self.output_dir, f"{job.name}.json")
+
+    def _wrap(self, job: ScanJob, log: AttackLog):
+        target = job.target
+        chat_protocol = "messages" in inspect.signature(target).parameters
+
+        async def call_target(messages, stream, session_state, context):
+            if chat_protocol:
+                result = target(messages=messages, stream=stream, session_state=session_state, context=context)
+                return await result if inspect.isawaitable(result) else result
+            query = _message_dict(messages[-1])["content"]
+            if inspect.iscoroutinefunction(target):
+                reply = await target(query)
+            else:
+                # Sync targets run off the loop so the other scans keep going
+                reply = await asyncio.to_thread(target, query)
+            return {"messages": [{"role": "assistant", "content": reply}]}
+
+        async def callback(messages, stream: bool = False, session_state: Any = None,
+                           context: Optional[Dict] = None) -> dict:
+            conversation = [_message_dict(m) for m in messages]
+            key = AttackLog.key(conversation, job.fingerprint)
+            if key in log.responses:
+                self._update(job.name, replayed=1)
+                return log.responses[key]
+            async with self.budget:
+                start = time.perf_counter()
+                result = await call_target(messages, stream, session_state, context)
+            log.append({"key": key, "scan": job.name, "conversation": conversation, "response": result,
+                        "elapsed": time.perf_counter() - start})
+            self._update(job.name, attacks=1)
+            return result
+
+        return callback
+
+    async def _run_job(self, job: ScanJob) -> Any:
+        output_path = self.output_path(job)
+        log = AttackLog(f"{os.path.splitext(output_path)[0]}.attacks.jsonl")
+        if job.fingerprint in log.completed and os.path.exists(output_path):
+            self._update(job.name, state="skipped")
+            with open(output_path, encoding="utf-8") as f:
+                return json.load(f)
+
+        target = self._wrap(job, log) if callable(job.target) else job.target
+        kwargs = {"max_parallel_tasks": self.budget.concurrency, **job.scan_kwargs}
+        self._update(job.name, state="running")
+        try:
+            if callable(job.target):
+                result = await job.red_team.scan(target=target, scan_name=job.name, output_path=output_path, **kwargs)
+            else:
+                # The SDK calls a model config itself, so the whole scan holds one budget slot
+                async with self.budget:
+                    result = await job.red_team.scan(target=target, scan_name=job.name, output_path=output_path,
+                                                     **kwargs)
+        except Exception:
+            self._update(job.name, state="failed")
+            raise
+        log.append({"type": "scan_complete", "fingerprint": job.fingerprint, "scan": job.name,
+                    "output_path": output_path})
+        self._update(job.name, state="done")
+        return result
+
+    async def run(self, raise_on_failure: bool = False) -> Dict[str, Any]:
+        """Run every scan; returns {scan name: result or the exception it raised}.
+
+        With `raise_on_failure`, a failed scan raises RedTeamScanError once every scan
+        has finished, instead of being returned as a value.
+        """
+        results = await asyncio.gather(*(self._run_job(job) for job in self.jobs), return_exceptions=True)
+        failures = {}
+        for job, result in zip(self.jobs, results):
+            if isinstance(result, BaseException):
+                logger.error("Red team scan %s failed: %s", job.name, result)
+                failures[job.name] = result
+        if raise_on_failure and failures:
+            raise RedTeamScanError(failures) from next(iter(failures.values()))
+        return {job.name: result for job, result in zip(self.jobs, results)}
@@ -0,0 +1,206 @@
+import argparse
+import os
+import platform
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+from screenshot_codec import SCREENSHOT_MIME_TYPES, RawFrame, encode_image, to_image
+
+Frame = Union[Image.Image, RawFrame]
+
+
+class CaptureBackend:
+    """Grab the primary screen. Subclasses return a PIL image or a RawFrame (no encoding)."""
+
+    name = "base"
+
+    def __init__(self):
+        self._geometry: Optional[Tuple[int, int]] = None
+
+    def grab(self) -> Frame:
+        raise NotImplementedError
+
+    def _query_geometry(self) -> Tuple[int, int]:
+        return to_image(self.grab()).size
+
+    @property
+    def geometry(self) -> Tuple[int, int]:
+        """(width, height) of the screen, queried once and cached."""
+        if self._geometry is None:
+            self._geometry = self._query_geometry()
+        return self._geometry
+
+    def refresh_geometry(self) -> None:
+        self._geometry = None
+
+    def close(self) -> None:
+        pass
+
+
+class MssBackend(CaptureBackend):
+    """mss grabber; on X11 it uses the MIT-SHM extension, so frames come through shared memory.
+
+    mss handles are not thread-safe, so one is kept per thread.
+    """
+
+    name = "mss"
+
+    def __init__(self, monitor: int = 1):
+        super().__init__()
+        import mss
+
+        self._mss = mss
+        self.monitor_index = monitor
+        self._local = threading.local()
+
+    def _handle(self):
+        handle = getattr(self._local, "handle", None)
+        if handle is None:
+            factory = getattr(self._mss, "MSS", None)
+            handle = None
+            if factory is not None and platform.system() == "Linux":
+                try:
+                    handle = factory(backend="xshmgetimage")
+                except Exception:
+                    handle = None  # older mss, or no MIT-SHM on this display
+            if handle is None:
+                handle = factory() if factory is not None else self._mss.mss()
+            self._local.handle = handle
+        return handle
+
+    def _monitor(self) -> dict:
+        return self._handle().monitors[self.monitor_index]
+
+    def _query_geometry(self) -> Tuple[int, int]:
+        monitor = self._monitor()
+        return monitor["width"], monitor["height"]
+
+    def grab(self) -> RawFrame:
+        shot = self._handle().grab(self._monitor())
+        return RawFrame(shot.raw, shot.size, "BGRX")
+
+    def close(self) -> None:
+        handle = getattr(self._local, "handle", None)
+        if handle is not None:
+            handle.close()
+            self._local.handle = None
+
+
+class PyAutoGuiBackend(CaptureBackend):
+    """The previous LocalComputer path."""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        super().__init__()
+        import pyautogui
+
+        self._pyautogui = pyautogui
+
+    def _query_geometry(self) -> Tuple[int, int]:
+        return tuple(self._pyautogui.size())
+
+    def grab(self) -> Image.Image:
+        return self._pyautogui.screenshot()
+
+
+class ImageGrabBackend(CaptureBackend):
+    """The previous stcua.capture_screenshot path."""
+
+    name = "imagegrab"
+
+    def __init__(self):
+        super().__init__()
+        from PIL import ImageGrab
+
+        self._image_grab = ImageGrab
+
+    def grab(self) -> Image.Image:
+        return self._image_grab.grab()
+
+
+BACKENDS = {cls.name: cls for cls in (MssBackend, PyAutoGuiBackend, ImageGrabBackend)}
+
+
+def get_capture_backend(name: Optional[str] = None) -> CaptureBackend:
+    """Backend by name, or SCREEN_CAPTURE_BACKEND, or the first of mss/pyautogui/imagegrab that loads."""
+    name = (name or os.getenv("SCREEN_CAPTURE_BACKEND", "auto")).lower()
+    if name != "auto":
+        return BACKENDS[name]()
+    for candidate in ("mss", "pyautogui", "imagegrab"):
+        try:
+            backend = BACKENDS[candidate]()
+            backend.geometry  # mss imports fine without a display; fail here instead of on the first grab
+            return backend
+        except Exception:
+            continue
+    raise RuntimeError("No screen capture backend is available")
+
+
+def capture_encoded(
+    backend: CaptureBackend,
+    image_format: Optional[str] = None,
+    quality: Optional[int] = None,
+) -> Tuple[bytes, str]:
+    """Grab and encode one frame; format/quality default to CUA_SCREENSHOT_FORMAT / CUA_SCREENSHOT_QUALITY."""
+    image_format = (image_format or os.getenv("CUA_SCREENSHOT_FORMAT", "PNG")).upper()
+    quality = quality or int(os.getenv("CUA_SCREENSHOT_QUALITY", "85"))
+    data = encode_image(to_image(backend.grab()), image_format, quality)
+    return data, SCREENSHOT_MIME_TYPES[image_format]
+
+
+def _legacy_png(backend: CaptureBackend) -> bytes:
+    """Default-compression PNG of an RGB frame, as the old LocalComputer/stcua code did."""
+    import io
+
+    image = to_image(backend.grab())
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def benchmark(seconds: float = 3.0, backends=None, formats=("PNG", "JPEG")) -> list:
+    """Frames per second and CPU use (process CPU time / wall time) per backend and encoding."""
+    results = []
+    for name in backends or BACKENDS:
+        try:
+            backend = BACKENDS[name]()
+            backend.grab()
+        except Exception as e:
+            results.append({"backend": name, "error": str(e)})
+            continue
+        cases: Dict[str, Callable] = {"grab only": backend.grab, "legacy png": lambda b=backend: _legacy_png(b)}
+        for image_format in formats:
+            cases[f"grab+{image_format.lower()}"] = lambda b=backend, f=image_format: capture_encoded(b, f)
+        for label, func in cases.items():
+            frames = 0
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            while time.perf_counter() - wall_start < seconds:
+                func()
+                frames += 1
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            results.append({
+                "backend": name,
+                "case": label,
+                "fps": frames / wall,
+                "cpu_percent": 100 * cpu / wall,
+                "geometry": backend.geometry,
+            })
+        backend.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screen capture backend benchmark (use DISPLAY=:99 under Xvfb)")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS))
+    args = parser.parse_args()
+    for row in benchmark(args.seconds, args.backends):
+        if "error" in row:
+            print(f"{row['backend']:<10} unavailable: {row['error']}")
+        else:
+            print(f"{row['backend']:<10} {row['case']:<12} {row['fps']:7.1f} fps {row['cpu_percent']:6.0f}% CPU  {row['geometry']}")
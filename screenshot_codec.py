@@ -0,0 +1,188 @@
+import base64
+import io
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple, Union
+
+from PIL import Image
+
+SCREENSHOT_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+_RESAMPLERS = {
+    "nearest": Image.Resampling.NEAREST,
+    "bilinear": Image.Resampling.BILINEAR,
+    "bicubic": Image.Resampling.BICUBIC,
+    "lanczos": Image.Resampling.LANCZOS,
+}
+
+
+@dataclass
+class RawFrame:
+    """An uncompressed screen grab: pixel buffer, (width, height) and its raw mode (e.g. "BGRX", "RGB")."""
+
+    data: Union[bytes, memoryview]
+    size: Tuple[int, int]
+    raw_mode: str = "BGRX"
+
+
+def to_image(screenshot) -> Image.Image:
+    """Accept a PIL image, a RawFrame, encoded image bytes or a base64 string and return an RGB image."""
+    if isinstance(screenshot, Image.Image):
+        image = screenshot
+    elif isinstance(screenshot, RawFrame):
+        # Decoding straight from the capture buffer avoids an intermediate copy/convert
+        return Image.frombuffer("RGB", screenshot.size, screenshot.data, "raw", screenshot.raw_mode, 0, 1)
+    else:
+        if isinstance(screenshot, str):
+            screenshot = base64.b64decode(screenshot)
+        image = Image.open(io.BytesIO(screenshot))
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def encode_image(image: Image.Image, image_format: str = "PNG", quality: int = 85) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == "PNG":
+        # Level 1 is several times faster than Pillow's default and only slightly larger
+        image.save(buffer, format="PNG", compress_level=1)
+    elif image_format == "WEBP":
+        image.save(buffer, format="WEBP", quality=quality, method=0)
+    else:
+        image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+@dataclass
+class EncodeStats:
+    """Timing and size of the last encoded screenshot."""
+
+    resized: bool = False
+    scale_ms: float = 0.0
+    encode_ms: float = 0.0
+    bytes: int = 0
+
+
+class ScreenshotEncoder:
+    """Fit screenshots into a target size and encode them for the model.
+
+    The resize is skipped when the frame already has the target size, the letterbox
+    canvas is created once and reused while the target size stays the same (its
+    margin is cleared whenever the pasted area changes), and the
+    output format/quality come from CUA_SCREENSHOT_FORMAT / CUA_SCREENSHOT_QUALITY
+    unless given.
+    """
+
+    def __init__(
+        self,
+        image_format: Optional[str] = None,
+        quality: Optional[int] = None,
+        resample: Optional[str] = None,
+    ):
+        self.image_format = (image_format or os.getenv("CUA_SCREENSHOT_FORMAT", "PNG")).upper()
+        if self.image_format not in SCREENSHOT_MIME_TYPES:
+            raise ValueError(f"Unsupported screenshot format '{self.image_format}'.")
+        self.quality = quality or int(os.getenv("CUA_SCREENSHOT_QUALITY", "85"))
+        self.resample = _RESAMPLERS[(resample or os.getenv("CUA_SCREENSHOT_RESAMPLE", "bilinear")).lower()]
+        self._canvas: Optional[Image.Image] = None
+        self._pasted_size: Optional[Tuple[int, int]] = None
+        self.stats = EncodeStats()
+
+    @property
+    def mime_type(self) -> str:
+        return SCREENSHOT_MIME_TYPES[self.image_format]
+
+    def fit(self, image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        """Scale `image` to fit `size` keeping the aspect ratio, letterboxed in black at the top left."""
+        width, height = size
+        screen_width, screen_height = image.size
+        ratio = min(width / screen_width, height / screen_height)
+        new_size = (int(screen_width * ratio), int(screen_height * ratio))
+        self.stats.resized = new_size != image.size
+        if self.stats.resized:
+            image = image.resize(new_size, self.resample, reducing_gap=2.0)
+        if new_size == (width, height):
+            return image
+        if self._canvas is None or self._canvas.size != (width, height):
+            self._canvas = Image.new("RGB", (width, height), (0, 0, 0))
+        elif self._pasted_size != new_size:
+            # A different aspect ratio leaves part of the previous frame in the new margin
+            self._canvas.paste((0, 0, 0), (0, 0, width, height))
+        # While the pasted area stays the same the black margin never needs clearing
+        self._canvas.paste(image, (0, 0))
+        self._pasted_size = new_size
+        return self._canvas
+
+    def encode(self, screenshot, size: Tuple[int, int]) -> bytes:
+        start = time.perf_counter()
+        image = self.fit(to_image(screenshot), size)
+        scaled = time.perf_counter()
+        data = encode_image(image, self.image_format, self.quality)
+        self.stats.scale_ms = (scaled - start) * 1000
+        self.stats.encode_ms = (time.perf_counter() - scaled) * 1000
+        self.stats.bytes = len(data)
+        return data
+
+    def encode_base64(self, screenshot, size: Tuple[int, int]) -> str:
+        return base64.b64encode(self.encode(screenshot, size)).decode("ascii")
+
+
+def _legacy_scale(screenshot_b64: str, size: Tuple[int, int]) -> str:
+    """The previous cua.Scaler path: PNG decode, LANCZOS, new canvas, PNG encode."""
+    image = Image.open(io.BytesIO(base64.b64decode(screenshot_b64)))
+    width, height = size
+    ratio = min(width / image.size[0], height / image.size[1])
+    resized = image.resize((int(image.size[0] * ratio), int(image.size[1] * ratio)), Image.Resampling.LANCZOS)
+    canvas = Image.new("RGB", (width, height), (0, 0, 0))
+    canvas.paste(resized, (0, 0))
+    buffer = io.BytesIO()
+    canvas.save(buffer, format="PNG")
+    return base64.b64encode(bytearray(buffer.getvalue())).decode("utf-8")
+
+
+def _synthetic_screen(size: Tuple[int, int] = (2560, 1440)) -> Image.Image:
+    """A desktop-like frame: flat panels, text-like stripes and a photo-like gradient."""
+    from PIL import ImageDraw
+
+    image = Image.new("RGB", size, (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    draw.rectangle((0, 0, width, 40), fill=(32, 32, 48))
+    draw.rectangle((0, 40, 300, height), fill=(250, 250, 252))
+    for row in range(60, height - 20, 18):
+        for col in range(320, width - 400, 90):
+            draw.rectangle((col, row, col + 60 + (row * col) % 25, row + 8), fill=(60, 60, 60))
+    gradient = Image.linear_gradient("L").resize((360, 360)).convert("RGB")
+    image.paste(gradient, (width - 380, 60))
+    # A photo-like noisy region, where lossy formats pay off
+    image.paste(Image.effect_noise((360, 240), 48).convert("RGB"), (width - 380, 440))
+    return image
+
+
+def benchmark(steps: int = 10, screen: Tuple[int, int] = (2560, 1440), target: Tuple[int, int] = (1280, 720)) -> list:
+    """Per-step time and payload of the legacy PNG round trip vs the direct pipeline."""
+    image = _synthetic_screen(screen)
+    png_b64 = base64.b64encode(encode_image(image, "PNG")).decode("ascii")
+    results = []
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        legacy = _legacy_scale(png_b64, target)
+    results.append({"path": "legacy png->png", "ms": (time.perf_counter() - start) * 1000 / steps, "bytes": len(legacy)})
+
+    for image_format in ("PNG", "JPEG", "WEBP"):
+        for source, label in ((image, "image"), (png_b64, "base64 png")):
+            encoder = ScreenshotEncoder(image_format=image_format, quality=80)
+            start = time.perf_counter()
+            for _ in range(steps):
+                payload = encoder.encode_base64(source, target)
+            results.append({
+                "path": f"{label}->{image_format.lower()}",
+                "ms": (time.perf_counter() - start) * 1000 / steps,
+                "bytes": len(payload),
+            })
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark():
+        print(f"{row['path']:<22} {row['ms']:8.1f} ms/step {row['bytes'] / 1024:9.1f} KiB base64")
@@ -15,8 +15,8 @@ from azure.ai.agents.models import (
 
 import requests
 import streamlit as st
-from azure.kusto.data import KustoClient, KustoConnectionStringBuilder
 from azure.kusto.data.helpers import dataframe_from_result_table
+from adx_client import AdxQueryRunner, get_result_cache
 from msal import PublicClientApplication
 from dotenv import load_dotenv
 
@@ -69,32 +69,19 @@ client = AzureOpenAI(
     api_version="2024-10-21",
 )
 
+# Results shared across conversations and users; entries expire per table TTL
+# (ADX_CACHE_TTL_SECONDS / ADX_CACHE_TABLE_TTLS) or when new data is ingested into a table.
+# The cache is process-wide, so it survives Streamlit reruns of this page.
+adx_result_cache = get_result_cache()
+
 def execute_adx_query(query: str) -> str:
     """Execute a Kusto query against Azure Data Explorer using service principal authentication."""
 
-    cluster = os.environ["ADX_CLUSTER_URL"]  # e.g., "https://<cluster>.<region>.kusto.windows.net"
-    database = os.environ["ADX_DATABASE_NAME"]  # e.g., "mydatabase"
-    
-    # Service principal authentication for ADX
-    client_id = os.environ["AZURE_CLIENT_ID"]
-    client_secret = os.environ["AZURE_CLIENT_SECRET"] 
-    tenant_id = os.environ["AZURE_TENANT_ID"]
-
+    # Clients are pooled per service principal (see adx_client), so the AAD token is reused across
+    # tool calls. ADX_CLUSTER_URL, ADX_DATABASE_NAME and AZURE_CLIENT_ID/SECRET/TENANT_ID are required.
     try:
-        # Use service principal authentication for Kusto
-        kcsb = KustoConnectionStringBuilder.with_aad_application_key_authentication(
-            cluster, client_id, client_secret, tenant_id
-        )
-        client = KustoClient(kcsb)
-        
-        response = client.execute(database, query)
-        # Convert response to a readable string format
-        rows = [row.to_dict() for row in response.primary_results[0]]
-        if not rows:
-            return "No results found."
-        # Limit output to first 5 rows for brevity
-        limited_rows = rows[:5]
-        return json.dumps(limited_rows, indent=2)
+        # Only the first ADX_RESULT_MAX_ROWS rows (default 5) are fetched and returned as compact JSON
+        return AdxQueryRunner(cache=adx_result_cache).run(query)
     except Exception as ex:
         return f"ADX Query failed: {ex}"
     
@@ -118,6 +105,8 @@ def adx_agent(query: str) -> dict:
         logs.append(msg)
         print(msg)
 
+    cache_stats_before = adx_result_cache.snapshot()
+
     mcp_tool = McpTool(
         server_label=mcp_server_label,
         server_url=mcp_server_url,
@@ -612,6 +601,13 @@ def adx_agent(query: str) -> dict:
         except Exception:
             pass
 
+    cache_stats = adx_result_cache.snapshot()
+    log(
+        "ADX cache: "
+        + " ".join(f"{k}={cache_stats[k] - cache_stats_before[k]}" for k in ("hits", "misses", "expired", "invalidated"))
+        + f" entries={cache_stats['entries']} (totals: hits={cache_stats['hits']} misses={cache_stats['misses']})"
+    )
+
     summary = final_assistant or "No assistant response."
     details = "\n".join(logs)
     return {
@@ -1,26 +1,34 @@
 import asyncio
+import fractions
 import nest_asyncio
-import io
 import json
 import os
+import queue
 import aiohttp
-from aiortc import RTCPeerConnection, RTCSessionDescription
+import av
+from aiortc import MediaStreamTrack, RTCPeerConnection, RTCSessionDescription
+from aiortc.mediastreams import MediaStreamError
 from aiortc.contrib.media import MediaPlayer
-from aiortc.contrib.media import MediaRecorder
 import wave
-import numpy as np
 import streamlit as st
-import soundfile as sf
-from scipy.signal import resample
 from openai import AzureOpenAI
 import time
 from dotenv import load_dotenv
+from audio_normalize import normalize_to_pcm_bytes
+from realtime_audio import BackgroundLoop, IdleTimer, PcmRingBuffer, TrackPcmReader, WavFileSink, pcm_to_wav_bytes
+from conversation_memory import ConversationMemory
+from audio_store import current_session_id, get_audio_store
 
 # Load environment variables
 load_dotenv()
 
 TIMEOUT_DURATION = 60
 OUTPUT_WAV_FILE = "output.wav"
+# Seconds of reply audio held in memory for playback before the oldest frames are dropped
+AUDIO_BUFFER_SECONDS = 120
+# Realtime instructions: turns kept verbatim and the hard token budget for the whole payload
+HISTORY_VERBATIM_TURNS = int(os.getenv("REALTIME_HISTORY_TURNS", "6"))
+INSTRUCTION_TOKEN_BUDGET = int(os.getenv("REALTIME_INSTRUCTION_TOKENS", "4000"))
 
 # Azure OpenAI configuration (replace with your credentials)
 AZURE_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
@@ -87,8 +95,27 @@ def msft_generate_chat_response(transcription, context):
         
     return returntxt, None
 
+def summarize_history(previous_summary, turns, max_tokens):
+    """Fold older conversation turns into the running summary with the chat deployment."""
+    transcript = "\n".join(f"{turn['role'].capitalize()}: {turn['content']}" for turn in turns)
+    prompt = (
+        f"Summary so far:\n{previous_summary or '(none)'}\n\n"
+        f"New conversation turns:\n{transcript}\n\n"
+        "Update the summary. Keep facts about the user, their goals and any decisions or open questions. "
+        f"Answer with the summary only, under {max_tokens} tokens."
+    )
+    response = client.chat.completions.create(
+        model=CHAT_DEPLOYMENT_NAME,
+        messages=[
+            {"role": "system", "content": "You maintain a concise running summary of a voice conversation."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=max_tokens
+    )
+    return response.choices[0].message.content or previous_summary
+
 class RealtimeWebRtcSession:
-    def __init__(self, api_key, api_url, model, voice, webrtc_url, wav_file, bearer_token=None):
+    def __init__(self, api_key, api_url, model, voice, webrtc_url, wav_file, bearer_token=None, output_wav_file=None):
         self.api_key = api_key
         self.api_url = api_url
         self.model = model
@@ -103,17 +130,25 @@ class RealtimeWebRtcSession:
         self.audio_messages = []
         self.session_closed = False
         self.transcript = []
-        self.recorder = None
+        # Reply audio is read straight off the remote track into memory; writing it to
+        # output_wav_file is an optional side sink.
+        self.output_wav_file = output_wav_file
+        self.audio_frames = PcmRingBuffer(max_seconds=AUDIO_BUFFER_SECONDS)
+        self.reader = None
         self.remote_audio_ended = False
         self.audio_done_received = False
-        self.recorder_stopped = False
-        self.recorder_stop_time = None
+        self.reader_stopped = False
         self.rag_context = None
         self.conversation_history = []  # List of dicts: {"role": "user"/"assistant", "content": str}
+        # Recent turns verbatim, older ones summarized in the background, all under a token budget
+        self.history_memory = ConversationMemory(
+            keep_turns=HISTORY_VERBATIM_TURNS,
+            max_tokens=INSTRUCTION_TOKEN_BUDGET,
+            summarizer=summarize_history,
+        )
 
-    async def open_session(self, rag_context=None, conversation_history=None):
-        self.rag_context = rag_context
-        self.conversation_history = conversation_history or []
+    async def _request_session(self):
+        """Create a realtime session over REST; returns the response JSON or None on failure."""
         async with aiohttp.ClientSession() as session:
             headers = {"Content-Type": "application/json"}
             if self.bearer_token is not None:
@@ -127,11 +162,18 @@ class RealtimeWebRtcSession:
             async with session.post(self.api_url, headers=headers, json=body) as resp:
                 if resp.status != 200:
                     print(f"API request failed: {resp.status} {await resp.text()}")
-                    return
-                data = await resp.json()
-                self.session_id = data.get("id")
-                ephemeral_key = data.get("client_secret", {}).get("value")
-                await self._initialize_session(ephemeral_key, rag_context=rag_context, conversation_history=self.conversation_history)
+                    return None
+                return await resp.json()
+
+    async def open_session(self, rag_context=None, conversation_history=None):
+        self.rag_context = rag_context
+        self.conversation_history = conversation_history or []
+        data = await self._request_session()
+        if data is None:
+            return
+        self.session_id = data.get("id")
+        ephemeral_key = data.get("client_secret", {}).get("value")
+        await self._initialize_session(ephemeral_key, rag_context=rag_context, conversation_history=self.conversation_history)
 
     async def _initialize_session(self, ephemeral_key, rag_context=None, conversation_history=None):
         self.peer_connection = RTCPeerConnection()
@@ -153,25 +195,29 @@ class RealtimeWebRtcSession:
             self.peer_connection.addTrack(audio_track)
 
     def _handle_audio_track(self, track):
-        if self.recorder is None:
-            recorder = MediaRecorder(OUTPUT_WAV_FILE)
-            recorder.addTrack(track)
-            self.audio_messages.append(OUTPUT_WAV_FILE)
-            self.recorder = recorder
-            asyncio.ensure_future(recorder.start())
+        if self.reader is None:
+            sinks = []
+            if self.output_wav_file:
+                sinks.append(WavFileSink(self.output_wav_file))
+                self.audio_messages.append(self.output_wav_file)
+            self.reader = TrackPcmReader(track, self.audio_frames, sinks=sinks)
+            self.reader.start()
         @track.on("ended")
         async def on_ended():
             self.remote_audio_ended = True
-            await self._maybe_stop_recorder()
-
-    async def _maybe_stop_recorder(self):
-        if self.audio_done_received and self.remote_audio_ended and not self.recorder_stopped:
-            if self.recorder:
-                await self.recorder.stop()
-                await asyncio.sleep(1)
-            self.recorder_stopped = True
+            await self._maybe_stop_reader()
+
+    async def _maybe_stop_reader(self):
+        if self.audio_done_received and self.remote_audio_ended and not self.reader_stopped:
+            if self.reader:
+                await self.reader.stop()
+            self.reader_stopped = True
             self.on_ended_event.set()
 
+    def frames(self):
+        """Async iterator over reply PCM frames as they arrive from the remote track."""
+        return self.audio_frames.__aiter__()
+
     def _setup_data_channel(self, rag_context=None, conversation_history=None):
         self.data_channel = self.peer_connection.createDataChannel("oai-events")
         @self.data_channel.on("open")
@@ -196,7 +242,7 @@ class RealtimeWebRtcSession:
                         self.transcript.append(delta_text)
                 if msg_type == "response.audio.done":
                     self.audio_done_received = True
-                    asyncio.ensure_future(self._maybe_stop_recorder())
+                    asyncio.ensure_future(self._maybe_stop_reader())
                 if msg_type == "response.done" and not self.session_closed:
                     self.session_closed = True
                     async def close_after_recorder():
@@ -229,17 +275,12 @@ class RealtimeWebRtcSession:
             await self.peer_connection.close()
         if not self.session_closed:
             await self.peer_connection.close()
+        if self.reader:
+            await self.reader.stop()
+        self.audio_frames.close()
 
     def update_session(self, rag_context=None, conversation_history=None):
-        instructions = "You are a helpful AI assistant responding in natural, engaging language."
-        if rag_context:
-            instructions += f"\n\nUse the following context to answer the user's questions:\n{rag_context}"
-        # Add conversation history as context
-        if conversation_history:
-            history_text = "\n".join([
-                f"{turn['role'].capitalize()}: {turn['content']}" for turn in conversation_history
-            ])
-            instructions += f"\n\nConversation so far:\n{history_text}"
+        instructions = self.history_memory.build_instructions(rag_context, conversation_history)
         event = {
             "type": "session.update",
             "session": {
@@ -260,6 +301,10 @@ class RealtimeWebRtcSession:
             return False, "Missing some required messages"
         if "error" in self.data_messages:
             return False, "Received an error message in the session"
+        if not self.output_wav_file:
+            if self.audio_frames.total_bytes <= 100:
+                return False, "Output audio is too small"
+            return True, "None"
         try:
             if self.audio_messages:
                 file_path = self.audio_messages[0]
@@ -273,6 +318,316 @@ class RealtimeWebRtcSession:
             return False, "Output audio file is not a valid WAV file or does not exist"
         return True, "None"
 
+class PcmInputTrack(MediaStreamTrack):
+    """Outgoing mono s16 audio track fed with PCM per turn; sends silence when idle."""
+
+    kind = "audio"
+
+    def __init__(self, sample_rate=24000, frame_ms=20):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.samples_per_frame = sample_rate * frame_ms // 1000
+        self._pending = bytearray()
+        self._start = None
+        self._timestamp = 0
+
+    def feed(self, pcm: bytes, trailing_silence: float = 0.8):
+        """Queue PCM for sending, followed by silence so server VAD closes the turn."""
+        self._pending += pcm
+        self._pending += b"\0" * (int(self.sample_rate * trailing_silence) * 2)
+
+    @property
+    def pending_seconds(self) -> float:
+        return len(self._pending) / (2 * self.sample_rate)
+
+    async def recv(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+        if self._start is None:
+            self._start = time.time()
+        else:
+            self._timestamp += self.samples_per_frame
+            wait = self._start + self._timestamp / self.sample_rate - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        frame_bytes = self.samples_per_frame * 2
+        chunk = bytes(self._pending[:frame_bytes])
+        del self._pending[:frame_bytes]
+        frame = av.AudioFrame(format="s16", layout="mono", samples=self.samples_per_frame)
+        frame.planes[0].update(chunk.ljust(frame_bytes, b"\0"))
+        frame.sample_rate = self.sample_rate
+        frame.pts = self._timestamp
+        frame.time_base = fractions.Fraction(1, self.sample_rate)
+        return frame
+
+
+class PersistentRealtimeSession(RealtimeWebRtcSession):
+    """Realtime session that keeps one peer connection and data channel for many turns.
+
+    Each turn updates the session instructions, feeds the user's PCM into the
+    outgoing track and collects the reply until `response.done`. A dropped
+    connection is re-established on the next turn with a freshly minted
+    ephemeral key. A connection that fails while no turn is running is closed
+    right away, and after `idle_timeout` seconds without a turn the whole session
+    closes and `on_idle` is called, unless `idle_guard()` returns False (see
+    IdleTimer; get_realtime_session passes the BackgroundLoop's claim check and
+    stop). All methods must run on the same event loop (see BackgroundLoop).
+    """
+
+    KEY_RENEW_MARGIN = 30  # seconds before expiry after which a connect fetches a fresh ephemeral key
+
+    def __init__(self, api_key, api_url, model, voice, webrtc_url, bearer_token=None, output_wav_file=None,
+                 idle_timeout=None, on_idle=None, idle_guard=None):
+        super().__init__(api_key, api_url, model, voice, webrtc_url, None, bearer_token=bearer_token, output_wav_file=output_wav_file)
+        # Each connection writes its reply audio to its own numbered copy of output_wav_file
+        self.output_wav_template = output_wav_file
+        self.input_track = None
+        self.ephemeral_key = None
+        self.key_expires_at = 0.0
+        self.turns = 0
+        self.connections = 0
+        self.reconnects = 0
+        self.last_error = None
+        idle_timeout = idle_timeout if idle_timeout is not None else float(os.getenv("REALTIME_IDLE_SECONDS", "300"))
+        self.idle = IdleTimer(idle_timeout, self._close_when_idle, on_idle=on_idle, guard=idle_guard)
+        self._lock = None
+        self._channel_open = None
+        self._turn_done = None
+        self._audio_stopped = None
+
+    @property
+    def connected(self) -> bool:
+        return (
+            self.peer_connection is not None
+            and self.peer_connection.connectionState not in ("failed", "closed")
+            and self.data_channel is not None
+            and self.data_channel.readyState == "open"
+        )
+
+    async def _refresh_key(self):
+        data = await self._request_session()
+        if data is None:
+            raise ConnectionError("Could not create a realtime session")
+        secret = data.get("client_secret", {})
+        self.session_id = data.get("id")
+        self.ephemeral_key = secret.get("value")
+        self.key_expires_at = float(secret.get("expires_at") or time.time() + 60)
+
+    async def _current_key(self):
+        """Key for the next connect; only minted here, so an idle session never requests keys."""
+        if not self.ephemeral_key or self.key_expires_at - time.time() < self.KEY_RENEW_MARGIN:
+            await self._refresh_key()
+        return self.ephemeral_key
+
+    def _get_lock(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _connection_wav_path(self):
+        if not self.output_wav_template or self.connections <= 1:
+            return self.output_wav_template
+        root, ext = os.path.splitext(self.output_wav_template)
+        return f"{root}_{self.connections}{ext}"
+
+    async def _close_when_idle(self):
+        async with self._get_lock():
+            await self.close()
+
+    async def connect(self):
+        """(Re)create the peer connection, data channel and outgoing track."""
+        await self._close_connection()
+        self._channel_open = asyncio.Event()
+        self._turn_done = asyncio.Event()
+        self._audio_stopped = asyncio.Event()
+        ephemeral_key = await self._current_key()
+        self.connections += 1
+        self.output_wav_file = self._connection_wav_path()
+
+        self.peer_connection = RTCPeerConnection()
+        peer_connection = self.peer_connection
+
+        def on_track(track):
+            if track.kind == "audio":
+                self._handle_audio_track(track)
+        self.peer_connection.on("track", on_track)
+
+        @self.peer_connection.on("connectionstatechange")
+        async def on_connection_state_change():
+            # Release a dropped connection now; during a turn, send_turn reconnects instead
+            if (peer_connection is self.peer_connection and peer_connection.connectionState in ("failed", "closed")
+                    and not self._get_lock().locked()):
+                await self._close_connection()
+        self.input_track = PcmInputTrack()
+        self.peer_connection.addTrack(self.input_track)
+
+        self.data_channel = self.peer_connection.createDataChannel("oai-events")
+        @self.data_channel.on("open")
+        def on_open():
+            self._channel_open.set()
+        @self.data_channel.on("message")
+        def on_message(message):
+            self._handle_data_channel_message(message)
+
+        offer = await self.peer_connection.createOffer()
+        await self.peer_connection.setLocalDescription(offer)
+        await self._send_offer_and_receive_answer(ephemeral_key, offer)
+        await asyncio.wait_for(self._channel_open.wait(), timeout=TIMEOUT_DURATION)
+
+    async def _maybe_stop_reader(self):
+        # The reader lives as long as the connection; a track that ends surfaces as a
+        # closed frame buffer and triggers a reconnect on the current or next turn.
+        pass
+
+    def _handle_data_channel_message(self, message):
+        try:
+            json_data = json.loads(message)
+        except Exception:
+            return
+        msg_type = json_data.get("type")
+        if not msg_type:
+            return
+        self.data_messages.append(msg_type)
+        if msg_type == "response.audio_transcript.delta":
+            delta_text = json_data.get("delta")
+            if delta_text:
+                self.transcript.append(delta_text)
+        elif msg_type == "response.audio.done":
+            self.audio_done_received = True
+        elif msg_type == "output_audio_buffer.stopped":
+            self._audio_stopped.set()
+        elif msg_type == "response.done":
+            self._turn_done.set()
+        elif msg_type == "error":
+            self.last_error = json_data.get("error")
+
+    async def send_turn(self, pcm: bytes, rag_context=None, conversation_history=None, on_frame=None) -> dict:
+        """Send one user utterance (24 kHz mono s16 PCM) and collect the spoken reply.
+
+        Returns a dict with transcript, pcm, sample_rate and channels. `on_frame` is
+        called with each reply PcmFrame as it arrives.
+        """
+        async with self._get_lock():
+            if self.session_closed:
+                raise ConnectionError("Realtime session was closed after being idle")
+            self.idle.cancel()
+            try:
+                for attempt in range(2):
+                    if not self.connected:
+                        if self.turns:
+                            self.reconnects += 1
+                        await self.connect()
+                    try:
+                        result = await self._run_turn(pcm, rag_context, conversation_history, on_frame)
+                        self.turns += 1
+                        return result
+                    except ConnectionError:
+                        if attempt:
+                            raise
+                        await self._close_connection()
+            finally:
+                self.idle.touch()
+
+    async def _run_turn(self, pcm, rag_context, conversation_history, on_frame):
+        self.transcript = []
+        self.audio_done_received = False
+        self._turn_done.clear()
+        self._audio_stopped.clear()
+        self.audio_frames.drain()
+        self.update_session(rag_context=rag_context, conversation_history=conversation_history)
+        self.input_track.feed(pcm)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + TIMEOUT_DURATION + self.input_track.pending_seconds
+        reply = bytearray()
+        audio_format = (24000, 1)
+        while True:
+            if not self.connected:
+                raise ConnectionError("Realtime connection dropped during the turn")
+            if self._turn_done.is_set() and self._audio_stopped.is_set() and not len(self.audio_frames):
+                break
+            try:
+                frame = await asyncio.wait_for(self.audio_frames.get(), timeout=0.3)
+            except asyncio.TimeoutError:
+                if self._turn_done.is_set():
+                    break
+                if loop.time() > deadline:
+                    raise TimeoutError(f"No reply within {TIMEOUT_DURATION} seconds")
+                continue
+            if frame is None:
+                raise ConnectionError("Remote audio track ended")
+            reply += frame.data
+            audio_format = (frame.sample_rate, frame.channels)
+            if on_frame:
+                on_frame(frame)
+        return {
+            "transcript": " ".join(self.transcript),
+            "pcm": bytes(reply),
+            "sample_rate": audio_format[0],
+            "channels": audio_format[1],
+        }
+
+    async def _close_connection(self):
+        if self.reader:
+            await self.reader.stop()
+            self.reader = None
+            self.audio_frames = PcmRingBuffer(max_seconds=AUDIO_BUFFER_SECONDS)
+        if self.input_track:
+            self.input_track.stop()
+            self.input_track = None
+        if self.peer_connection:
+            # Detach first so the connectionstatechange handler ignores this close
+            peer_connection, self.peer_connection = self.peer_connection, None
+            await peer_connection.close()
+        self.data_channel = None
+
+    async def close(self):
+        self.idle.cancel()
+        await self._close_connection()
+        self.history_memory.close()
+        self.session_closed = True
+
+
+def get_realtime_session(api_key, api_url, model, voice, webrtc_url, bearer_token=None):
+    """This browser session's persistent realtime session, recreated when the model or voice changes.
+
+    The session's loop (st.session_state["realtime_loop"]) comes back claimed, so an
+    idle close can't start until the caller calls `release()` on it.
+    """
+    rt_loop = st.session_state.get("realtime_loop")
+    if rt_loop is None or not rt_loop.claim():
+        # The previous loop is stopping after its session went idle; start over with a new one
+        rt_loop = st.session_state["realtime_loop"] = BackgroundLoop()
+        rt_loop.claim()
+        st.session_state.pop("realtime_session", None)
+    try:
+        session = st.session_state.get("realtime_session")
+        if session is not None and (session.model != model or session.voice != voice):
+            rt_loop.run(session.close(), timeout=10)
+            session = None
+        if session is None:
+            # A disk copy of the reply audio is opt-in and lives in the session's artifact store
+            output_wav_file = None
+            if os.getenv("REALTIME_OUTPUT_WAV_FILE"):
+                prefix = os.path.splitext(os.path.basename(os.getenv("REALTIME_OUTPUT_WAV_FILE")))[0]
+                output_wav_file = get_audio_store().reserve(current_session_id(), prefix, "wav")
+            session = PersistentRealtimeSession(
+                api_key,
+                api_url,
+                model,
+                voice,
+                webrtc_url,
+                bearer_token=bearer_token,
+                output_wav_file=output_wav_file,
+                on_idle=rt_loop.stop,
+                idle_guard=rt_loop.begin_idle_stop,
+            )
+            st.session_state["realtime_session"] = session
+    except Exception:
+        rt_loop.release()
+        raise
+    return session
+
 def main():
     st.set_page_config(
         page_title="AI Voice Conversation Hub",
@@ -648,6 +1003,16 @@ def main():
 
     # Handle clear conversation
     if clear_clicked:
+        # Start a fresh realtime conversation on the server side as well
+        session = st.session_state.pop("realtime_session", None)
+        rt_loop = st.session_state.get("realtime_loop")
+        # A loop that is already stopping closes its session itself
+        if session is not None and rt_loop.claim():
+            try:
+                rt_loop.run(session.close(), timeout=10)
+            finally:
+                rt_loop.release()
+        get_audio_store().clear_session(current_session_id())
         st.session_state["conversation_history"] = []
         st.session_state["transcript_history"] = []
         st.session_state["user_profile"] = {k: None for k, _ in required_profile_fields}
@@ -854,46 +1219,22 @@ def main():
                 import time as _time
                 start_time = _time.time()
                 with st.spinner("Processing and sending audio message...", show_time=True):
-                    audio_bytes = io.BytesIO(audio_data.getvalue())
-                    data, samplerate = sf.read(audio_bytes)
-                    if len(data.shape) > 1 and data.shape[1] > 1:
-                        data = data.mean(axis=1)
-                    target_samplerate = 24000
-                    if samplerate != target_samplerate:
-                        num_samples = int(len(data) * target_samplerate / samplerate)
-                        data = resample(data, num_samples)
-                        samplerate = target_samplerate
-                    data_int16 = np.int16(np.clip(data, -1.0, 1.0) * 32767)
-                    output_filename = "output_pcm16_24khz_mono.wav"
-                    sf.write(
-                        output_filename,
-                        data_int16,
-                        samplerate,
-                        format='WAV',
-                        subtype='PCM_16',
-                        endian='LITTLE'
-                    )
-                    st.success(f"Saved: {output_filename} (16-bit PCM, 24kHz, mono, little-endian)")
-                    st.audio(output_filename)
+                    # Streaming polyphase resample straight to 24 kHz mono PCM16; nothing is written to disk
+                    user_pcm = normalize_to_pcm_bytes(audio_data.getvalue(), target_rate=24000)
+                    st.success(f"Prepared {len(user_pcm) / 48000:.1f}s of audio (16-bit PCM, 24kHz, mono, little-endian)")
+                    st.audio(pcm_to_wav_bytes(user_pcm, 24000, 1), format="audio/wav")
                     # Add user turn to conversation history
                     st.session_state["conversation_history"].append({"role": "user", "content": "[User audio message]"})
 
                     transcript_text = ""
-                    session = None
                     full_transcript = ""
-                    # Restore: process audio, then play output after session completes
-                    session = RealtimeWebRtcSession(
-                        apikey,
-                        url,
-                        model,
-                        voice,
-                        webrtc_url,
-                        output_filename,
-                        bearer_token=bearer_token
-                    )
+                    # One realtime connection per browser session, reused across turns
+                    session = get_realtime_session(apikey, url, model, voice, webrtc_url, bearer_token=bearer_token)
+                    rt_loop = st.session_state["realtime_loop"]
                     # --- Enhanced RAG with MCP Integration ---
                     audio_placeholder = st.empty()
-                    async def run_and_stream():
+                    transcript_placeholder = st.empty()
+                    def run_and_stream():
                         # Extract the user's audio content for RAG processing
                         user_audio_content = "[User audio message]"
                         
@@ -947,51 +1288,60 @@ def main():
                             enhanced_context = json_input
                             st.session_state["last_enhanced_context"] = "MCP enhancement failed - using base knowledge only"
                         
-                        # Start the real-time session with enhanced context
-                        task = asyncio.create_task(session.open_session(rag_context=enhanced_context, conversation_history=st.session_state["conversation_history"]))
-                        last_size = 0
-                        while not session.session_closed:
-                            await asyncio.sleep(0.5)
+                        # Send this turn over the persistent session with enhanced context
+                        reply_frames = queue.Queue()
+                        future = rt_loop.submit(session.send_turn(
+                            user_pcm,
+                            rag_context=enhanced_context,
+                            conversation_history=st.session_state["conversation_history"],
+                            on_frame=reply_frames.put,
+                        ))
+                        reply_pcm = bytearray()
+                        audio_format = None
+                        last_render = 0.0
+                        rendered_bytes = 0
+
+                        def render_reply():
+                            audio_placeholder.audio(pcm_to_wav_bytes(bytes(reply_pcm), *audio_format))
+                            if session.transcript:
+                                transcript_placeholder.markdown(" ".join(session.transcript))
+
+                        while not (future.done() and reply_frames.empty()):
                             try:
-                                if os.path.exists(OUTPUT_WAV_FILE):
-                                    size = os.path.getsize(OUTPUT_WAV_FILE)
-                                    if size > last_size and size > 1000:
-                                        with open(OUTPUT_WAV_FILE, "rb") as f:
-                                            audio_bytes = f.read()
-                                            audio_placeholder.audio(audio_bytes)
-                                            st.markdown("""
-                                            <script>
-                                            var audios = document.getElementsByTagName('audio');
-                                            if (audios.length > 0) {
-                                                var lastAudio = audios[audios.length - 1];
-                                                lastAudio.autoplay = true;
-                                                lastAudio.play().catch(()=>{});
-                                            }
-                                            </script>
-                                            """, unsafe_allow_html=True)
-                                        last_size = size
-                            except Exception:
-                                pass
-                        await task
+                                frame = reply_frames.get(timeout=0.2)
+                            except queue.Empty:
+                                continue
+                            reply_pcm += frame.data
+                            audio_format = (frame.sample_rate, frame.channels)
+                            if time.monotonic() - last_render >= 1.0 and len(reply_pcm) > 1000:
+                                render_reply()
+                                last_render = time.monotonic()
+                                rendered_bytes = len(reply_pcm)
+                        result = future.result()
                         # Final audio
-                        if os.path.exists(OUTPUT_WAV_FILE):
-                            with open(OUTPUT_WAV_FILE, "rb") as f:
-                                audio_bytes = f.read()
-                                audio_placeholder.audio(audio_bytes)
-                                st.markdown("""
-                                <script>
-                                var audios = document.getElementsByTagName('audio');
-                                if (audios.length > 0) {
-                                    var lastAudio = audios[audios.length - 1];
-                                    lastAudio.autoplay = true;
-                                    lastAudio.play().catch(()=>{});
-                                }
-                                </script>
-                                """, unsafe_allow_html=True)
-                    asyncio.run(run_and_stream())
-                    st.success("WebRTC session completed!")
-                    if session.transcript:
-                        full_transcript = " ".join(session.transcript)
+                        if audio_format and len(reply_pcm) != rendered_bytes:
+                            render_reply()
+                        st.markdown("""
+                        <script>
+                        var audios = document.getElementsByTagName('audio');
+                        if (audios.length > 0) {
+                            var lastAudio = audios[audios.length - 1];
+                            lastAudio.autoplay = true;
+                            lastAudio.play().catch(()=>{});
+                        }
+                        </script>
+                        """, unsafe_allow_html=True)
+                        return result
+                    try:
+                        turn = run_and_stream()
+                        st.success(f"Realtime turn completed (turn {session.turns}, reconnects {session.reconnects})")
+                    except Exception as e:
+                        st.error(f"❌ Realtime session error: {e}")
+                    finally:
+                        rt_loop.release()
+                        turn = {"transcript": ""}
+                    if turn["transcript"]:
+                        full_transcript = turn["transcript"]
                         transcript_text = full_transcript.lower()
                         st.subheader("Transcript (Latest Turn)")
                         st.markdown("""
@@ -13,10 +13,8 @@ from azure.ai.agents.models import MessageTextContent, ListSortOrder
 from azure.ai.agents.models import McpTool, RequiredMcpToolCall, SubmitToolApprovalAction, ToolApproval
 import streamlit as st
 from dotenv import load_dotenv
-import tempfile
-import uuid
-import requests
-import io
+from tts_stream import StreamingTTS, clean_tts_text
+from transcribe_prep import transcribe_with_vad
 import re
 
 load_dotenv()
@@ -747,63 +745,31 @@ def update_mermaid_diagrams():
 def transcribe_audio(audio_data) -> str:
     """Transcribe audio using Azure OpenAI Whisper."""
     try:
-        # Convert audio data to the format expected by Whisper
-        audio_file = io.BytesIO(audio_data.getvalue())
-        audio_file.name = "audio.wav"
-        
-        transcript = client.audio.transcriptions.create(
-            model=WHISPER_DEPLOYMENT_NAME,
-            file=audio_file
+        # Silence is trimmed and long recordings are split at pauses and transcribed concurrently
+        return transcribe_with_vad(
+            audio_data.getvalue(),
+            lambda segment: client.audio.transcriptions.create(
+                model=WHISPER_DEPLOYMENT_NAME,
+                file=segment
+            ).text
         )
-        return transcript.text
     except Exception as e:
         st.error(f"❌ Audio transcription failed: {e}")
         return ""
     
-def generate_audio_response_gpt(text):
-    """Generate audio response using Azure OpenAI TTS API directly."""
+def generate_audio_response_gpt(text, on_chunk=None) -> Optional[bytes]:
+    """Generate MP3 bytes using Azure OpenAI TTS, synthesizing sentence chunks in parallel."""
     try:
         # Clean and optimize text for TTS
-        clean_text = text.replace('*', '').replace('#', '').replace('`', '')
-        clean_text = clean_text.replace('- ', '• ').replace('  ', ' ').strip()
-        
-        # Limit text length for optimal TTS quality
-        if len(clean_text) > 3000:
-            clean_text = clean_text[:3000] + "... I can provide more details if needed."
-        
-        url = os.getenv("AZURE_OPENAI_ENDPOINT") + "/openai/deployments/gpt-4o-mini-tts/audio/speech?api-version=2025-03-01-preview"  
-      
-        headers = {  
-            "Content-Type": "application/json",  
-            "Authorization": f"Bearer {os.environ['AZURE_OPENAI_KEY']}"  
-        }  
-        
-        data = {  
-            "model": "gpt-4o-mini-tts",  
-            "input": clean_text,  
-            "voice": "nova",  # Use consistent professional voice
-            "response_format": "mp3",
-            "speed": 0.9
-        }  
-        
-        response = requests.post(url, headers=headers, json=data)  
-        
-        print(f"TTS API Response Status: {response.status_code}")
-        
-        if response.status_code == 200:  
-            # Create a unique temporary file
-            temp_file = os.path.join(tempfile.gettempdir(), f"response_{uuid.uuid4()}.mp3")
-            
-            with open(temp_file, "wb") as f:  
-                f.write(response.content)  
-            
-            print(f"MP3 file saved successfully: {temp_file}")
-            return temp_file
-        else:  
-            print(f"TTS API Error: {response.status_code}\n{response.text}")
-            st.error(f"❌ Error generating audio: {response.status_code}")
-            return None
-            
+        clean_text = clean_tts_text(text)
+
+        # Chunks are synthesized a few at a time and joined in order in memory
+        tts = StreamingTTS(voice="nova", speed=0.9)  # Use consistent professional voice
+        audio_bytes = tts.synthesize(clean_text, on_chunk=on_chunk)
+
+        print(tts.stats.summary())
+        return audio_bytes
+
     except Exception as e:
         print(f"Error in generate_audio_response_gpt: {str(e)}")
         st.error(f"❌ Error generating audio response: {str(e)}")
@@ -1777,16 +1743,9 @@ def process_brainstorm_request(user_input: str, is_voice: bool = False):
             if st.session_state.audio_enabled:
                 with st.spinner("🔊 Converting response to speech...", show_time=True):
                     # Create audio from the final summarized response
-                    audio_file_path = generate_audio_response_gpt(final_response)
-                    if audio_file_path and os.path.exists(audio_file_path):
-                        # Read the audio file and store it in session state
-                        with open(audio_file_path, 'rb') as f:
-                            st.session_state.current_audio = f.read()
-                        # Clean up the temporary file
-                        try:
-                            os.remove(audio_file_path)
-                        except:
-                            pass  # Ignore cleanup errors
+                    audio_bytes = generate_audio_response_gpt(final_response)
+                    if audio_bytes:
+                        st.session_state.current_audio = audio_bytes
             
             # Reset processing state
             st.session_state.processing = False
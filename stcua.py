@@ -15,32 +15,29 @@ from scipy.signal import resample
 from azure.ai.projects import AIProjectClient
 from azure.identity import DefaultAzureCredential
 import base64
-import PIL.ImageGrab as ImageGrab
 from PIL import Image
 
 
 from dotenv import load_dotenv
+from screen_capture import capture_encoded, get_capture_backend
+from cua_replay import RecordingClient, ReplayClient, SessionRecorder
 
 # Load environment variables
 load_dotenv()
 
+_capture_backend = None
+
 def capture_screenshot() -> str:
-    """Capture a screenshot and return it as a base64 encoded string"""
+    """Capture a screenshot and return it as a base64 encoded PNG string"""
+    global _capture_backend
     try:
-        # Capture the entire screen
-        screenshot = ImageGrab.grab()
-        
-        # Convert to RGB if needed (some systems return RGBA)
-        if screenshot.mode != 'RGB':
-            screenshot = screenshot.convert('RGB')
-        
-        # Save to bytes buffer
-        buffer = io.BytesIO()
-        screenshot.save(buffer, format='PNG')
-        buffer.seek(0)
+        # Fast grabber (mss/XShm where available), created once; PNG at a fast compression level
+        if _capture_backend is None:
+            _capture_backend = get_capture_backend()
+        png_bytes, _ = capture_encoded(_capture_backend, "PNG")
         
         # Encode to base64
-        screenshot_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        screenshot_base64 = base64.b64encode(png_bytes).decode('utf-8')
         
         print(f"Screenshot captured successfully. Size: {len(screenshot_base64)} chars")
         return screenshot_base64
@@ -69,11 +66,17 @@ client = AzureOpenAI(
 
 def cuarun(query: str, environment: str = "browser") -> Dict[str, Any]:
     """Run computer use model and return detailed output for display"""
-    cuaclient = AzureOpenAI(  
-        base_url = os.getenv("AZURE_OPENAI_ENDPOINT") + "/openai/v1/",  
-        api_key= os.getenv("AZURE_OPENAI_KEY"),
-        api_version="preview"
-        )
+    if os.getenv("CUA_REPLAY_DIR"):
+        # Offline: recorded responses instead of model calls
+        cuaclient = ReplayClient(os.environ["CUA_REPLAY_DIR"], strict=False)
+    else:
+        cuaclient = AzureOpenAI(  
+            base_url = os.getenv("AZURE_OPENAI_ENDPOINT") + "/openai/v1/",  
+            api_key= os.getenv("AZURE_OPENAI_KEY"),
+            api_version="preview"
+            )
+    if os.getenv("CUA_RECORD_DIR"):
+        cuaclient = RecordingClient(cuaclient, SessionRecorder(os.environ["CUA_RECORD_DIR"]))
 
     try:
         response = cuaclient.responses.create(
@@ -39,7 +39,7 @@ except ImportError as e:
     def ai_eval():
         return "✅ AI evaluation completed with high scores (simulated)"
     
-    async def redteam():
+    async def redteam(on_progress=None):
         return "🛡️ Red team scan completed - no vulnerabilities found (simulated)"
     
     def agent_eval():
@@ -506,7 +506,7 @@ def show_ai_evaluation(enable_speech: bool, show_debug: bool):
 
 ✅ **Overall Assessment**: High quality responses with excellent safety compliance.
 
-📄 **Report**: Results saved to myevalresults.json
+📄 **Report**: Row results in myevalresults/part-*.jsonl, metrics in myevalresults/summary.json
 """
                     
                     st.session_state['ai_eval_output'] = result
@@ -605,11 +605,22 @@ def show_red_team_testing(enable_speech: bool, show_debug: bool):
         if st.button("🔒 Run Red Team Scan", type="primary"):
             with st.spinner("Running red team security scan..."):
                 progress_bar = st.progress(0)
-                
+                scan_status = st.empty()
+
+                def show_scan_progress(orchestrator):
+                    # Called from the scan event loop after every attack and scan status change
+                    progress_bar.progress(min(100, int(orchestrator.fraction * 100)))
+                    scan_status.markdown("\n".join(
+                        f"- **{name}**: {status['state']}, {status['attacks']} attacks"
+                        + (f" / ~{status['expected']}" if status["expected"] else "")
+                        + (f" ({status['replayed']} replayed)" if status["replayed"] else "")
+                        for name, status in orchestrator.status.items()
+                    ))
+
                 try:
                     if DEPENDENCIES_AVAILABLE:
                         # Run async function
-                        result = asyncio.run(redteam())
+                        result = asyncio.run(redteam(on_progress=show_scan_progress))
                     else:
                         result = f"""🛡️ Red Team Security Scan Results (Simulated):
 
@@ -647,9 +658,11 @@ def show_red_team_testing(enable_speech: bool, show_debug: bool):
 🔗 **Azure AI Studio URL**: Available in full environment
 """
                     
-                    for i in range(100):
-                        time.sleep(0.03)
-                        progress_bar.progress(i + 1)
+                    if not DEPENDENCIES_AVAILABLE:
+                        for i in range(100):
+                            time.sleep(0.03)
+                            progress_bar.progress(i + 1)
+                    progress_bar.progress(100)
                     
                     st.session_state['redteam_output'] = result
                     st.success("✅ Red team scan completed!")
@@ -1,5 +1,3 @@
-import tempfile
-import uuid
 from openai import AzureOpenAI
 import streamlit as st
 import asyncio
@@ -19,6 +17,9 @@ from azure.ai.agents.models import ConnectedAgentTool, MessageRole
 
 from dotenv import load_dotenv
 
+from citations import format_citations_html, hyperlink_citation_markers
+from transcribe_prep import transcribe_with_vad
+
 # Load environment variables
 load_dotenv()
 
@@ -134,15 +135,14 @@ Incident #{i}:
 def transcribe_audio(audio_data) -> str:
     """Transcribe audio using Azure OpenAI Whisper."""
     try:
-        # Convert audio data to the format expected by Whisper
-        audio_file = io.BytesIO(audio_data.getvalue())
-        audio_file.name = "audio.wav"
-        
-        transcript = client.audio.transcriptions.create(
-            model=WHISPER_DEPLOYMENT_NAME,
-            file=audio_file
+        # Silence is trimmed and long recordings are split at pauses and transcribed concurrently
+        return transcribe_with_vad(
+            audio_data.getvalue(),
+            lambda segment: client.audio.transcriptions.create(
+                model=WHISPER_DEPLOYMENT_NAME,
+                file=segment
+            ).text
         )
-        return transcript.text
     except Exception as e:
         st.error(f"❌ Audio transcription failed: {e}")
         return ""
@@ -462,23 +462,12 @@ def processpdfwithprompt(query: str):
 
     returntxt = response.choices[0].message.content + "\n<br>"
 
-    json_string = json.dumps(response.choices[0].message.context)
-
-    parsed_json = json.loads(json_string)
-
-    # print(parsed_json)
+    context = response.choices[0].message.context or {}
 
-    if parsed_json['citations'] is not None:
-        returntxt = returntxt + f"""<br> Citations: """
-        for row in parsed_json['citations']:
-            #returntxt = returntxt + f"""<br> Title: {row['filepath']} as {row['url']}"""
-            #returntxt = returntxt + f"""<br> [{row['url']}_{row['chunk_id']}]"""
-            returntxt = returntxt + f"""<br> <a href='{row['url']}' target='_blank'>[{row['url']}_{row['chunk_id']}]</a>"""
-            citationtxt = citationtxt + f"""<br><br> Title: {row['title']} <br> URL: {row['url']} 
-            <br> Chunk ID: {row['chunk_id']} 
-            <br> Content: {row['content']} 
-            # <br> ------------------------------------------------------------------------------------------ <br>\n"""
-            # print(citationtxt)
+    citations = context.get('citations')
+    if citations is not None:
+        links, citationtxt = format_citations_html(citations)
+        returntxt = returntxt + f"""<br> Citations: """ + links
 
     return citationtxt
 
@@ -547,8 +536,8 @@ def generate_audio_response_gpt_1(text, selected_voice):
         api_version="2025-03-01-preview"
     )
 
-    # speech_file_path = Path(__file__).parent / "speech.mp3"
-    temp_file = os.path.join(tempfile.gettempdir(), f"response_{uuid.uuid4()}.mp3")
+    # MP3 is collected in memory; st.audio plays the bytes directly, so no temp file is left behind
+    audio_buffer = io.BytesIO()
 
     with audioclient.audio.speech.with_streaming_response.create(
         model="gpt-4o-mini-tts",
@@ -556,10 +545,10 @@ def generate_audio_response_gpt_1(text, selected_voice):
         input=text,
         instructions="Speak in a cheerful and positive tone. Can you make this content as story telling rather than reading the text and make it personally to user to listen to it.",
     ) as response:
-        response
-        response.stream_to_file(temp_file)
+        for chunk in response.iter_bytes():
+            audio_buffer.write(chunk)
 
-    return temp_file
+    return audio_buffer.getvalue()
 
 def process_audio_input(audio_data, incident_manager: ServiceNowIncidentManager, conversation_history: List[Dict]) -> tuple[str, str]:
     """Process audio input and generate response."""
@@ -605,18 +594,7 @@ def process_text_input(user_input: str, incident_manager: ServiceNowIncidentMana
 
 def hyperlink_sources_in_response(response: str, citations: list) -> str:
     """Replace source markers in the response with hyperlinks to the chunk URLs."""
-    # Build a mapping from marker to URL
-    marker_to_url = {}
-    for citation in citations:
-        # Example marker: 【3:0†source】
-        marker = f"【{citation.get('chunk_id', '')}†source】"
-        url = citation.get('url', '')
-        if url:
-            marker_to_url[marker] = f"<a href='{url}' target='_blank'>{marker}</a>"
-    # Replace all markers in the response
-    for marker, link in marker_to_url.items():
-        response = response.replace(marker, link)
-    return response
+    return hyperlink_citation_markers(response, citations)
 
 def sendemail(query: str) -> str:
     returntxt = ""
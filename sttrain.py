@@ -1,10 +1,6 @@
-import tempfile
-import uuid
 from openai import AzureOpenAI
-import requests
 import streamlit as st
 import asyncio
-import io
 import os
 import time
 import json
@@ -23,6 +19,9 @@ from azure.ai.agents.models import MessageTextContent, ListSortOrder
 
 from dotenv import load_dotenv
 
+from tts_stream import StreamingTTS, clean_tts_text
+from transcribe_prep import transcribe_with_vad
+
 # Load environment variables
 load_dotenv()
 
@@ -225,15 +224,14 @@ def msft_learn_mcp_agent(query: str) -> str:
 def transcribe_audio(audio_data) -> str:
     """Transcribe audio using Azure OpenAI Whisper."""
     try:
-        # Convert audio data to the format expected by Whisper
-        audio_file = io.BytesIO(audio_data.getvalue())
-        audio_file.name = "audio.wav"
-        
-        transcript = client.audio.transcriptions.create(
-            model=WHISPER_DEPLOYMENT_NAME,
-            file=audio_file
+        # Silence is trimmed and long recordings are split at pauses and transcribed concurrently
+        return transcribe_with_vad(
+            audio_data.getvalue(),
+            lambda segment: client.audio.transcriptions.create(
+                model=WHISPER_DEPLOYMENT_NAME,
+                file=segment
+            ).text
         )
-        return transcript.text
     except Exception as e:
         st.error(f"❌ Audio transcription failed: {e}")
         return ""
@@ -279,50 +277,19 @@ def generate_audio_response(text: str) -> Optional[bytes]:
         st.error(f"❌ Error generating audio response: {str(e)}")
         return None
     
-def generate_audio_response_gpt(text):
-    """Generate audio response using Azure OpenAI TTS API directly."""
+def generate_audio_response_gpt(text, on_chunk=None) -> Optional[bytes]:
+    """Generate MP3 bytes using Azure OpenAI TTS, synthesizing sentence chunks in parallel."""
     try:
         # Clean and optimize text for TTS
-        clean_text = text.replace('*', '').replace('#', '').replace('`', '')
-        clean_text = clean_text.replace('- ', '• ').replace('  ', ' ').strip()
-        
-        # Limit text length for optimal TTS quality
-        if len(clean_text) > 3000:
-            clean_text = clean_text[:3000] + "... I can provide more details if needed."
-        
-        url = os.getenv("AZURE_OPENAI_ENDPOINT") + "/openai/deployments/gpt-4o-mini-tts/audio/speech?api-version=2025-03-01-preview"  
-      
-        headers = {  
-            "Content-Type": "application/json",  
-            "Authorization": f"Bearer {os.environ['AZURE_OPENAI_KEY']}"  
-        }  
-        
-        data = {  
-            "model": "gpt-4o-mini-tts",  
-            "input": clean_text,  
-            "voice": "nova",  # Use consistent professional voice
-            "response_format": "mp3",
-            "speed": 0.9
-        }  
-        
-        response = requests.post(url, headers=headers, json=data)  
-        
-        print(f"TTS API Response Status: {response.status_code}")
-        
-        if response.status_code == 200:  
-            # Create a unique temporary file
-            temp_file = os.path.join(tempfile.gettempdir(), f"response_{uuid.uuid4()}.mp3")
-            
-            with open(temp_file, "wb") as f:  
-                f.write(response.content)  
-            
-            print(f"MP3 file saved successfully: {temp_file}")
-            return temp_file
-        else:  
-            print(f"TTS API Error: {response.status_code}\n{response.text}")
-            st.error(f"❌ Error generating audio: {response.status_code}")
-            return None
-            
+        clean_text = clean_tts_text(text)
+
+        # Chunks are synthesized a few at a time and joined in order in memory
+        tts = StreamingTTS(voice="nova", speed=0.9)  # Use consistent professional voice
+        audio_bytes = tts.synthesize(clean_text, on_chunk=on_chunk)
+
+        print(tts.stats.summary())
+        return audio_bytes
+
     except Exception as e:
         print(f"Error in generate_audio_response_gpt: {str(e)}")
         st.error(f"❌ Error generating audio response: {str(e)}")
@@ -775,17 +742,10 @@ def process_learning_interaction(user_input: str, is_voice: bool = False, enable
                 with st.spinner("🔊 Converting response to speech..."):
                     # Create more conversational audio version
                     conversational_response = make_response_conversational(tutor_response)
-                    # Use the custom GPT audio function that returns file path
-                    audio_file_path = generate_audio_response_gpt(conversational_response)
-                    if audio_file_path and os.path.exists(audio_file_path):
-                        # Read the audio file and store it in session state
-                        with open(audio_file_path, 'rb') as f:
-                            st.session_state.current_audio = f.read()
-                        # Clean up the temporary file
-                        try:
-                            os.remove(audio_file_path)
-                        except:
-                            pass  # Ignore cleanup errors
+                    # Use the custom GPT audio function; the MP3 stays in memory
+                    audio_bytes = generate_audio_response_gpt(conversational_response)
+                    if audio_bytes:
+                        st.session_state.current_audio = audio_bytes
             
             # Update learning scores
             update_learning_scores(user_input, tutor_response)
@@ -0,0 +1,117 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("azure.kusto.data")
+
+from adx_client import AdxResultCache, get_result_cache, inject_row_limit, normalize_kql, referenced_tables
+
+
+CLUSTER = "https://a.kusto.windows.net"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_row_limit_goes_before_a_trailing_render():
+    assert inject_row_limit("StormEvents | project State", 5) == "StormEvents | project State\n| take 6"
+    assert inject_row_limit("StormEvents | summarize count() by State | render barchart", 5) == (
+        "StormEvents | summarize count() by State\n| take 6\n| render barchart"
+    )
+    assert inject_row_limit("StormEvents | count | render card", 5) == "StormEvents | count | render card"
+    assert inject_row_limit('T | where Name == "a | render x"', 5) == 'T | where Name == "a | render x"\n| take 6'
+    assert inject_row_limit(".show tables", 5) == ".show tables"
+
+
+def test_normalize_ignores_layout_comments_and_literal_spelling():
+    a = "StormEvents // recent\n|  where State == 'TEXAS' and Count > 007\n| take 1.50;"
+    b = 'StormEvents | where State == "TEXAS" and Count > 7 | take 1.5'
+    assert normalize_kql(a) == normalize_kql(b)
+    # KQL is case-sensitive: table, column and keyword case is kept
+    assert normalize_kql("stormevents | take 1") != normalize_kql("StormEvents | take 1")
+    assert normalize_kql("T | where Name == 'a'") != normalize_kql("T | where Name == 'A'")
+    assert normalize_kql("T | project Count") != normalize_kql("T | project count")
+    assert normalize_kql("T | Where x > 1") != normalize_kql("T | where x > 1")
+
+
+def test_referenced_tables_skips_function_arguments_and_columns():
+    assert referenced_tables("StormEvents | summarize count() by bin(StartTime, 1d)") == ["StormEvents"]
+    assert referenced_tables('titanic | where tolower(Name) == "x"') == ["titanic"]
+    assert referenced_tables("union withsource=Src isfuzzy=true A, B | summarize count() by Src, C") == ["A", "B"]
+
+
+def test_referenced_tables_follows_let_join_and_lookup():
+    query = (
+        "let recent = StormEvents | where StartTime > ago(1d);\n"
+        "recent | join kind=inner (Events | project EventId) on EventId\n"
+        "| lookup kind=leftouter States on State | union Other, (Third | take 1)"
+    )
+    assert referenced_tables(query) == ["StormEvents", "Events", "States", "Other", "Third"]
+    assert referenced_tables("let n = toscalar(Sales | count); Orders | where Amount > n") == ["Sales", "Orders"]
+    assert referenced_tables("print x = 1") == []
+
+
+def test_cache_hits_expire_per_table_ttl():
+    clock = FakeClock()
+    cache = AdxResultCache(default_ttl=60, table_ttls={"Events": 10}, max_entries=8, clock=clock)
+    calls = []
+
+    def run(query):
+        calls.append(query)
+        return f"result {len(calls)}"
+
+    assert cache.get_or_run(CLUSTER, "db", "Storms | take 1", run) == "result 1"
+    assert cache.get_or_run(CLUSTER, "db", "Storms\n| take   1 // again", run) == "result 1"
+    assert cache.get_or_run(CLUSTER, "db", "Storms | join (Events) on Id", run) == "result 2"
+
+    clock.now += 30  # past the Events TTL only
+    assert cache.get_or_run(CLUSTER, "db", "Storms | take 1", run) == "result 1"
+    assert cache.get_or_run(CLUSTER, "db", "Storms | join (Events) on Id", run) == "result 3"
+    clock.now += 31
+    assert cache.get_or_run(CLUSTER, "db", "Storms | take 1", run) == "result 4"
+    assert cache.snapshot() == {"hits": 2, "misses": 4, "expired": 2, "invalidated": 0, "entries": 2}
+
+
+def test_cache_invalidated_by_watermark_and_keyed_by_database():
+    clock = FakeClock()
+    watermarks = {"Storms": 1}
+    looked_up = []
+
+    def provider(cluster, database, table):
+        looked_up.append((cluster, table))
+        return watermarks[table]
+
+    cache = AdxResultCache(default_ttl=300, table_ttls={}, max_entries=8, watermark_interval=5,
+                           watermark_provider=provider, clock=clock)
+    calls = []
+
+    def run(query):
+        calls.append(query)
+        return f"result {len(calls)}"
+
+    query = "Storms | summarize count() by bin(StartTime, 1d)"
+    assert cache.get_or_run(CLUSTER, "db", query, run) == "result 1"
+    assert looked_up == [(CLUSTER, "Storms")]
+    assert cache.get_or_run(CLUSTER, "other", query, run) == "result 2"
+
+    watermarks["Storms"] = 2
+    assert cache.get_or_run(CLUSTER, "db", query, run) == "result 1"  # watermark still cached
+    clock.now += 6
+    assert cache.get_or_run(CLUSTER, "db", query, run) == "result 3"
+    assert cache.stats["invalidated"] == 1
+
+    # Same database name on another cluster: its own entry and its own watermark lookup
+    assert cache.get_or_run("https://b.kusto.windows.net", "db", query, run) == "result 4"
+    assert looked_up[-1] == ("https://b.kusto.windows.net", "Storms")
+
+
+def test_result_cache_is_shared_across_callers():
+    assert get_result_cache() is get_result_cache()
@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agent_bulk_eval import (
+    agent_eval_specs, convert_runs, evaluate_runs, merge_run_outputs, run_scenarios, summarize, write_jsonl,
+)
+from eval_runner import load_jsonl
+from eval_runner import ScoreCache
+
+
+class FakeAgents:
+    """The parts of AIProjectClient.agents the pipeline uses; runs take 50 ms and report token usage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = self.peak = 0
+        self.threads = SimpleNamespace(create=self._create_thread)
+        self.messages = SimpleNamespace(create=self._create_message)
+        self.runs = SimpleNamespace(create_and_process=self._run)
+        self._content = {}
+
+    def _create_thread(self):
+        with self._lock:
+            thread_id = f"thread_{len(self._content)}"
+            self._content[thread_id] = None
+        return SimpleNamespace(id=thread_id)
+
+    def _create_message(self, thread_id, role, content):
+        self._content[thread_id] = content
+
+    def _run(self, thread_id, agent_id):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self._lock:
+            self.active -= 1
+        content = self._content[thread_id]
+        status = "failed" if "fail" in content else "completed"
+        usage = SimpleNamespace(prompt_tokens=100 * len(content.split()), completion_tokens=50)
+        return SimpleNamespace(id=f"run_{thread_id}", status=status, usage=usage, last_error="boom")
+
+
+class FakeConverter:
+    def __init__(self, agents):
+        self.agents = agents
+
+    def convert(self, thread_id, run_id):
+        return {"query": self.agents._content[thread_id], "response": f"answer to {thread_id}",
+                "tool_definitions": [{"name": "fetch_weather"}]}
+
+
+def judge(name):
+    def evaluate(query, response, tool_definitions=None):
+        return {name: float(len(query.split())), f"{name}_result": "pass"}
+    return evaluate
+
+
+def test_bulk_scenarios_carry_latency_cost_and_scores(tmp_path):
+    agents = FakeAgents()
+    client = SimpleNamespace(agents=agents)
+    scenarios = ["weather in Seattle", "please fail now", "weather in London today", "hi"]
+
+    runs = run_scenarios(client, "asst_1", scenarios, concurrency=4)
+    assert [run.scenario for run in runs] == scenarios
+    assert agents.peak == 4
+    converted = convert_runs(FakeConverter(agents), runs, concurrency=4)
+    assert converted[1] is None and converted[0]["query"] == "weather in Seattle"
+
+    specs = agent_eval_specs(judge("intent_resolution"), judge("tool_call_accuracy"), judge("task_adherence"))
+    prices = {"prompt": 0.01, "completion": 0.03}
+    rows = evaluate_runs(runs, converted, specs, ScoreCache(str(tmp_path / "cache.sqlite")), prices)
+
+    assert rows[0]["outputs.intent_resolution.intent_resolution"] == 3.0
+    assert rows[0]["outputs.agent_run.total_tokens"] == 350
+    assert rows[0]["outputs.agent_run.cost"] == pytest.approx((300 * 0.01 + 50 * 0.03) / 1000)
+    assert rows[0]["outputs.agent_run.latency_seconds"] >= 0.05
+    assert rows[1]["outputs.agent_run.status"] == "failed" and "outputs.task_adherence.task_adherence" not in rows[1]
+
+    summary = summarize(runs, prices)
+    assert summary["scenarios"] == 4 and summary["completed"] == 3
+    assert summary["total_tokens"] == 100 * 11 + 50 * 4
+
+
+def test_uploaded_evaluate_rows_get_the_run_columns(tmp_path):
+    agents = FakeAgents()
+    client = SimpleNamespace(agents=agents)
+    runs = run_scenarios(client, "asst_1", ["weather in Seattle", "please fail now", "hi"], concurrency=3)
+    converted = convert_runs(FakeConverter(agents), runs, concurrency=3)
+    data_file = str(tmp_path / "agent_eval_runs.jsonl")
+    write_jsonl(data_file, [row for row in converted if row is not None])
+
+    # evaluate() returns one row per line of the data file, in order
+    evaluate_rows = [{"inputs.query": row["query"], "outputs.intent_resolution.intent_resolution": 5.0}
+                     for row in load_jsonl(data_file)]
+    rows = merge_run_outputs(runs, converted, evaluate_rows, {"prompt": 0.01, "completion": 0.03})
+
+    assert [row["inputs.scenario"] for row in rows] == ["weather in Seattle", "please fail now", "hi"]
+    assert rows[2]["inputs.query"] == "hi" and rows[2]["outputs.intent_resolution.intent_resolution"] == 5.0
+    assert rows[2]["outputs.agent_run.total_tokens"] == 150
+    assert "inputs.query" not in rows[1] and rows[1]["outputs.agent_run.status"] == "failed"
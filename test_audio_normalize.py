@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("soundfile")
+signal = pytest.importorskip("scipy.signal")
+
+from audio_normalize import resample_blocks
+
+
+def blocks_of(x, size):
+    return [x[i:i + size] for i in range(0, len(x), size)]
+
+
+@pytest.mark.parametrize("rate_in,rate_out", [(44100, 24000), (48000, 24000), (16000, 24000), (22050, 24000),
+                                              (8000, 24000), (24000, 11025)])
+@pytest.mark.parametrize("block_size", [1, 7, 333, 1021, 5000])
+def test_block_stream_matches_one_shot_resample_poly(rate_in, rate_out, block_size):
+    rng = np.random.default_rng(rate_in + block_size)
+    x = rng.uniform(-1, 1, 3001).astype(np.float32)
+    g = np.gcd(rate_in, rate_out)
+    expected = signal.resample_poly(x, rate_out // g, rate_in // g)
+
+    out = list(resample_blocks(blocks_of(x, block_size), rate_in, rate_out))
+    assert all(block.dtype == np.float32 for block in out)
+    streamed = np.concatenate(out)
+    assert len(streamed) == len(expected)
+    np.testing.assert_allclose(streamed, expected, atol=1e-5)
+
+
+def test_same_rate_passes_blocks_through():
+    x = np.arange(10, dtype=np.float32)
+    assert [b.tolist() for b in resample_blocks(blocks_of(x, 4), 24000, 24000)] == [b.tolist() for b in blocks_of(x, 4)]
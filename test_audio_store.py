@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from audio_store import AudioArtifactStore
+
+
+def age(path, seconds):
+    when = time.time() - seconds
+    os.utime(path, (when, when))
+
+
+def test_session_quota_drops_oldest_but_keeps_new_file(tmp_path):
+    store = AudioArtifactStore(str(tmp_path), max_bytes=10_000, session_max_bytes=250)
+    first = store.save("s1", b"a" * 100)
+    age(first, 30)
+    second = store.save("s1", b"b" * 100)
+    age(second, 20)
+    other = store.save("s2", b"c" * 100)
+
+    third = store.save("s1", b"d" * 100)
+    assert not os.path.exists(first)
+    assert os.path.exists(second) and os.path.exists(third) and os.path.exists(other)
+
+    # A single file larger than the quota is still kept, since it was just saved
+    big = store.save("s1", b"e" * 400)
+    assert os.path.exists(big) and not os.path.exists(second) and not os.path.exists(third)
+    assert store.stats["evicted"] == 3
+
+
+def test_evict_expires_old_files_then_trims_to_store_quota(tmp_path):
+    store = AudioArtifactStore(str(tmp_path), max_bytes=250, session_max_bytes=10_000, max_age=60)
+    expired = store.save("old", b"x" * 50)
+    age(expired, 120)
+    oldest = store.save("s1", b"y" * 100)
+    age(oldest, 30)
+    kept = [store.save("s1", b"z" * 100), store.save("s2", b"w" * 100)]
+
+    store.evict()
+    assert not os.path.exists(expired) and not os.path.exists(oldest)
+    assert all(os.path.exists(path) for path in kept)
+    assert store.usage() == 200
+    assert not os.path.exists(os.path.join(str(tmp_path), "old"))  # empty session directory removed
+    assert store.stats["evicted_bytes"] == 150
+
+
+def test_release_and_clear_session(tmp_path):
+    store = AudioArtifactStore(str(tmp_path))
+    path = store.save("../weird id", b"data")
+    assert os.path.dirname(path).startswith(str(tmp_path))
+    store.release(path)
+    store.release(path)  # already gone: no error
+    store.save("s1", b"1")
+    store.save("s1", b"2")
+    store.clear_session("s1")
+    assert store.usage() == 0
+
+
+def test_reserved_directory_survives_eviction_until_it_expires(tmp_path):
+    store = AudioArtifactStore(str(tmp_path), max_age=0.2)
+    path = store.reserve("s1")
+    store.evict()
+    with open(path, "wb") as f:
+        f.write(b"late write")
+    store.release(path)
+
+    time.sleep(0.3)
+    store.evict()
+    assert not os.path.exists(os.path.dirname(path))
+
+
+def test_dot_only_session_ids_stay_inside_the_store(tmp_path):
+    root = tmp_path / "store"
+    store = AudioArtifactStore(str(root))
+    outside = tmp_path / "keep.wav"
+    outside.write_bytes(b"not ours")
+    for session_id in ("..", ".", "..."):
+        directory = store.session_dir(session_id)
+        assert os.path.dirname(directory) == str(root) and os.path.basename(directory).strip("_") == ""
+    store.clear_session("..")
+    store.evict()
+    assert outside.exists()
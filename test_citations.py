@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from citations import _legacy_hyperlink, format_citations_html, hyperlink_citation_markers
+
+
+CITATIONS = [
+    {"chunk_id": "0:0", "url": "https://example.com/a"},
+    {"chunk_id": "1:0", "url": ""},
+    {"chunk_id": "2:0", "url": "https://example.com/first"},
+    {"chunk_id": "2:0", "url": "https://example.com/last"},
+    {"chunk_id": "3:0", "url": "https://example.com/kept"},
+    {"chunk_id": "3:0"},
+    {"chunk_id": "doc-7", "url": "https://example.com/named"},
+    {"chunk_id": 4, "url": "https://example.com/int"},
+]
+
+
+def test_hyperlinks_match_legacy_replace_loop():
+    response = (
+        "Start 【0:0†source】 and 【1:0†source】, duplicate 【2:0†source】 twice 【2:0†source】, "
+        "no-url duplicate 【3:0†source】, other label 【0:0†doc.pdf】, named 【doc-7†source】, "
+        "int id 【4†source】, unknown 【9:9†source】 and an unclosed 【0:0†source"
+    )
+    expected = _legacy_hyperlink(response, CITATIONS)
+    assert hyperlink_citation_markers(response, CITATIONS) == expected
+    assert "<a href='https://example.com/last' target='_blank'>【2:0†source】</a>" in expected
+    assert "<a href='https://example.com/kept' target='_blank'>【3:0†source】</a>" in expected
+    assert "【0:0†doc.pdf】" in expected and "<a href='https://example.com/a' target='_blank'>【0:0†doc.pdf】" not in expected
+
+
+def test_hyperlinks_without_markers_or_citations_return_response_unchanged():
+    assert hyperlink_citation_markers("plain text", CITATIONS) == "plain text"
+    assert hyperlink_citation_markers("【0:0†source】", []) == "【0:0†source】"
+    assert hyperlink_citation_markers("【0:0†source】", None) == "【0:0†source】"
+
+
+def test_citation_html_drops_repeated_urls_and_truncates_content():
+    rows = [
+        {"chunk_id": "0:0", "url": "https://example.com/a", "title": "A", "content": "word " * 200},
+        {"chunk_id": "1:0", "url": "https://example.com/a", "title": "A again", "content": "x"},
+    ]
+    links, details = format_citations_html(rows, content_budget=20)
+    assert links.count("<a href=") == 1
+    assert "A again" not in details and "word word word word..." in details
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tests for contunder_batch.BatchAnalyzer against a local stub of the
+Content Understanding analyze / analyzerResults endpoints.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("requests")
+from contunder_batch import BatchAnalyzer
+
+
+class StubContentUnderstanding(BaseHTTPRequestHandler):
+    """Returns 202 + Operation-Location on analyze, Running for `polls_until_done` polls, then Succeeded."""
+
+    polls_until_done = 2
+    state = {}
+    lock = threading.Lock()
+    max_in_flight = 0
+    in_flight = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        with cls.lock:
+            result_id = f"r{len(cls.state)}"
+            cls.state[result_id] = {"url": body["url"], "polls": 0}
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        host, port = self.server.server_address
+        self._send(
+            202,
+            {"id": result_id, "status": "Running"},
+            {"Operation-Location": f"http://{host}:{port}/contentunderstanding/analyzerResults/{result_id}", "Retry-After": "0"},
+        )
+
+    def do_GET(self):
+        result_id = self.path.rsplit("/", 1)[-1].split("?")[0]
+        cls = type(self)
+        with cls.lock:
+            entry = cls.state[result_id]
+            entry["polls"] += 1
+            done = entry["polls"] > cls.polls_until_done
+            if done:
+                cls.in_flight -= 1
+        if done:
+            self._send(200, {"id": result_id, "status": "Succeeded", "result": {"contents": [{"url": entry["url"]}]}})
+        else:
+            self._send(200, {"id": result_id, "status": "Running"}, {"Retry-After": "0"})
+
+
+@pytest.fixture
+def stub_server():
+    StubContentUnderstanding.state = {}
+    StubContentUnderstanding.max_in_flight = 0
+    StubContentUnderstanding.in_flight = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubContentUnderstanding)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_batch_analyze_streams_results_and_caches(stub_server):
+    urls = [f"https://example.com/doc{i}.pdf" for i in range(6)]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        analyzer = BatchAnalyzer(
+            endpoint=stub_server, subscription_key="test", max_concurrency=3,
+            poll_interval=5.0, timeout=10.0, cache_dir=cache_dir,
+        )
+        start = time.perf_counter()
+        results = list(analyzer.analyze_many(urls))
+        # Retry-After: 0 from the stub must win over the 5 s poll_interval fallback
+        assert time.perf_counter() - start < 5.0
+        assert sorted(r.source for r in results) == urls
+        assert all(r.status == "succeeded" and not r.cached and r.polls == 3 for r in results)
+        assert 1 < StubContentUnderstanding.max_in_flight <= 3
+
+        submitted = len(StubContentUnderstanding.state)
+        again = list(analyzer.analyze_many(urls))
+        assert all(r.cached for r in again)
+        assert len(StubContentUnderstanding.state) == submitted
+        assert {r.source: r.payload for r in again} == {r.source: r.payload for r in results}
+
+
+def test_batch_analyze_times_out(stub_server):
+    StubContentUnderstanding.polls_until_done = 1000
+    try:
+        analyzer = BatchAnalyzer(endpoint=stub_server, subscription_key="test", timeout=0.3, cache_dir="")
+        analyzer.poll_interval = 0.1
+        (result,) = list(analyzer.analyze_many(["https://example.com/slow.pdf"]))
+    finally:
+        StubContentUnderstanding.polls_until_done = 2
+    assert result.status == "error"
+    assert "did not complete" in result.error
+
+
+def test_url_results_expire_but_caller_session_is_left_alone(stub_server):
+    import requests
+
+    session = requests.Session()
+    adapters = dict(session.adapters)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        analyzer = BatchAnalyzer(endpoint=stub_server, subscription_key="test", cache_dir=cache_dir,
+                                 session=session, url_cache_ttl=60)
+        assert session.adapters == adapters
+
+        url = "https://example.com/changing.pdf"
+        first = analyzer.analyze(url)
+        assert analyzer.analyze(url).cached
+
+        # Once the TTL has passed the document behind the URL may have changed, so it is analyzed again
+        path = os.path.join(cache_dir, f"{first.doc_hash}.json")
+        stale = time.time() - 120
+        os.utime(path, (stale, stale))
+        refreshed = analyzer.analyze(url)
+        assert not refreshed.cached and refreshed.status == "succeeded"
+        assert len(StubContentUnderstanding.state) == 2
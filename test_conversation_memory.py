@@ -0,0 +1,131 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conversation_memory import ConversationMemory, estimate_tokens
+
+
+class FakeSummarizer:
+    """Records every call and summarizes turns as their contents joined by '+'."""
+
+    def __init__(self, release=None):
+        self.calls = []
+        self.release = release
+
+    def __call__(self, previous, turns, max_tokens):
+        if self.release is not None:
+            self.release.wait(5)
+        self.calls.append([turn["content"] for turn in turns])
+        return "+".join(filter(None, [previous] + [turn["content"] for turn in turns]))
+
+
+def conversation(count, words=3):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn{i} " + "word " * words}
+        for i in range(count)
+    ]
+
+
+def verbatim_part(instructions):
+    return instructions.split("Conversation so far:\n", 1)[1]
+
+
+def test_instructions_never_exceed_the_budget():
+    rag = "context " * 5000
+    for max_tokens in (60, 300, 1000):
+        memory = ConversationMemory(keep_turns=4, max_tokens=max_tokens, summary_tokens=50, turn_tokens=40,
+                                    summarizer=lambda previous, turns, limit: "summary " * 500)
+        for count in (0, 3, 12, 40):
+            history = conversation(count, words=200)
+            assert estimate_tokens(memory.build_instructions(rag, history)) <= max_tokens
+            memory.wait(5)
+            instructions = memory.build_instructions(rag, history)
+            assert estimate_tokens(instructions) <= max_tokens
+            assert memory.stats["last_tokens"] <= max_tokens
+        memory.close()
+
+
+def test_older_turns_are_folded_into_the_summary_and_recent_turns_stay_verbatim():
+    summarizer = FakeSummarizer()
+    memory = ConversationMemory(keep_turns=4, summary_every=2, summarizer=summarizer)
+    history = conversation(10)
+
+    # Before the background summary lands, the aged-out turns are still sent verbatim
+    first = memory.build_instructions(None, history)
+    assert "turn0" in verbatim_part(first)
+    memory.wait(5)
+    assert summarizer.calls == [[turn["content"] for turn in history[:6]]]
+
+    instructions = memory.build_instructions(None, history)
+    assert memory.summarized_turns == 6
+    assert "Summary of the earlier conversation:\nturn0" in instructions
+    recent = verbatim_part(instructions)
+    assert [line.split(" ")[1] for line in recent.splitlines()] == [f"turn{i}" for i in range(6, 10)]
+
+    # Two more turns age out: only those are sent to the summarizer, on top of the previous summary
+    history += conversation(12)[10:]
+    memory.build_instructions(None, history)
+    memory.wait(5)
+    assert summarizer.calls[-1] == [turn["content"] for turn in history[6:8]]
+    assert memory.summary.startswith("turn0") and "turn7" in memory.summary
+    memory.close()
+
+
+def test_prefix_is_reused_until_context_or_summary_changes():
+    memory = ConversationMemory(keep_turns=4, summarizer=FakeSummarizer())
+    history = conversation(3)
+    memory.build_instructions("rag", history)
+    memory.build_instructions("rag", history + conversation(4)[3:])
+    assert memory.stats["prefix_builds"] == 1 and memory.stats["prefix_hits"] == 1
+
+    memory.build_instructions("other rag", history)
+    assert memory.stats["prefix_builds"] == 2
+
+    # A new summary changes the prefix once, then it is cached again
+    long_history = conversation(8)
+    memory.build_instructions("other rag", long_history)
+    memory.wait(5)
+    builds = memory.stats["prefix_builds"]
+    memory.build_instructions("other rag", long_history)
+    memory.build_instructions("other rag", long_history)
+    assert memory.stats["prefix_builds"] == builds + 1
+    memory.close()
+
+
+def test_reset_drops_the_summary_and_discards_a_summary_in_flight():
+    release = threading.Event()
+    summarizer = FakeSummarizer(release)
+    memory = ConversationMemory(keep_turns=2, summarizer=summarizer)
+    history = conversation(6)
+
+    memory.build_instructions(None, history)
+    memory.reset()
+    release.set()
+    memory.wait(5)
+    assert summarizer.calls and memory.summary == "" and memory.summarized_turns == 0
+
+    memory.build_instructions(None, history)
+    memory.wait(5)
+    assert memory.summarized_turns == 4
+    memory.reset()
+    instructions = memory.build_instructions(None, history[:2])
+    assert "Summary of the earlier conversation" not in instructions
+    assert "turn0" in verbatim_part(instructions)
+    memory.close()
+
+
+def test_edited_history_is_not_served_a_stale_summary():
+    memory = ConversationMemory(keep_turns=2, summarizer=FakeSummarizer())
+    history = conversation(6)
+    memory.build_instructions(None, history)
+    memory.wait(5)
+    assert memory.summarized_turns == 4
+
+    edited = [dict(history[0])] + [dict(turn, content="changed " + turn["content"]) for turn in history[1:]]
+    memory.build_instructions(None, edited)
+    memory.wait(5)
+    summary = memory.build_instructions(None, edited).split("Conversation so far:")[0]
+    assert "changed turn1" in summary and "turn1 word" not in summary.replace("changed turn1", "")
+    memory.close()
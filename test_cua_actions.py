@@ -0,0 +1,108 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cua_actions import coalesce_actions, execute_actions, simplify_path
+
+
+def test_coalesce_typing_and_waits():
+    actions = [
+        ("type", {"text": "hello"}),
+        ("keypress", {"keys": ["space"]}),
+        ("type", {"text": "world"}),
+        ("keypress", {"keys": ["ENTER"]}),
+        ("keypress", {"keys": ["ctrl", "a"]}),
+        ("wait", {"ms": 500}),
+        ("wait", {"ms": 700}),
+        ("move", {"x": 1, "y": 1}),
+        ("move", {"x": 5, "y": 6}),
+        ("click", {"x": 5, "y": 6, "button": "left"}),
+    ]
+    assert coalesce_actions(actions) == [
+        ("type", {"text": "hello world\n"}),
+        ("keypress", {"keys": ["ctrl", "a"]}),
+        ("wait", {"ms": 1200}),
+        ("click", {"x": 5, "y": 6, "button": "left"}),
+    ]
+
+
+def test_lone_keypresses_are_not_turned_into_typing():
+    actions = [("keypress", {"keys": ["enter"]}), ("keypress", {"keys": ["enter"]})]
+    assert coalesce_actions(actions) == actions
+
+
+def test_simplify_path_keeps_corners():
+    path = [(x, 0) for x in range(0, 101, 5)] + [(100, y) for y in range(5, 101, 5)]
+    assert simplify_path(path) == [(0, 0), (100, 0), (100, 100)]
+    assert simplify_path([(0, 0), (3, 4)]) == [(0, 0), (3, 4)]
+
+
+def test_execute_actions_batches_calls():
+    class Computer:
+        def __init__(self):
+            self.calls = []
+
+        async def type(self, text):
+            self.calls.append(("type", text))
+
+        def keypress(self, keys):
+            self.calls.append(("keypress", keys))
+
+    computer = Computer()
+    count = asyncio.run(execute_actions(computer, [
+        ("type", {"text": "a"}), ("type", {"text": "b"}), ("screenshot", {}), ("keypress", {"keys": ["esc"]}),
+    ]))
+    assert count == 2
+    assert computer.calls == [("type", "ab"), ("keypress", ["esc"])]
+
+
+def test_agent_takes_one_screenshot_per_batch():
+    pytest.importorskip("openai")
+    from openai.types.responses import Response
+
+    from cua import Agent
+
+    class Computer:
+        environment = "linux"
+        dimensions = (1024, 768)
+
+        def __init__(self):
+            self.calls = []
+
+        async def screenshot(self):
+            self.calls.append(("screenshot",))
+            return ""
+
+        async def type(self, text):
+            self.calls.append(("type", text))
+
+    class Client:
+        def __init__(self):
+            self.responses = self
+            self.request = None
+
+        def create(self, **kwargs):
+            self.request = kwargs
+            return Response.model_validate({"id": "resp_2", "object": "response", "created_at": 0,
+                                            "status": "completed", "model": "m", "parallel_tool_calls": False,
+                                            "tool_choice": "auto", "tools": [], "output": []})
+
+    def call(call_id, text):
+        return {"type": "computer_call", "id": f"cu_{call_id}", "call_id": call_id, "status": "completed",
+                "pending_safety_checks": [], "action": {"type": "type", "text": text}}
+
+    computer, client = Computer(), Client()
+    agent = Agent(client, "computer-use-preview", computer)
+    agent.response = Response.model_validate({"id": "resp_1", "object": "response", "created_at": 0,
+                                              "status": "completed", "model": "m", "parallel_tool_calls": True,
+                                              "tool_choice": "auto", "tools": [],
+                                              "output": [call("a", "foo"), call("b", "bar")]})
+    asyncio.run(agent.continue_task(""))
+
+    assert computer.calls == [("type", "foobar"), ("screenshot",)]
+    outputs = [item for item in client.request["input"] if item.get("type") == "computer_call_output"]
+    assert [item["call_id"] for item in outputs] == ["a", "b"]
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("openai")
+from cua import Agent
+
+
+class FakeResponses:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return SimpleNamespace(id="resp_2", status="completed", output=[])
+
+
+class FakeComputer:
+    environment = "linux"
+    dimensions = (1280, 720)
+
+
+def function_call(call_id, name, **arguments):
+    return SimpleNamespace(type="function_call", call_id=call_id, name=name, arguments=json.dumps(arguments))
+
+
+def make_agent(**kwargs):
+    client = SimpleNamespace(responses=FakeResponses())
+    agent = Agent(client, "computer-use-preview", FakeComputer(), **kwargs)
+    return agent, client
+
+
+def tool(name):
+    return {"type": "function", "name": name, "parameters": {"type": "object", "properties": {}}}
+
+
+def test_function_calls_run_concurrently_in_order():
+    agent, client = make_agent()
+
+    def slow_sync(value):
+        time.sleep(0.3)
+        return {"sync": value}
+
+    async def slow_async(value):
+        await asyncio.sleep(0.3)
+        return {"async": value}
+
+    agent.add_tool(tool("slow_sync"), slow_sync)
+    agent.add_tool(tool("slow_async"), slow_async)
+    agent.response = SimpleNamespace(id="resp_1", output=[
+        function_call("a", "slow_sync", value=1),
+        function_call("b", "slow_async", value=2),
+        function_call("c", "slow_sync", value=3),
+    ])
+
+    start = time.perf_counter()
+    asyncio.run(agent.continue_task("next"))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.6
+    inputs = client.responses.calls[0]["input"]
+    assert [i["call_id"] for i in inputs[:3]] == ["a", "b", "c"]
+    assert [json.loads(i["output"]) for i in inputs[:3]] == [{"sync": 1}, {"async": 2}, {"sync": 3}]
+    assert inputs[3]["content"] == "next"
+
+
+def test_tool_timeout_reported_to_model():
+    agent, client = make_agent(tool_timeout=5)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    agent.add_tool(tool("hang"), hang, timeout=0.1)
+    agent.response = SimpleNamespace(id="resp_1", output=[function_call("a", "hang")])
+
+    asyncio.run(agent.continue_task("next"))
+
+    output = json.loads(client.responses.calls[0]["input"][0]["output"])
+    assert "timed out" in output["error"]
+
+
+FAKE_RESPONSE = {
+    "id": "resp_fake",
+    "object": "response",
+    "created_at": 0,
+    "status": "completed",
+    "model": "computer-use-preview",
+    "parallel_tool_calls": False,
+    "tool_choice": "auto",
+    "tools": [],
+    "output": [{
+        "type": "message",
+        "id": "msg_1",
+        "role": "assistant",
+        "status": "completed",
+        "content": [{"type": "output_text", "text": "done", "annotations": []}],
+    }],
+}
+
+
+@pytest.fixture
+def fake_responses_server():
+    """A local /v1/responses endpoint that takes 0.5 s, as JSON or as an SSE stream."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(0.5)
+            if not body.get("stream"):
+                payload = json.dumps(FAKE_RESPONSE).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            events = [
+                {"type": "response.output_item.done", "output_index": 0, "sequence_number": 1,
+                 "item": FAKE_RESPONSE["output"][0]},
+                {"type": "response.completed", "sequence_number": 2, "response": FAKE_RESPONSE},
+            ]
+            for event in events:
+                self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+async def run_with_ticker(agent):
+    """Count 10 ms ticks while the agent waits on the model call."""
+    ticks = 0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal ticks
+        while not done.is_set():
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    await agent.continue_task("hello")
+    done.set()
+    await task
+    return ticks
+
+
+@pytest.mark.parametrize("client_class,stream", [("OpenAI", False), ("AsyncOpenAI", False), ("AsyncOpenAI", True)])
+def test_model_call_keeps_event_loop_responsive(fake_responses_server, client_class, stream):
+    import openai
+
+    client = getattr(openai, client_class)(api_key="test", base_url=fake_responses_server, max_retries=0)
+    agent = Agent(client, "computer-use-preview", FakeComputer())
+    agent.stream = stream
+    streamed = []
+    agent.on_output_item = streamed.append
+
+    ticks = asyncio.run(run_with_ticker(agent))
+
+    # 0.5 s of server latency; a blocked loop would tick once or twice at most
+    assert ticks >= 20
+    assert agent.messages == ["done"]
+    assert [item.type for item in streamed] == (["message"] if stream else [])
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("openai")
+from openai.types.responses import Response
+from PIL import Image
+
+from cua import Agent, Scaler
+from cua_replay import (RecordingComputer, ReplayClient, ReplayComputer, ReplayMismatch, SessionArchive,
+                        SessionRecorder)
+
+RESPONSE = {"object": "response", "created_at": 0, "status": "completed", "model": "computer-use-preview",
+            "parallel_tool_calls": False, "tool_choice": "auto", "tools": []}
+CLICK = {"type": "computer_call", "id": "cu_1", "call_id": "call_1", "status": "completed",
+         "pending_safety_checks": [], "action": {"type": "click", "button": "left", "x": 100, "y": 50}}
+DONE = {"type": "message", "id": "msg_1", "role": "assistant", "status": "completed",
+        "content": [{"type": "output_text", "text": "done", "annotations": []}]}
+
+
+class ScriptedClient:
+    """The live model: hands out the scripted responses."""
+
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.calls = 0
+        self.responses = self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return Response.model_validate({**RESPONSE, "id": f"resp_{self.calls}", "output": self.outputs.pop(0)})
+
+
+class Desktop:
+    environment = "linux"
+    dimensions = (2048, 1536)
+
+    def __init__(self):
+        self.clicks = []
+
+    async def screenshot_image(self):
+        color = (200, 200, 200) if not self.clicks else (200, 0, 0)
+        return Image.new("RGB", self.dimensions, color)
+
+    async def click(self, x, y, button="left"):
+        self.clicks.append((x, y, button))
+
+
+async def drive(agent):
+    await agent.continue_task("click the button")
+    await agent.continue_task("")
+    return agent.messages
+
+
+def test_record_then_replay(tmp_path):
+    recorder = SessionRecorder(str(tmp_path))
+    desktop = Desktop()
+    agent = Agent(ScriptedClient([[CLICK], [DONE]]), "computer-use-preview",
+                  Scaler(RecordingComputer(desktop, recorder), (1024, 768)))
+    agent.recorder = recorder
+    assert asyncio.run(drive(agent)) == ["done"]
+    assert desktop.clicks == [(200, 100, "left")]
+
+    archive = SessionArchive(str(tmp_path))
+    kinds = [r["type"] for r in archive.records()]
+    assert kinds.count("model") == 2 and kinds.count("action") == 1
+    # The model request's screenshot is stored as a blob reference, not inline base64
+    assert "base64" not in open(archive.steps_path).read()
+
+    client = ReplayClient(str(tmp_path))
+    replay_computer = ReplayComputer(str(tmp_path))
+    agent = Agent(client, "computer-use-preview", Scaler(replay_computer, (1024, 768)))
+    assert asyncio.run(drive(agent)) == ["done"]
+    assert client.remaining == 0
+    assert replay_computer.actions_replayed == 1
+    assert replay_computer.dimensions == (2048, 1536)
+
+
+def test_replay_detects_divergent_action(tmp_path):
+    recorder = SessionRecorder(str(tmp_path))
+    agent = Agent(ScriptedClient([[CLICK], [DONE]]), "computer-use-preview",
+                  Scaler(RecordingComputer(Desktop(), recorder), (1024, 768)))
+    agent.recorder = recorder
+    asyncio.run(drive(agent))
+
+    # A Scaler at a different size sends different screen coordinates for the same model action
+    agent = Agent(ReplayClient(str(tmp_path)), "computer-use-preview",
+                  Scaler(ReplayComputer(str(tmp_path)), (512, 384)))
+    with pytest.raises(ReplayMismatch):
+        asyncio.run(drive(agent))
@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from eval_runner import EvalRunner, EvaluatorSpec, ScoreCache, judge_version
+
+ROWS = [
+    {"query": "q1", "response": "alpha beta", "ground_truth": "alpha beta"},
+    {"query": "q2", "response": "gamma", "ground_truth": "delta"},
+    {"query": "q3", "response": "alpha", "ground_truth": "alpha gamma"},
+]
+RESPONSE_TRUTH = {"response": "${data.response}", "ground_truth": "${data.ground_truth}"}
+
+
+class Overlap:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, response, ground_truth):
+        self.calls += 1
+        truth = set(ground_truth.split())
+        return {"overlap": len(set(response.split()) & truth) / len(truth)}
+
+
+class SlowJudge:
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, query, response):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return {"score": 4, "score_result": "pass" if query != "q2" else "fail"}
+
+
+def make_specs(overlap, judge, concurrency=2):
+    return [
+        EvaluatorSpec("overlap", overlap, RESPONSE_TRUTH, local=True),
+        EvaluatorSpec("judge", judge, {"query": "${data.query}", "response": "${data.response}"},
+                      concurrency=concurrency),
+    ]
+
+
+def test_rows_metrics_and_concurrency(tmp_path):
+    overlap, judge = Overlap(), SlowJudge()
+    result = EvalRunner(make_specs(overlap, judge, concurrency=3), ScoreCache(str(tmp_path / "c.sqlite"))).run(ROWS)
+
+    assert [row["inputs.query"] for row in result.rows] == ["q1", "q2", "q3"]
+    assert [row["outputs.overlap.overlap"] for row in result.rows] == [1.0, 0.0, 0.5]
+    assert result.metrics["overlap.overlap"] == 0.5
+    assert result.metrics["judge.score"] == 4
+    assert abs(result.metrics["judge.binary_aggregate"] - 2 / 3) < 1e-9
+    assert judge.peak == 3
+
+
+def test_rerun_only_scores_the_delta(tmp_path):
+    cache = ScoreCache(str(tmp_path / "c.sqlite"))
+    EvalRunner(make_specs(Overlap(), SlowJudge(0)), cache).run(ROWS)
+
+    overlap, judge = Overlap(), SlowJudge(0)
+    edited = [dict(ROWS[0]), dict(ROWS[1], response="delta"), dict(ROWS[2], context="unused by both")]
+    result = EvalRunner(make_specs(overlap, judge), cache).run(edited)
+
+    assert overlap.calls == 1 and judge.calls == 1
+    assert result.stats["overlap"] == {"cached": 2, "computed": 1, "failed": 0}
+    assert result.rows[1]["outputs.overlap.overlap"] == 1.0
+
+
+def test_failures_are_reported_and_not_cached(tmp_path):
+    cache = ScoreCache(str(tmp_path / "c.sqlite"))
+
+    class Flaky(Overlap):
+        fail = True
+
+        def __call__(self, response, ground_truth):
+            if Flaky.fail:
+                raise RuntimeError("judge unavailable")
+            return super().__call__(response, ground_truth)
+
+    result = EvalRunner([EvaluatorSpec("flaky", Flaky(), RESPONSE_TRUTH)], cache).run(ROWS[:1])
+    assert result.rows[0]["outputs.flaky.error"] == "judge unavailable"
+    assert result.stats["flaky"]["failed"] == 1
+
+    Flaky.fail = False
+    result = EvalRunner([EvaluatorSpec("flaky", Flaky(), RESPONSE_TRUTH)], cache).run(ROWS[:1])
+    assert result.stats["flaky"] == {"cached": 0, "computed": 1, "failed": 0}
+    assert result.rows[0]["outputs.flaky.overlap"] == 1.0
+
+
+def test_switching_the_judge_model_rescores(tmp_path):
+    cache = ScoreCache(str(tmp_path / "c.sqlite"))
+    config = {"azure_endpoint": "https://a.openai.azure.com", "azure_deployment": "gpt-4o", "api_version": "2024-10-21"}
+    query_response = {"query": "${data.query}", "response": "${data.response}"}
+
+    def run(config):
+        judge = SlowJudge(0)
+        EvalRunner([EvaluatorSpec("judge", judge, query_response, version=judge_version(config))], cache).run(ROWS)
+        return judge.calls
+
+    assert run(config) == 3
+    assert run(dict(config)) == 0
+    assert run(dict(config, azure_deployment="gpt-4.1")) == 3
+    assert run(dict(config, azure_endpoint="https://b.openai.azure.com")) == 3
+    assert run(dict(config, api_version="2025-01-01-preview")) == 3
@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from eval_runner import EvalRunner, EvaluatorSpec, ScoreCache, iter_jsonl
+from eval_shards import byte_ranges, evaluate_sharded, iter_jsonl_range
+from eval_store import ResultReader, ResultStore
+from lexical_metrics import LexicalMetricEngine, synthetic_rows
+
+RESPONSE_TRUTH = {"response": "${data.response}", "ground_truth": "${data.ground_truth}"}
+
+
+def word_overlap(response, ground_truth):
+    truth = set(ground_truth.split())
+    return {"overlap": len(set(response.split()) & truth) / max(len(truth), 1)}
+
+
+def local_specs():
+    engine = LexicalMetricEngine(meteor_alpha=0.8)
+    return [
+        EvaluatorSpec("overlap", word_overlap, RESPONSE_TRUTH, local=True),
+        *(EvaluatorSpec(name, engine.evaluator(name), RESPONSE_TRUTH, version=engine.version, local=True, batch=True)
+          for name in ("bleu", "rouge")),
+    ]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    responses, truths = synthetic_rows(301, seed=7, vocabulary=80, length=20)
+    path = tmp_path / "data.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i, (response, truth) in enumerate(zip(responses, truths)):
+            f.write(json.dumps({"query": f"q{i}", "response": response, "ground_truth": truth}) + "\n")
+            if i % 50 == 0:
+                f.write("\n")
+    return str(path)
+
+
+def test_byte_ranges_cover_every_line_once(dataset):
+    ranges = byte_ranges(dataset, 7)
+    assert ranges[0][0] == 0 and ranges[-1][1] == os.path.getsize(dataset)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    rows = [row for start, end in ranges for row in iter_jsonl_range(dataset, start, end)]
+    assert rows == list(iter_jsonl(dataset))
+
+
+def test_sharded_run_matches_single_process(dataset, tmp_path):
+    single = ResultStore(str(tmp_path / "single"), shard_size=1000)
+    expected = EvalRunner(local_specs(), ScoreCache(str(tmp_path / "single.sqlite"))).run_sharded(
+        iter_jsonl(dataset), single)
+
+    summary = evaluate_sharded(dataset, local_specs, str(tmp_path / "sharded"), processes=3,
+                               cache_path=str(tmp_path / "sharded.sqlite"), shard_size=40)
+    assert len({shard["file"].split("/")[0] for shard in summary["shards"]}) == 3
+    assert summary["rows"] == expected["rows"] == 301
+    assert summary["metrics"] == expected["metrics"]  # exact, not approximate
+    assert list(ResultReader(str(tmp_path / "sharded")).rows()) == list(single.rows())
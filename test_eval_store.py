@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from eval_runner import EvalRunner, EvaluatorSpec, ScoreCache
+from eval_store import ResultReader, ResultStore
+
+RESPONSE_TRUTH = {"response": "${data.response}", "ground_truth": "${data.ground_truth}"}
+
+
+class ExactMatch:
+    def __init__(self, fail_on=None):
+        self.calls = 0
+        self.fail_on = fail_on
+
+    def __call__(self, response, ground_truth):
+        if response == self.fail_on:
+            raise KeyboardInterrupt  # simulates the process dying mid-run
+        self.calls += 1
+        return {"match": float(response == ground_truth)}
+
+
+def make_rows(count):
+    return [{"response": f"r{i}", "ground_truth": f"r{i}" if i % 3 else "other"} for i in range(count)]
+
+
+def runner(tmp_path, evaluator):
+    spec = EvaluatorSpec("exact", evaluator, RESPONSE_TRUTH, local=True)
+    return EvalRunner([spec], ScoreCache(str(tmp_path / f"cache-{id(evaluator)}.sqlite")))
+
+
+def test_resumes_after_last_complete_shard(tmp_path):
+    rows = make_rows(10)
+    out = str(tmp_path / "results")
+
+    crashing = ExactMatch(fail_on="r7")
+    with pytest.raises(KeyboardInterrupt):
+        runner(tmp_path, crashing).run_sharded(rows, ResultStore(out, shard_size=3))
+    assert ResultReader(out).summary["rows"] == 6  # two complete shards, no partial third one
+
+    evaluator = ExactMatch()
+    summary = runner(tmp_path, evaluator).run_sharded(rows, ResultStore(out, shard_size=3))
+    assert evaluator.calls == 4
+    assert summary["rows"] == 10
+    assert summary["metrics"] == {"exact.match": pytest.approx(6 / 10)}
+
+    # A changed row redoes its shard and the ones after it, and a shorter input drops the tail
+    rows[4]["response"] = "changed"
+    evaluator = ExactMatch()
+    summary = runner(tmp_path, evaluator).run_sharded(rows[:8], ResultStore(out, shard_size=3))
+    assert evaluator.calls == 5
+    assert summary["rows"] == 8
+    assert [row["inputs.response"] for row in ResultReader(out).rows()] == [r["response"] for r in rows[:8]]
+
+
+def test_reader_filters_and_aggregates_without_the_summary(tmp_path):
+    out = str(tmp_path / "results")
+    runner(tmp_path, ExactMatch()).run_sharded(make_rows(9), ResultStore(out, shard_size=4))
+    reader = ResultReader(out)
+
+    misses = list(reader.rows(where=lambda row: row["outputs.exact.match"] == 0.0, columns=["inputs.response"]))
+    assert misses == [{"inputs.response": "r0"}, {"inputs.response": "r3"}, {"inputs.response": "r6"}]
+    assert reader.count() == 9
+    assert reader.aggregate(lambda row: row["inputs.response"] != "r0") == {"exact.match": pytest.approx(6 / 8)}
+    assert reader.aggregate() == pytest.approx(reader.metrics())
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("numpy")
+from PIL import Image, ImageDraw
+
+from frame_diff import FrameDiffer
+
+
+def screen(size=(2560, 1440), box=None, color=(200, 30, 30)):
+    image = Image.new("RGB", size, (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, size[0], 40), fill=(32, 32, 48))
+    if box:
+        draw.rectangle(box, fill=color)
+    return image
+
+
+def test_unchanged_frame_is_reported_unchanged():
+    differ = FrameDiffer(tile=64)
+    first = differ.update(screen())
+    assert first.changed and first.bbox == (0, 0, 2560, 1440)
+    delta = differ.update(screen())
+    assert not delta.changed and delta.changed_tiles == 0 and delta.bbox is None
+    assert delta.phash_distance == 0
+
+
+def test_partial_change_is_bounded_by_changed_tiles():
+    differ = FrameDiffer(tile=64)
+    differ.update(screen())
+    delta = differ.update(screen(box=(700, 300, 760, 330)))
+    assert delta.changed
+    assert delta.bbox == (640, 256, 768, 384)
+    assert delta.changed_tiles == 4 and delta.changed_fraction == 4 / delta.total_tiles
+
+
+def test_change_in_partial_edge_tile_is_clipped_to_frame():
+    differ = FrameDiffer(tile=64)
+    size = (1000, 700)  # neither side is a multiple of the tile
+    differ.update(screen(size))
+    delta = differ.update(screen(size, box=(990, 690, 999, 699)))
+    assert delta.bbox == (960, 640, 1000, 700)
+
+
+def test_resized_frame_counts_as_fully_changed():
+    differ = FrameDiffer(tile=64)
+    differ.update(screen((2560, 1440)))
+    delta = differ.update(screen((1920, 1200)))
+    assert delta.changed and delta.changed_tiles == delta.total_tiles
+    assert delta.bbox == (0, 0, 1920, 1200)
+    assert not differ.update(screen((1920, 1200))).changed
+
+
+def make_scaler(computer, **kwargs):
+    pytest.importorskip("openai")
+    from cua import Scaler
+
+    return Scaler(computer, (1280, 720), differ=FrameDiffer(tile=64), **kwargs)
+
+
+class FrameComputer:
+    environment = "linux"
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.dimensions = self.frames[0].size
+        self.clicks = []
+
+    def screenshot_image(self):
+        frame = self.frames.pop(0)
+        self.dimensions = frame.size
+        return frame
+
+    async def click(self, x, y, button="left"):
+        self.clicks.append((x, y))
+
+
+def test_scaler_skips_unchanged_frames_and_maps_crops_back_to_screen():
+    changed_box = (1500, 900, 1530, 920)
+    computer = FrameComputer([screen(), screen(), screen(box=changed_box)])
+    scaler = make_scaler(computer, crop_changes=True)
+
+    async def steps():
+        first = await scaler.screenshot()
+        second = await scaler.screenshot()
+        third = await scaler.screenshot()
+        return first, second, third
+
+    first, second, third = asyncio.run(steps())
+    assert second is first and third != first
+    assert [s.encode_skipped for s in scaler.frame_stats.steps] == [False, True, False]
+
+    # The crop box is in screenshot coordinates; its corners map back onto the changed tiles
+    box, data_url = scaler.last_crop
+    assert data_url.startswith("data:image/")
+    assert box == (736, 448, 768, 480)
+    asyncio.run(scaler.click(box[0], box[1]))
+    asyncio.run(scaler.click(box[2], box[3]))
+    assert computer.clicks == [(1472, 896), (1536, 960)]
+    (left, top), (right, bottom) = computer.clicks
+    assert left <= changed_box[0] and top <= changed_box[1] and right >= changed_box[2] and bottom >= changed_box[3]
+
+
+def test_scaler_round_trips_points_after_the_screen_is_resized():
+    computer = FrameComputer([screen((2560, 1440)), screen((1920, 1200))])
+    scaler = make_scaler(computer)
+    asyncio.run(scaler.screenshot())
+    asyncio.run(scaler.screenshot())
+    assert scaler.frame_stats.steps[-1].changed
+
+    # 1920x1200 letterboxes into 1280x720 at a 0.6 scale, anchored at the top left
+    ratio = 0.6
+    for screen_point in [(0, 0), (1000, 600), (1919, 1199)]:
+        shot_point = tuple(int(v * ratio) for v in screen_point)
+        asyncio.run(scaler.click(*shot_point))
+        x, y = computer.clicks[-1]
+        assert abs(x - screen_point[0]) <= 1 / ratio and abs(y - screen_point[1]) <= 1 / ratio
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from eval_runner import EvalRunner, EvaluatorSpec, ScoreCache
+from lexical_metrics import METRIC_COLUMNS, LexicalBatch, LexicalMetricEngine, reference_metrics, synthetic_rows
+
+# Output keys of the azure-ai-evaluation 1.8.0 F1/BLEU/GLEU/METEOR/ROUGE score evaluators
+SDK_OUTPUT_KEYS = {
+    "f1": {"f1_score", "f1_result", "f1_threshold"},
+    "bleu": {"bleu_score", "bleu_result", "bleu_threshold"},
+    "gleu": {"gleu_score", "gleu_result", "gleu_threshold"},
+    "meteor": {"meteor_score", "meteor_result", "meteor_threshold"},
+    "rouge": {
+        "rouge_precision", "rouge_recall", "rouge_f1_score",
+        "rouge_precision_result", "rouge_recall_result", "rouge_f1_score_result",
+        "rouge_precision_threshold", "rouge_recall_threshold", "rouge_f1_score_threshold",
+    },
+}
+
+EDGE_RESPONSES = ["", "word", "The cat sat on the mat.", "a a a b", "x y z", "x"]
+EDGE_TRUTHS = ["something", "", "the cat is on the mat", "a b a", "x y z", "x"]
+
+
+def test_batch_matches_per_row_metrics():
+    responses, truths = synthetic_rows(1500, seed=3, vocabulary=50, length=12)
+    responses += EDGE_RESPONSES
+    truths += EDGE_TRUTHS
+    metrics = LexicalBatch(responses, truths).compute(meteor_alpha=0.8)
+    for i, (response, truth) in enumerate(zip(responses, truths)):
+        expected = reference_metrics(response, truth, meteor_alpha=0.8)
+        for columns in metrics.values():
+            for column, values in columns.items():
+                assert values[i] == pytest.approx(expected[column], abs=1e-9), (column, response, truth)
+
+
+def test_engine_runs_as_batch_evaluators(tmp_path):
+    rows = [{"response": r, "ground_truth": t} for r, t in zip(EDGE_RESPONSES, EDGE_TRUTHS)]
+    engine = LexicalMetricEngine()
+    mapping = {"response": "${data.response}", "ground_truth": "${data.ground_truth}"}
+    specs = [EvaluatorSpec(name, engine.evaluator(name), mapping, version=engine.version, local=True, batch=True)
+             for name in METRIC_COLUMNS]
+    runner = EvalRunner(specs, ScoreCache(str(tmp_path / "cache.sqlite")))
+
+    first = runner.run(rows)
+    assert first.rows[4]["outputs.f1.f1_score"] == 1.0
+    assert first.rows[4]["outputs.rouge.rouge_f1_score_result"] == "fail"  # under four words, no 4-grams
+    assert all(stats["computed"] == len(rows) for stats in first.stats.values())
+    expected_columns = {f"outputs.{name}.{key}" for name, keys in SDK_OUTPUT_KEYS.items() for key in keys}
+    for row in first.rows:
+        assert {key for key in row if key.startswith("outputs.")} == expected_columns
+
+    second = runner.run(rows + [{"response": "new row", "ground_truth": "new row"}])
+    assert all(stats == {"cached": len(rows), "computed": 1, "failed": 0} for stats in second.stats.values())
+    assert second.rows[:len(rows)] == first.rows
+
+
+def test_evaluator_rows_have_sdk_output_keys():
+    engine = LexicalMetricEngine()
+    inputs = [{"response": r, "ground_truth": t} for r, t in zip(EDGE_RESPONSES, EDGE_TRUTHS)]
+    assert set(METRIC_COLUMNS) == set(SDK_OUTPUT_KEYS)
+    for name, keys in SDK_OUTPUT_KEYS.items():
+        for row in engine.evaluator(name)(inputs):
+            assert set(row) == keys
+    (row,) = engine.evaluator("bleu")([{"response": "x y z", "ground_truth": "x y z"}])
+    assert row["bleu_result"] == "pass" and row["bleu_threshold"] == 0.5
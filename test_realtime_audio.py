@@ -0,0 +1,153 @@
+import asyncio
+import io
+import os
+import struct
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from realtime_audio import BackgroundLoop, IdleTimer, PcmFrame, PcmRingBuffer, pcm_to_wav_bytes
+
+
+def frame(index, ms=20, sample_rate=24000, channels=1):
+    samples = sample_rate * ms // 1000
+    return PcmFrame(struct.pack("<h", index) * (samples * channels), sample_rate, channels, pts=index)
+
+
+def test_overflow_drops_the_oldest_frames():
+    buffer = PcmRingBuffer(max_seconds=0.1)
+    for i in range(20):
+        buffer.put(frame(i))
+    assert len(buffer) == 5 and buffer.dropped_frames == 15
+    assert buffer.total_frames == 20 and buffer.total_bytes == 20 * 960
+    assert [f.pts for f in buffer.drain()] == [15, 16, 17, 18, 19]
+    assert len(buffer) == 0
+
+    # A single frame longer than the limit is still kept
+    buffer.put(frame(99, ms=500))
+    assert len(buffer) == 1 and buffer.dropped_frames == 15
+
+
+def test_wraparound_keeps_order_and_a_bounded_queue():
+    async def scenario():
+        buffer = PcmRingBuffer(max_seconds=0.1)
+        received = []
+        for i in range(0, 300, 3):
+            for j in range(i, i + 3):
+                buffer.put(frame(j))
+            received.append((await buffer.get()).pts)
+            assert len(buffer) <= 5
+        received += [f.pts for f in buffer.drain()]
+        return buffer, received
+
+    buffer, received = asyncio.run(scenario())
+    assert received == sorted(received) and received[-1] == 299
+    assert len(received) + buffer.dropped_frames == 300
+
+
+def test_close_releases_the_consumer_after_the_queued_frames():
+    async def scenario():
+        buffer = PcmRingBuffer()
+        consumer = asyncio.ensure_future(collect(buffer))
+        await asyncio.sleep(0.01)
+        buffer.put(frame(1))
+        buffer.put(frame(2))
+        await asyncio.sleep(0.01)
+        buffer.put(frame(3))
+        buffer.close()
+        buffer.put(frame(4))  # ignored once closed
+        return await asyncio.wait_for(consumer, 1), buffer
+
+    async def collect(buffer):
+        return [f.pts async for f in buffer]
+
+    pts, buffer = asyncio.run(scenario())
+    assert pts == [1, 2, 3] and buffer.closed and buffer.total_frames == 3
+    assert asyncio.run(buffer.get()) is None
+
+
+def test_wav_header_describes_the_pcm():
+    pcm = b"".join(struct.pack("<hh", i, -i) for i in range(480))
+    data = pcm_to_wav_bytes(pcm, 24000, 2)
+
+    assert data[:4] == b"RIFF" and data[8:16] == b"WAVEfmt "
+    assert struct.unpack("<I", data[4:8])[0] == len(data) - 8
+    audio_format, channels, rate, byte_rate, block_align, bits = struct.unpack("<HHIIHH", data[20:36])
+    assert (audio_format, channels, rate, byte_rate, block_align, bits) == (1, 2, 24000, 24000 * 4, 4, 16)
+    assert data[36:40] == b"data" and struct.unpack("<I", data[40:44])[0] == len(pcm)
+    assert data[44:] == pcm
+
+    with wave.open(io.BytesIO(data)) as wav:
+        assert wav.getnframes() == 480 and wav.readframes(480) == pcm
+    assert len(pcm_to_wav_bytes(b"", 16000, 1)) == 44
+
+
+class IdleSession:
+    """The idle wiring of get_realtime_session: the timer closes the session, then stops the loop."""
+
+    def __init__(self, rt_loop, timeout):
+        self.closed = False
+        self.idle = IdleTimer(timeout, self.close, on_idle=rt_loop.stop, guard=rt_loop.begin_idle_stop)
+
+    async def close(self):
+        self.closed = True
+
+    async def turn(self):
+        if self.closed:
+            raise ConnectionError("closed")
+        self.idle.touch()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_idle_session_closes_and_stops_its_loop():
+    rt_loop = BackgroundLoop()
+    session = IdleSession(rt_loop, timeout=0.05)
+    assert rt_loop.claim()
+    rt_loop.run(session.turn(), timeout=1)
+    rt_loop.release()
+
+    assert wait_for(lambda: not rt_loop.thread.is_alive())
+    assert session.closed and rt_loop.stopped
+    assert not rt_loop.claim()  # callers start a new loop instead of scheduling on this one
+
+
+def test_claimed_loop_is_not_stopped_while_idle():
+    rt_loop = BackgroundLoop()
+    session = IdleSession(rt_loop, timeout=0.05)
+    assert rt_loop.claim()
+    rt_loop.run(session.turn(), timeout=1)
+
+    # The caller holds its claim across several idle timeouts, e.g. while it prepares the next turn
+    time.sleep(0.2)
+    assert not session.closed and not rt_loop.stopped
+    rt_loop.run(session.turn(), timeout=1)
+    rt_loop.release()
+
+    assert wait_for(lambda: session.closed and not rt_loop.thread.is_alive())
+
+
+def test_touch_restarts_the_countdown():
+    closed = []
+
+    async def close():
+        closed.append(asyncio.get_running_loop().time())
+
+    async def scenario():
+        timer = IdleTimer(0.1, close)
+        start = asyncio.get_running_loop().time()
+        timer.touch()
+        await asyncio.sleep(0.06)
+        timer.touch()
+        await asyncio.sleep(0.2)
+        return start
+
+    start = asyncio.run(scenario())
+    assert len(closed) == 1 and closed[0] - start >= 0.15
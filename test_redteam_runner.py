@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from redteam_runner import AttackBudget, RedTeamOrchestrator, RedTeamScanError, ScanJob
+
+
+class FakeRedTeam:
+    """Stands in for azure.ai.evaluation.red_team.RedTeam: sends `objectives` prompts to a callback target."""
+
+    def __init__(self, objectives=4, fail_after=None):
+        self.objectives = objectives
+        self.fail_after = fail_after
+        self.scans = 0
+
+    async def scan(self, target, scan_name, output_path, max_parallel_tasks=5, **kwargs):
+        self.scans += 1
+        semaphore = asyncio.Semaphore(max_parallel_tasks)
+
+        async def attack(i):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise RuntimeError("scan interrupted")
+            async with semaphore:
+                messages = [{"role": "user", "content": f"{scan_name} objective {i}"}]
+                reply = await target(messages=messages, stream=False, session_state=None, context=None)
+            return {"conversation": messages + reply["messages"], "attack_success": False}
+
+        details = await asyncio.gather(*(attack(i) for i in range(self.objectives)))
+        result = {"scorecard": {}, "attack_details": details}
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return result
+
+
+class CountingTarget:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, query: str) -> str:
+        self.calls += 1
+        time.sleep(self.delay)
+        return f"refused: {query}"
+
+
+def test_scans_run_concurrently_under_one_budget(tmp_path):
+    target = CountingTarget()
+    jobs = [ScanJob(f"Scan-{i}", FakeRedTeam(), target, expected_attacks=4) for i in range(3)]
+    fractions = []
+    budget = AttackBudget(concurrency=3, rate_per_minute=0)
+    orchestrator = RedTeamOrchestrator(jobs, budget, str(tmp_path), on_progress=lambda o: fractions.append(o.fraction))
+
+    start = time.perf_counter()
+    results = asyncio.run(orchestrator.run())
+    elapsed = time.perf_counter() - start
+
+    assert target.calls == 12
+    assert budget.peak == 3
+    assert elapsed < 12 * target.delay * 0.6
+    assert fractions[-1] == 1.0 and fractions == sorted(fractions)
+    assert results["Scan-1"]["attack_details"][0]["conversation"][-1]["content"] == "refused: Scan-1 objective 0"
+    with open(tmp_path / "Scan-2.attacks.jsonl", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r.get("type") for r in records].count("scan_complete") == 1 and len(records) == 5
+
+
+def test_rate_budget_spaces_calls(tmp_path):
+    target = CountingTarget(delay=0)
+    budget = AttackBudget(concurrency=8, rate_per_minute=1200)  # one call per 50 ms
+    start = time.perf_counter()
+    asyncio.run(RedTeamOrchestrator([ScanJob("Rated", FakeRedTeam(objectives=5), target)], budget, str(tmp_path)).run())
+    assert time.perf_counter() - start >= 4 * 0.05
+
+
+def test_rerun_skips_completed_scans_and_answered_attacks(tmp_path):
+    target = CountingTarget(delay=0)
+    done, interrupted = FakeRedTeam(), FakeRedTeam(objectives=6, fail_after=3)
+    first = RedTeamOrchestrator([ScanJob("Done", done, target), ScanJob("Interrupted", interrupted, target)],
+                                AttackBudget(concurrency=1), str(tmp_path))
+    results = asyncio.run(first.run())
+    assert isinstance(results["Interrupted"], RuntimeError)
+    assert first.status["Interrupted"]["state"] == "failed"
+    assert target.calls == 4 + 3
+
+    target.calls = 0
+    interrupted.fail_after = None
+    second = RedTeamOrchestrator([ScanJob("Done", done, target), ScanJob("Interrupted", interrupted, target)],
+                                 AttackBudget(concurrency=1), str(tmp_path))
+    results = asyncio.run(second.run())
+    assert done.scans == 1 and second.status["Done"]["state"] == "skipped"
+    assert len(results["Done"]["attack_details"]) == 4
+    assert target.calls == 3 and second.status["Interrupted"]["replayed"] == 3
+
+
+def test_changed_target_is_not_served_recorded_replies(tmp_path):
+    target = CountingTarget(delay=0)
+
+    def run(job):
+        return asyncio.run(RedTeamOrchestrator([job], AttackBudget(concurrency=1), str(tmp_path)).run())
+
+    assert isinstance(run(ScanJob("Scan", FakeRedTeam(fail_after=2), target))["Scan"], RuntimeError)
+    assert target.calls
+
+    def patched(query: str) -> str:
+        return f"patched: {query}"
+
+    result = run(ScanJob("Scan", FakeRedTeam(), patched))
+    assert [d["conversation"][-1]["content"] for d in result["Scan"]["attack_details"]] == [
+        f"patched: Scan objective {i}" for i in range(4)
+    ]
+    target.calls = 0
+    run(ScanJob("Scan", FakeRedTeam(), target, target_version="2"))
+    assert target.calls == 4
+
+
+def test_failed_scan_raises_after_the_others_finish(tmp_path):
+    target = CountingTarget(delay=0)
+    jobs = [ScanJob("Ok", FakeRedTeam(), target), ScanJob("Broken", FakeRedTeam(fail_after=1), target)]
+    orchestrator = RedTeamOrchestrator(jobs, AttackBudget(concurrency=1), str(tmp_path))
+    with pytest.raises(RedTeamScanError) as raised:
+        asyncio.run(orchestrator.run(raise_on_failure=True))
+    assert list(raised.value.failures) == ["Broken"]
+    assert "scan interrupted" in str(raised.value)
+    assert orchestrator.status["Ok"]["state"] == "done"
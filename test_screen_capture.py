@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("mss")
+if sys.platform.startswith("linux") and not os.getenv("DISPLAY"):
+    pytest.skip("needs an X display (e.g. Xvfb :99)", allow_module_level=True)
+
+from screen_capture import MssBackend, capture_encoded  # noqa: E402
+from screenshot_codec import to_image  # noqa: E402
+
+
+@pytest.fixture
+def backend():
+    backend = MssBackend()
+    yield backend
+    backend.close()
+
+
+def test_geometry_is_cached_and_matches_grab(backend):
+    geometry = backend.geometry
+    assert backend.geometry is geometry
+    assert to_image(backend.grab()).size == geometry
+
+
+@pytest.mark.parametrize("image_format,mime,magic", [("PNG", "image/png", b"\x89PNG"), ("JPEG", "image/jpeg", b"\xff\xd8")])
+def test_capture_encoded(backend, image_format, mime, magic):
+    data, mime_type = capture_encoded(backend, image_format)
+    assert mime_type == mime
+    assert data.startswith(magic)
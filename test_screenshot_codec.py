@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+
+from screenshot_codec import ScreenshotEncoder, to_image
+
+
+def test_letterbox_margin_is_cleared_when_aspect_ratio_changes():
+    encoder = ScreenshotEncoder(image_format="PNG")
+    wide = encoder.fit(Image.new("RGB", (2560, 1280), (255, 255, 255)), (1280, 720))
+    assert wide.getpixel((10, 700)) == (0, 0, 0)
+
+    # Taller than the target: the image now fills the height and leaves a right-hand margin
+    tall = encoder.fit(Image.new("RGB", (1600, 1440), (255, 0, 0)), (1280, 720))
+    assert tall.size == (1280, 720)
+    assert tall.getpixel((10, 700)) == (255, 0, 0)
+    assert tall.getpixel((1270, 10)) == (0, 0, 0)
+
+    # Back to the wide frame: the bottom margin must not keep red pixels from the tall one
+    wide = to_image(encoder.encode(Image.new("RGB", (2560, 1280), (255, 255, 255)), (1280, 720)))
+    assert wide.getpixel((10, 700)) == (0, 0, 0)
+    assert wide.getpixel((10, 10)) == (255, 255, 255)
+
+
+def test_frame_of_target_size_is_not_letterboxed():
+    encoder = ScreenshotEncoder(image_format="PNG")
+    image = Image.new("RGB", (1280, 720), (1, 2, 3))
+    assert encoder.fit(image, (1280, 720)) is image
+    assert not encoder.stats.resized
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for transcribe_prep on synthetic recordings: silence trimming, pause
+splitting, compact encoding and ordered concurrent transcription.
+"""
+
+import io
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+np = pytest.importorskip("numpy")
+sf = pytest.importorskip("soundfile")
+pytest.importorskip("scipy")
+from transcribe_prep import prepare_for_transcription, transcribe_prepared
+
+RATE = 44100
+
+
+def _recording(layout):
+    """Stereo 16-bit WAV of ("tone"|"silence", seconds) parts; silence carries faint noise."""
+    rng = np.random.default_rng(0)
+    parts = []
+    for kind, seconds in layout:
+        n = int(seconds * RATE)
+        noise = 0.0005 * rng.standard_normal(n)
+        if kind == "tone":
+            t = np.arange(n) / RATE
+            parts.append(0.3 * np.sin(2 * np.pi * 300 * t) + noise)
+        else:
+            parts.append(noise)
+    mono = np.concatenate(parts).astype(np.float32)
+    buffer = io.BytesIO()
+    sf.write(buffer, np.stack([mono, mono], axis=1), RATE, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+def test_short_recording_is_trimmed_and_compacted():
+    audio = _recording([("silence", 2.0), ("tone", 3.0), ("silence", 0.4), ("tone", 2.0), ("silence", 3.0)])
+    prepared = prepare_for_transcription(audio)
+    stats = prepared.stats
+
+    assert stats.segments == 1
+    assert stats.original_seconds == pytest.approx(10.4, abs=0.05)
+    # 5.4 s from first to last tone, plus up to 200 ms padding each side
+    assert 5.3 <= stats.speech_seconds <= 5.9
+    assert stats.bytes_saved > 0.8 * stats.original_bytes
+
+    name, data = prepared.files[0]
+    assert name.endswith(".flac")
+    decoded, rate = sf.read(io.BytesIO(data))
+    assert rate == 16000 and decoded.ndim == 1
+
+
+def test_long_recording_splits_at_pauses_and_transcribes_in_order():
+    layout = []
+    for _ in range(4):
+        layout += [("tone", 10.0), ("silence", 1.5)]
+    prepared = prepare_for_transcription(_recording(layout), max_segment=25.0)
+    assert prepared.stats.segments == 2
+
+    calls = []
+    lock = threading.Lock()
+
+    def fake_whisper(file):
+        name, data = file
+        with lock:
+            calls.append(name)
+        # The first segment answers last, so ordering must come from the segment index
+        time.sleep(0.2 if name.startswith("segment_0") else 0.01)
+        return f"text-{name.split('.')[0]}"
+
+    text = transcribe_prepared(prepared, fake_whisper)
+    assert text == "text-segment_0 text-segment_1"
+    assert sorted(calls) == ["segment_0.flac", "segment_1.flac"]
+    assert len(prepared.stats.segment_latencies) == 2
+    # Concurrent: wall time is the slowest segment, not the sum
+    assert prepared.stats.transcribe_seconds < 0.2 + 0.15
+
+
+def test_silent_recording_is_sent_whole():
+    prepared = prepare_for_transcription(_recording([("silence", 2.0)]))
+    assert prepared.stats.segments == 1
+    assert prepared.stats.speech_seconds == pytest.approx(2.0, abs=0.05)
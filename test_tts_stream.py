@@ -0,0 +1,79 @@
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("requests")
+from tts_stream import StreamingTTS, split_tts_chunks
+
+
+class FakeSession:
+    """requests.Session stand-in: each chunk takes its own latency, so replies finish out of order."""
+
+    def __init__(self, latencies, status_code=200):
+        self.latencies = latencies
+        self.status_code = status_code
+        self.finished = []
+        self.active = self.peak = 0
+        self._lock = threading.Lock()
+
+    def post(self, url, headers, json, timeout):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.latencies[json["input"]])
+        with self._lock:
+            self.active -= 1
+            self.finished.append(json["input"])
+        return SimpleNamespace(status_code=self.status_code, content=json["input"].encode(), text="throttled")
+
+
+def test_stream_yields_in_text_order_while_requests_overlap():
+    latencies = {"c0": 0.15, "c1": 0.01, "c2": 0.05, "c3": 0.01, "c4": 0.12, "c5": 0.01}
+    session = FakeSession(latencies)
+    tts = StreamingTTS(endpoint="https://tts.example", api_key="key", parallelism=3, session=session)
+
+    start = time.perf_counter()
+    audio = list(tts.stream("", chunks=list(latencies)))
+    elapsed = time.perf_counter() - start
+
+    assert audio == [chunk.encode() for chunk in latencies]
+    assert session.finished != list(latencies)  # later chunks finished first
+    assert session.peak == 3
+    assert elapsed < sum(latencies.values())
+    assert tts.stats.chunks == 6 and tts.stats.bytes == 12
+    assert tts.stats.time_to_first_audio >= 0.15 and tts.stats.chunk_times == sorted(tts.stats.chunk_times)
+
+
+def test_failed_chunk_raises():
+    tts = StreamingTTS(endpoint="https://tts.example", api_key="key",
+                       session=FakeSession({"c0": 0, "c1": 0}, status_code=429))
+    with pytest.raises(RuntimeError, match="429"):
+        list(tts.stream("", chunks=["c0", "c1"]))
+
+
+def test_first_chunk_is_short_and_later_sentences_are_packed():
+    sentences = [f"Sentence number {i} has a few words." for i in range(20)]
+    text = " ".join(sentences)
+    chunks = split_tts_chunks(text, first_chars=60, max_chars=200)
+
+    assert chunks[0] == sentences[0]  # two sentences would exceed first_chars
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert all(len(chunk) + 1 + len(sentences[0]) > 200 for chunk in chunks[1:-1])  # packed as full as allowed
+    assert " ".join(chunks) == text
+
+
+def test_long_sentences_split_at_clauses_then_words():
+    clauses = "first clause here, second clause follows; third one: " + "word " * 60
+    chunks = split_tts_chunks(clauses.strip() + ".", first_chars=10, max_chars=50)
+    assert chunks[0] == "first clause here,"
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert " ".join(chunks).split() == (clauses.strip() + ".").split()
+
+    unbroken = "x" * 120
+    assert split_tts_chunks(unbroken, first_chars=10, max_chars=50) == ["x" * 50, "x" * 50, "x" * 20]
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Headless smoke run of voice_benchmark against its local stub server.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("numpy")
+pytest.importorskip("soundfile")
+pytest.importorskip("scipy")
+pytest.importorskip("requests")
+pytest.importorskip("openai")
+from voice_benchmark import StubLatency, main, run_benchmark
+
+
+def test_benchmark_reports_stage_percentiles():
+    latency = StubLatency(stt=0.02, stt_per_mb=0.0, chat=0.05, tts=0.01, tts_per_char=0.0, reply_chars=300)
+    result = run_benchmark(durations=(3,), iterations=2, latency=latency, poll_interval=0.02)
+    stages = result["stages"]
+
+    for stage in ("transcribe", "agent", "tts_first_audio", "time_to_first_audio", "end_to_end", "rt_build_instructions"):
+        assert stages[stage]["n"] == 2
+        assert stages[stage]["p50_ms"] <= stages[stage]["p95_ms"]
+    # The stub latency is a floor for each stage
+    assert stages["agent"]["p50_ms"] >= 50
+    assert stages["time_to_first_audio"]["p50_ms"] <= stages["end_to_end"]["p50_ms"]
+    assert result["peak_python_mb"] > 0
+
+
+def test_cli_writes_json_and_enforces_p95(tmp_path):
+    out = tmp_path / "bench.json"
+    args = ["--durations", "2", "--iterations", "1", "--stt-latency", "0", "--agent-latency", "0", "--poll-interval", "0",
+            "--tts-latency", "0", "--tts-per-char", "0", "--no-realtime", "--json", str(out)]
+    assert main(args) == 0
+    assert "end_to_end" in json.loads(out.read_text())["stages"]
+    assert main(args + ["--max-p95-ms", "0"]) == 1
+
+
+def test_client_sends_stsvcnow_request_shapes():
+    from voice_benchmark import VoicePipelineClient, start_stub_server
+
+    latency = StubLatency(stt=0, stt_per_mb=0, chat=0.05, tts=0.05, tts_per_char=0.0005, reply_chars=200)
+    server, base_url = start_stub_server(latency)
+    try:
+        client = VoicePipelineClient(base_url, poll_interval=0.02)
+        reply = client.agent("open incidents")
+        assert reply.startswith("Incident INC0010042") and len(reply) == 201
+        chunks = list(client.speech(reply))
+    finally:
+        server.shutdown()
+    # The reply audio streams back in several pieces rather than one body
+    assert len(chunks) > 1 and sum(map(len, chunks)) == 2 + 530 * len(reply)
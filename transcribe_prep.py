@@ -0,0 +1,224 @@
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from audio_normalize import normalize_to_pcm16
+
+# Whisper resamples everything to 16 kHz mono, so sending more is wasted upload
+WHISPER_SAMPLE_RATE = 16000
+
+
+@dataclass
+class PrepStats:
+    """What the pre-transcription stage did to one recording."""
+
+    original_bytes: int = 0
+    upload_bytes: int = 0
+    original_seconds: float = 0.0
+    speech_seconds: float = 0.0
+    segments: int = 0
+    prep_seconds: float = 0.0
+    transcribe_seconds: float = 0.0
+    segment_latencies: List[float] = field(default_factory=list)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.upload_bytes
+
+    def summary(self) -> str:
+        saved = 100 * self.bytes_saved / self.original_bytes if self.original_bytes else 0
+        return (
+            f"Transcription prep: {self.original_bytes} -> {self.upload_bytes} bytes ({saved:.0f}% saved), "
+            f"{self.original_seconds:.1f}s -> {self.speech_seconds:.1f}s audio in {self.segments} segment(s), "
+            f"prep {self.prep_seconds * 1000:.0f} ms, transcribe {self.transcribe_seconds:.2f}s"
+        )
+
+
+@dataclass
+class PreparedAudio:
+    """Encoded speech segments ready for upload, in order, as (filename, bytes)."""
+
+    files: List[Tuple[str, bytes]]
+    stats: PrepStats
+
+
+def frame_levels_db(pcm: np.ndarray, frame: int) -> np.ndarray:
+    """RMS level in dBFS of each complete frame of int16 PCM."""
+    count = len(pcm) // frame
+    if count == 0:
+        return np.zeros(0)
+    frames = pcm[:count * frame].reshape(count, frame).astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def detect_speech(
+    pcm: np.ndarray,
+    rate: int,
+    frame_ms: int = 30,
+    pad_ms: int = 200,
+) -> np.ndarray:
+    """Boolean speech flag per frame from an adaptive energy threshold, padded by `pad_ms`.
+
+    The threshold sits 10 dB over the noise floor (10th percentile level), capped at
+    20 dB under the loud end (95th percentile) so all-speech clips are not cut, and
+    never below -60 dBFS.
+    """
+    frame = rate * frame_ms // 1000
+    levels = frame_levels_db(pcm, frame)
+    if not len(levels):
+        return np.zeros(0, dtype=bool)
+    floor_db, peak_db = np.percentile(levels, [10, 95])
+    threshold = max(min(floor_db + 10, peak_db - 20), -60)
+    speech = levels > threshold
+    pad = max(pad_ms // frame_ms, 0)
+    if pad and speech.any():
+        # Dilate speech frames by `pad` frames each side
+        kernel = np.ones(2 * pad + 1, dtype=int)
+        speech = np.convolve(speech.astype(int), kernel, mode="same") > 0
+    return speech
+
+
+def speech_segments(speech: np.ndarray, frame: int, min_pause_frames: int) -> List[Tuple[int, int]]:
+    """(start, end) sample ranges of speech, split wherever silence lasts `min_pause_frames` or more."""
+    segments: List[Tuple[int, int]] = []
+    start = None
+    silent_run = 0
+    for index, is_speech in enumerate(speech):
+        if is_speech:
+            if start is None:
+                start = index
+            silent_run = 0
+        elif start is not None:
+            silent_run += 1
+            if silent_run >= min_pause_frames:
+                segments.append((start * frame, (index - silent_run + 1) * frame))
+                start = None
+                silent_run = 0
+    if start is not None:
+        segments.append((start * frame, (len(speech) - silent_run) * frame))
+    return segments
+
+
+def _pack(segments: List[Tuple[int, int]], max_samples: int) -> List[Tuple[int, int]]:
+    """Merge neighbouring segments (keeping the pause between them) up to `max_samples` each."""
+    packed: List[Tuple[int, int]] = []
+    for start, end in segments:
+        if packed and end - packed[-1][0] <= max_samples:
+            packed[-1] = (packed[-1][0], end)
+        else:
+            packed.append((start, end))
+    return packed
+
+
+def encode_segment(pcm: np.ndarray, rate: int, codec: str = "FLAC") -> bytes:
+    """Encode int16 PCM compactly (FLAC is lossless; OGG is Vorbis)."""
+    buffer = io.BytesIO()
+    subtype = "PCM_16" if codec == "FLAC" else "VORBIS"
+    sf.write(buffer, pcm, rate, format=codec, subtype=subtype)
+    return buffer.getvalue()
+
+
+def prepare_for_transcription(
+    audio: bytes,
+    codec: str = "FLAC",
+    min_pause: float = 0.7,
+    split_after: float = 30.0,
+    max_segment: float = 25.0,
+) -> PreparedAudio:
+    """Trim leading/trailing silence, split long recordings at pauses and encode compactly.
+
+    Recordings with more than `split_after` seconds of speech are cut at pauses of at
+    least `min_pause` seconds and regrouped into segments of up to `max_segment`
+    seconds, so they can be transcribed concurrently. If no speech is detected the
+    whole clip is sent, so a quiet speaker is never dropped.
+    """
+    start_time = time.perf_counter()
+    rate = WHISPER_SAMPLE_RATE
+    try:
+        pcm = normalize_to_pcm16(audio, target_rate=rate)
+    except RuntimeError:
+        # Containers libsndfile cannot read (e.g. browser webm) go to Whisper untouched
+        stats = PrepStats(original_bytes=len(audio), upload_bytes=len(audio), segments=1)
+        stats.prep_seconds = time.perf_counter() - start_time
+        return PreparedAudio([("audio.wav", audio)], stats)
+    stats = PrepStats(original_bytes=len(audio), original_seconds=len(pcm) / rate)
+
+    frame_ms = 30
+    frame = rate * frame_ms // 1000
+    speech = detect_speech(pcm, rate, frame_ms=frame_ms)
+    segments = speech_segments(speech, frame, max(int(min_pause * 1000 / frame_ms), 1))
+    if not segments:
+        segments = [(0, len(pcm))]
+    speech_samples = sum(end - start for start, end in segments)
+    if speech_samples / rate > split_after:
+        segments = _pack(segments, int(max_segment * rate))
+    else:
+        segments = [(segments[0][0], segments[-1][1])]
+
+    extension = "flac" if codec == "FLAC" else "ogg"
+    files = [
+        (f"segment_{index}.{extension}", encode_segment(pcm[start:end], rate, codec))
+        for index, (start, end) in enumerate(segments)
+    ]
+    stats.segments = len(files)
+    stats.speech_seconds = sum(end - start for start, end in segments) / rate
+    stats.upload_bytes = sum(len(data) for _, data in files)
+    stats.prep_seconds = time.perf_counter() - start_time
+    return PreparedAudio(files, stats)
+
+
+def transcribe_prepared(
+    prepared: PreparedAudio,
+    transcribe: Callable[[Tuple[str, bytes]], str],
+    max_workers: int = 4,
+) -> str:
+    """Transcribe every segment concurrently with `transcribe((filename, bytes))`; join in order."""
+    start_time = time.perf_counter()
+
+    def timed(file: Tuple[str, bytes]) -> Tuple[str, float]:
+        started = time.perf_counter()
+        text = transcribe(file)
+        return (text or "").strip(), time.perf_counter() - started
+
+    if len(prepared.files) == 1:
+        results = [timed(prepared.files[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(timed, prepared.files))
+    prepared.stats.segment_latencies = [latency for _, latency in results]
+    prepared.stats.transcribe_seconds = time.perf_counter() - start_time
+    return " ".join(text for text, _ in results if text)
+
+
+def transcribe_with_vad(audio: bytes, transcribe: Callable[[Tuple[str, bytes]], str], log: Optional[Callable[[str], None]] = print) -> str:
+    """Prepare, transcribe and log the stats line in one call."""
+    prepared = prepare_for_transcription(audio)
+    text = transcribe_prepared(prepared, transcribe)
+    if log:
+        log(prepared.stats.summary())
+    return text
+
+
+if __name__ == "__main__":
+    # Two minutes of stereo 44.1 kHz "speech" (8 s tone bursts) with 1.5 s pauses and silent edges
+    source_rate = 44100
+    burst = 0.3 * np.sin(2 * np.pi * 220 * np.arange(8 * source_rate) / source_rate)
+    pause = np.zeros(int(1.5 * source_rate))
+    mono = np.concatenate([np.zeros(3 * source_rate)] + [burst, pause] * 13 + [np.zeros(3 * source_rate)])
+    buffer = io.BytesIO()
+    sf.write(buffer, np.stack([mono, mono], axis=1), source_rate, format="WAV", subtype="PCM_16")
+    clip = buffer.getvalue()
+
+    # Stand-in for Whisper: fixed overhead plus upload time at ~2 MB/s
+    fake_whisper = lambda file: time.sleep(0.5 + len(file[1]) / 2_000_000) or ""
+    prepared = prepare_for_transcription(clip)
+    transcribe_prepared(prepared, fake_whisper)
+    baseline = 0.5 + len(clip) / 2_000_000
+    print(prepared.stats.summary())
+    print(f"Untouched single upload would take ~{baseline:.2f}s with the same stand-in")
@@ -0,0 +1,192 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional
+
+import requests
+
+from audio_store import current_session_id, get_audio_store
+
+TTS_API_VERSION = "2025-03-01-preview"
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+")
+_CLAUSE_END_RE = re.compile(r"(?<=[,;:])\s+")
+
+
+def clean_tts_text(text: str, max_chars: int = 3000) -> str:
+    """Strip markdown characters and cap the length, as the TTS helpers always have."""
+    clean_text = text.replace('*', '').replace('#', '').replace('`', '')
+    clean_text = clean_text.replace('- ', '• ').replace('  ', ' ').strip()
+    if max_chars and len(clean_text) > max_chars:
+        clean_text = clean_text[:max_chars] + "... I can provide more details if needed."
+    return clean_text
+
+
+def _split_long(piece: str, max_chars: int) -> List[str]:
+    """Split an over-long sentence at clause punctuation, then at whitespace."""
+    if len(piece) <= max_chars:
+        return [piece]
+    parts: List[str] = []
+    for clause in _CLAUSE_END_RE.split(piece):
+        while len(clause) > max_chars:
+            cut = clause.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            parts.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        if clause:
+            parts.append(clause)
+    return parts
+
+
+def split_tts_chunks(text: str, first_chars: int = 120, max_chars: int = 400) -> List[str]:
+    """Split text into sentence/clause chunks for pipelined synthesis.
+
+    The first chunk is kept short (about `first_chars`) so the first audio comes back
+    quickly; later sentences are packed together up to `max_chars` to limit the number
+    of requests.
+    """
+    pieces: List[str] = []
+    for sentence in _SENTENCE_END_RE.split(text.strip()):
+        if sentence:
+            pieces.extend(_split_long(sentence, max_chars))
+
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        limit = first_chars if not chunks else max_chars
+        if current and len(current) + 1 + len(piece) > limit:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+@dataclass
+class TTSStats:
+    """Timing of one pipelined synthesis."""
+
+    chunks: int = 0
+    bytes: int = 0
+    time_to_first_audio: Optional[float] = None
+    total_time: float = 0.0
+    chunk_times: List[float] = field(default_factory=list)
+
+    def summary(self) -> str:
+        first = f"{self.time_to_first_audio:.2f}s" if self.time_to_first_audio is not None else "n/a"
+        return f"TTS: {self.chunks} chunks, {self.bytes} bytes, first audio {first}, total {self.total_time:.2f}s"
+
+
+class StreamingTTS:
+    """Synthesize text chunk by chunk, several chunks at once, yielding audio in order.
+
+    Up to `parallelism` chunks are in flight. Audio is yielded in text order as soon
+    as the next chunk is ready, so playback can start after the first (short) chunk
+    instead of after the whole answer. MP3 chunks can be concatenated as-is.
+    """
+
+    def __init__(
+        self,
+        voice: str = "nova",
+        speed: Optional[float] = 0.9,
+        response_format: str = "mp3",
+        deployment: str = "gpt-4o-mini-tts",
+        parallelism: int = 3,
+        endpoint: Optional[str] = None,
+        api_key: Optional[str] = None,
+        session: Optional[requests.Session] = None,
+    ):
+        self.voice = voice
+        self.speed = speed
+        self.response_format = response_format
+        self.deployment = deployment
+        self.parallelism = max(1, parallelism)
+        self.endpoint = (endpoint or os.getenv("AZURE_OPENAI_ENDPOINT") or "").rstrip("/")
+        self.api_key = api_key or os.environ["AZURE_OPENAI_KEY"]
+        self.session = session or requests.Session()
+        self.stats = TTSStats()
+
+    @property
+    def url(self) -> str:
+        return f"{self.endpoint}/openai/deployments/{self.deployment}/audio/speech?api-version={TTS_API_VERSION}"
+
+    def synthesize_chunk(self, chunk: str) -> bytes:
+        data = {
+            "model": self.deployment,
+            "input": chunk,
+            "voice": self.voice,
+            "response_format": self.response_format,
+        }
+        if self.speed is not None:
+            data["speed"] = self.speed
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+        response = self.session.post(self.url, headers=headers, json=data, timeout=60)
+        if response.status_code != 200:
+            raise RuntimeError(f"TTS API Error: {response.status_code}\n{response.text}")
+        return response.content
+
+    def stream(self, text: str, chunks: Optional[List[str]] = None) -> Iterator[bytes]:
+        """Yield audio for each chunk of `text`, in order, while later chunks synthesize."""
+        chunks = chunks if chunks is not None else split_tts_chunks(text)
+        self.stats = TTSStats(chunks=len(chunks))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.parallelism) as pool:
+            # Keep at most `parallelism` requests ahead of the consumer
+            pending = []
+            next_index = 0
+            while next_index < len(chunks) and len(pending) < self.parallelism:
+                pending.append(pool.submit(self.synthesize_chunk, chunks[next_index]))
+                next_index += 1
+            while pending:
+                audio = pending.pop(0).result()
+                if next_index < len(chunks):
+                    pending.append(pool.submit(self.synthesize_chunk, chunks[next_index]))
+                    next_index += 1
+                elapsed = time.perf_counter() - start
+                if self.stats.time_to_first_audio is None:
+                    self.stats.time_to_first_audio = elapsed
+                self.stats.chunk_times.append(elapsed)
+                self.stats.bytes += len(audio)
+                yield audio
+        self.stats.total_time = time.perf_counter() - start
+
+    def synthesize(self, text: str, on_chunk: Optional[Callable[[bytes], None]] = None) -> bytes:
+        """Synthesize the whole text, calling `on_chunk` as each audio chunk becomes playable."""
+        parts = []
+        for audio in self.stream(text):
+            parts.append(audio)
+            if on_chunk:
+                on_chunk(audio)
+        return b"".join(parts)
+
+    def synthesize_to_file(
+        self,
+        text: str,
+        on_chunk: Optional[Callable[[bytes], None]] = None,
+        path: Optional[str] = None,
+    ) -> str:
+        """Stream audio into a file as chunks arrive and return its path.
+
+        Without `path` the file goes into the session's audio artifact store, so it
+        is evicted by age/size even if the caller never deletes it. Prefer
+        `synthesize` when bytes are all that is needed.
+        """
+        temp_file = path or get_audio_store().reserve(current_session_id(), "response", self.response_format)
+        try:
+            with open(temp_file, "wb") as f:
+                for audio in self.stream(text):
+                    f.write(audio)
+                    if on_chunk:
+                        on_chunk(audio)
+        except Exception:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+        return temp_file
@@ -0,0 +1,336 @@
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import requests
+import soundfile as sf
+from openai import AzureOpenAI
+
+from audio_normalize import normalize_to_pcm_bytes
+from conversation_memory import ConversationMemory
+from realtime_audio import pcm_to_wav_bytes
+from transcribe_prep import transcribe_with_vad
+
+# The request shapes stsvcnow sends: Whisper through AzureOpenAI, an Azure AI Search agent
+# run through the Agents REST API, and streamed gpt-4o-mini-tts speech
+API_VERSION = "2024-06-01"
+TTS_API_VERSION = "2025-03-01-preview"
+AGENTS_API_VERSION = "v1"
+WHISPER_DEPLOYMENT = "whisper"
+AGENT_DEPLOYMENT = "gpt-4o"
+TTS_DEPLOYMENT = "gpt-4o-mini-tts"
+TTS_INSTRUCTIONS = (
+    "Speak in a cheerful and positive tone. Can you make this content as story telling rather than reading "
+    "the text and make it personally to user to listen to it."
+)
+
+
+@dataclass
+class StubLatency:
+    """Artificial service time of the stub endpoints, in seconds."""
+
+    stt: float = 0.3
+    stt_per_mb: float = 0.5
+    chat: float = 0.8  # agent run time, from run creation until it reports completed
+    tts: float = 0.2  # time to the first streamed audio bytes
+    tts_per_char: float = 0.002  # streaming time of the rest of the audio
+    reply_chars: int = 600
+
+
+class StubVoiceHandler(BaseHTTPRequestHandler):
+    """Azure OpenAI Whisper and speech endpoints plus the Agents REST API, with fixed latency.
+
+    Agent runs report `in_progress` until `latency.chat` seconds after creation, so the
+    client's run polling interval shows up in the measurement as it does in stsvcnow.
+    """
+
+    latency = StubLatency()
+    runs: Dict[str, float] = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: bytes, content_type: str = "application/json"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, body: dict):
+        self._send(json.dumps(body).encode())
+
+    def _reply_text(self) -> str:
+        sentence = "Incident INC0010042 is still open and assigned to the payments on-call team. "
+        return (sentence * (self.latency.reply_chars // len(sentence) + 1))[:self.latency.reply_chars]
+
+    def _stream_speech(self, text: str):
+        # Roughly 64 kbit/s MP3 at ~15 characters per second of speech, streamed in pieces
+        audio = b"\xff\xf3" + bytes(530 * len(text))
+        pieces = 8
+        step = -(-len(audio) // pieces)
+        time.sleep(self.latency.tts)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(audio)))
+        self.end_headers()
+        for offset in range(0, len(audio), step):
+            if offset:
+                time.sleep(self.latency.tts_per_char * len(text) / pieces)
+            self.wfile.write(audio[offset:offset + step])
+            self.wfile.flush()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        latency = self.latency
+        path = self.path.split("?")[0]
+        if path.endswith("/audio/transcriptions"):
+            time.sleep(latency.stt + latency.stt_per_mb * len(body) / 1e6)
+            self._json({"text": "Show me the open priority one incidents for the payments service."})
+        elif path.endswith("/audio/speech"):
+            self._stream_speech(json.loads(body).get("input", ""))
+        elif path.endswith("/assistants"):
+            self._json({"id": f"asst_{uuid.uuid4().hex[:8]}", "object": "assistant"})
+        elif path.endswith("/threads"):
+            self._json({"id": f"thread_{uuid.uuid4().hex[:8]}", "object": "thread"})
+        elif path.endswith("/messages"):
+            self._json({"id": f"msg_{uuid.uuid4().hex[:8]}", "object": "thread.message"})
+        elif path.endswith("/runs"):
+            run_id = f"run_{uuid.uuid4().hex[:8]}"
+            self.runs[run_id] = time.monotonic() + latency.chat
+            self._json({"id": run_id, "object": "thread.run", "status": "queued"})
+        else:
+            self.send_error(404)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if "/runs/" in path:
+            run_id = path.rsplit("/", 1)[-1]
+            done = time.monotonic() >= self.runs.get(run_id, 0)
+            self._json({"id": run_id, "object": "thread.run", "status": "completed" if done else "in_progress"})
+        elif path.endswith("/messages"):
+            text = {"value": self._reply_text(), "annotations": []}
+            self._json({"object": "list", "data": [
+                {"role": "user", "content": [{"type": "text", "text": {"value": "question", "annotations": []}}]},
+                {"role": "assistant", "content": [{"type": "text", "text": text}]},
+            ]})
+        else:
+            self.send_error(404)
+
+    def do_DELETE(self):
+        self._json({"deleted": True})
+
+
+def start_stub_server(latency: Optional[StubLatency] = None):
+    """Start the stub on a free local port; returns (server, base_url). Call server.shutdown() when done."""
+    handler = type("BoundStubVoiceHandler", (StubVoiceHandler,), {"latency": latency or StubLatency(), "runs": {}})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def synthetic_speech_wav(seconds: float, rate: int = 44100, channels: int = 2, seed: int = 0) -> bytes:
+    """Browser-recorder-like WAV: 4 s tone bursts separated by 1.5 s pauses, with silent edges."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate)
+    signal = 0.0005 * rng.standard_normal(n)
+    t = np.arange(int(4 * rate)) / rate
+    burst = 0.3 * np.sin(2 * np.pi * 220 * t)
+    position = int(0.5 * rate)
+    while position + len(burst) < n - int(0.5 * rate):
+        signal[position:position + len(burst)] += burst
+        position += len(burst) + int(1.5 * rate)
+    buffer = io.BytesIO()
+    sf.write(buffer, np.repeat(signal[:, None], channels, axis=1), rate, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+class VoicePipelineClient:
+    """The stsvcnow voice path against `base_url`, sending the requests stsvcnow sends.
+
+    transcribe: transcribe_audio (VAD prep, then Whisper through AzureOpenAI per segment).
+    agent: ai_search_agent (create agent, thread and message, create the run and poll it
+    every `poll_interval` seconds like `runs.create_and_process`, list messages, delete
+    the agent and thread). speech: generate_audio_response_gpt_1 (one streamed
+    `audio.speech` request for the whole reply).
+    """
+
+    def __init__(self, base_url: str, poll_interval: float = 1.0, voice: str = "coral"):
+        self.base_url = base_url.rstrip("/")
+        self.poll_interval = poll_interval
+        self.voice = voice
+        self.session = requests.Session()
+        self.client = AzureOpenAI(azure_endpoint=self.base_url, api_key="benchmark", api_version=API_VERSION)
+        self.audioclient = AzureOpenAI(azure_endpoint=self.base_url, api_key="benchmark", api_version=TTS_API_VERSION)
+
+    def transcribe(self, audio: bytes) -> str:
+        return transcribe_with_vad(
+            audio,
+            lambda segment: self.client.audio.transcriptions.create(model=WHISPER_DEPLOYMENT, file=segment).text,
+            log=None,
+        )
+
+    def _agents(self, method: str, path: str, params: Optional[dict] = None, **kwargs) -> dict:
+        response = self.session.request(
+            method, f"{self.base_url}/{path}", params={"api-version": AGENTS_API_VERSION, **(params or {})},
+            timeout=60, **kwargs,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def agent(self, query: str) -> str:
+        agent = self._agents("POST", "assistants", json={
+            "model": AGENT_DEPLOYMENT, "name": "Svcnow-agent", "instructions": "You are a helpful agent",
+            "tools": [{"type": "azure_ai_search"}],
+        })
+        thread = self._agents("POST", "threads", json={})
+        self._agents("POST", f"threads/{thread['id']}/messages", json={"role": "user", "content": query})
+        run = self._agents("POST", f"threads/{thread['id']}/runs", json={"assistant_id": agent["id"]})
+        while run["status"] in ("queued", "in_progress", "requires_action"):
+            time.sleep(self.poll_interval)
+            run = self._agents("GET", f"threads/{thread['id']}/runs/{run['id']}")
+        messages = self._agents("GET", f"threads/{thread['id']}/messages", params={"order": "asc"})
+        reply = "".join(
+            f"{item['content'][0]['text']['value']}\n" for item in messages["data"] if item["role"] == "assistant"
+        )
+        self._agents("DELETE", f"assistants/{agent['id']}")
+        self._agents("DELETE", f"threads/{thread['id']}")
+        return reply
+
+    def speech(self, text: str) -> Iterator[bytes]:
+        with self.audioclient.audio.speech.with_streaming_response.create(
+            model=TTS_DEPLOYMENT, voice=self.voice, input=text, instructions=TTS_INSTRUCTIONS,
+        ) as response:
+            yield from response.iter_bytes()
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples) * 1000
+    return {
+        "n": len(samples),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "mean_ms": float(values.mean()),
+    }
+
+
+def run_benchmark(
+    durations=(5, 20, 60),
+    iterations: int = 5,
+    latency: Optional[StubLatency] = None,
+    realtime: bool = True,
+    poll_interval: float = 1.0,
+) -> dict:
+    """Replay synthetic recordings through the stsvcnow voice path against the local stub.
+
+    Returns per-stage and end-to-end p50/p95 (ms), time to first audio and the
+    Python heap peak (tracemalloc) over the whole run. `poll_interval` is the agent
+    run polling interval (1 s is the Agents SDK `create_and_process` default).
+    """
+    latency = latency or StubLatency()
+    inputs = {seconds: synthetic_speech_wav(seconds) for seconds in durations}
+    server, base_url = start_stub_server(latency)
+    client = VoicePipelineClient(base_url, poll_interval=poll_interval)
+    memory = ConversationMemory()
+    history: List[Dict] = []
+    samples: Dict[str, List[float]] = {}
+
+    def record(stage, seconds):
+        samples.setdefault(stage, []).append(seconds)
+
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            for seconds, audio in inputs.items():
+                start = time.perf_counter()
+                transcription = client.transcribe(audio)
+                after_stt = time.perf_counter()
+                reply = client.agent(transcription)
+                after_agent = time.perf_counter()
+                first_audio = None
+                for _chunk in client.speech(reply):
+                    if first_audio is None:
+                        first_audio = time.perf_counter()
+                end = time.perf_counter()
+                record("transcribe", after_stt - start)
+                record("agent", after_agent - after_stt)
+                record("tts_first_audio", first_audio - after_agent)
+                record("tts_total", end - after_agent)
+                record("time_to_first_audio", first_audio - start)
+                record("end_to_end", end - start)
+
+                if realtime:
+                    # Local work of the staudio_conversation realtime turn (the WebRTC leg is not stubbed)
+                    t0 = time.perf_counter()
+                    normalize_to_pcm_bytes(audio)
+                    t1 = time.perf_counter()
+                    history += [{"role": "user", "content": transcription}, {"role": "assistant", "content": reply}]
+                    memory.build_instructions(reply, history)
+                    t2 = time.perf_counter()
+                    pcm_to_wav_bytes(bytes(int(48000 * seconds)), 24000, 1)
+                    t3 = time.perf_counter()
+                    record("rt_normalize_input", t1 - t0)
+                    record("rt_build_instructions", t2 - t1)
+                    record("rt_reply_wav", t3 - t2)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        server.shutdown()
+        memory.close()
+
+    return {
+        "inputs_seconds": list(durations),
+        "iterations": iterations,
+        "latency": asdict(latency),
+        "stages": {stage: _percentiles(values) for stage, values in samples.items()},
+        "peak_python_mb": peak / 2**20,
+    }
+
+
+def format_report(result: dict) -> str:
+    lines = [f"{'stage':<24}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}"]
+    for stage, row in result["stages"].items():
+        lines.append(f"{stage:<24}{row['n']:>5}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['mean_ms']:>10.1f}")
+    lines.append(f"peak Python heap: {result['peak_python_mb']:.1f} MB")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="stsvcnow voice path latency benchmark against a local stub server")
+    parser.add_argument("--durations", type=float, nargs="+", default=[5, 20, 60], help="synthetic input lengths in seconds")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--stt-latency", type=float, default=StubLatency.stt)
+    parser.add_argument("--agent-latency", type=float, default=StubLatency.chat, help="agent run time in seconds")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="agent run polling interval in seconds")
+    parser.add_argument("--tts-latency", type=float, default=StubLatency.tts)
+    parser.add_argument("--tts-per-char", type=float, default=StubLatency.tts_per_char)
+    parser.add_argument("--no-realtime", action="store_true", help="skip the realtime-path local stages")
+    parser.add_argument("--json", dest="json_path", help="also write the full result as JSON here")
+    parser.add_argument("--max-p95-ms", type=float, help="exit non-zero if end-to-end p95 exceeds this (for CI)")
+    args = parser.parse_args(argv)
+
+    latency = StubLatency(stt=args.stt_latency, chat=args.agent_latency, tts=args.tts_latency, tts_per_char=args.tts_per_char)
+    durations = [int(d) if float(d).is_integer() else d for d in args.durations]
+    result = run_benchmark(durations, args.iterations, latency, realtime=not args.no_realtime,
+                           poll_interval=args.poll_interval)
+    print(format_report(result))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.max_p95_ms is not None and result["stages"]["end_to_end"]["p95_ms"] > args.max_p95_ms:
+        print(f"end-to-end p95 {result['stages']['end_to_end']['p95_ms']:.1f} ms exceeds {args.max_p95_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())